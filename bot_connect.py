@@ -1,8 +1,40 @@
-from telebot import TeleBot
-from telebot.storage import StateMemoryStorage
-from telebot.custom_filters import StateFilter
-from config import BOT_TOKEN
-
-state_storage = StateMemoryStorage()
-bot = TeleBot(BOT_TOKEN, state_storage=state_storage)
-bot.add_custom_filter(StateFilter(bot))
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_filters import StateFilter
+from state_storage import create_state_storage
+from metrics import instrument_telegram
+from outbound import OutboundLimiter, install_limiter
+from dedup import create_deduplicator, install_deduplicator
+
+
+def create_bot(settings, rate_share: float = 1.0) -> AsyncTeleBot:
+    """
+    Создаёт бота с хранилищем состояний FSM и подключает к запросам
+    Bot API метрики и ограничитель исходящих сообщений, а перед
+    обработкой обновлений - фильтр повторов.
+
+    Args:
+        settings: Объект с параметрами как в config.
+        rate_share (float): Доля общего лимита TG_GLOBAL_RATE, доступная
+            этому процессу (при --processes лимит делится между процессами).
+
+    Returns:
+        AsyncTeleBot: Бот без зарегистрированных хендлеров.
+    """
+    if not settings.BOT_TOKEN:
+        raise ValueError("Не задан BOT_TOKEN")
+    if settings.TELEGRAM_API_URL:
+        asyncio_helper.API_URL = settings.TELEGRAM_API_URL.rstrip('/') + '/bot{0}/{1}'
+    bot = AsyncTeleBot(settings.BOT_TOKEN,
+                       state_storage=create_state_storage(settings.STATE_STORAGE))
+    bot.add_custom_filter(StateFilter(bot))
+    # Время и ошибки запросов к Bot API по методам
+    instrument_telegram()
+    # Лимиты Telegram и повтор после 429; ожидание в очереди не попадает в метрики запросов
+    install_limiter(OutboundLimiter(settings.TG_GLOBAL_RATE * rate_share, settings.TG_CHAT_RATE,
+                                    settings.TG_CHAT_BURST, settings.TG_MAX_RETRIES))
+    # Повторная доставка и двойные нажатия отбрасываются до хендлеров
+    deduplicator = create_deduplicator(settings.DEDUP_STORAGE, bot.bot_id)
+    if deduplicator is not None:
+        install_deduplicator(bot, deduplicator)
+    return bot
@@ -1,222 +1,515 @@
+import argparse
+import asyncio
+from typing import Optional
+
 from telebot import types
+from telebot.async_telebot import AsyncTeleBot
 from telebot.types import Message, CallbackQuery
 
-from bot_connect import bot
-from bot_modules import (registration, require_registration, study,
-                         States, HELP_TEXT, clear_inline_keyboard)
-from db_modules import (add_base_words, create_user, add_word, delete_word,
-                        get_user_by_id, rename_user, get_word_by_id)
+from bot_connect import create_bot
+from lazy import lazy_import
+from bot_modules import (registration, require_registration, study, Keyboards,
+                         States, HELP_TEXT, clear_inline_keyboard, parse_word_pairs,
+                         stats_text, parse_utc_offset, show_word_page, found_text,
+                         typed_verdict, LIST_PAGE_SIZE)
+from callbacks import Action, CallbackRouter, CORRECT_CHOICE
+from distractors import distractor_pool
+from fuzzy import grade_answer, translation_index
+from state_storage import CachedStateStorage
+from metrics import instrument_handler
+from reminders import start_reminders
+from study_session import study_sessions
 
-# Загружаем базовые слова
-add_base_words('base_words.json')
+# Слой данных (SQLAlchemy) загружается при первом запросе к базе
+db = lazy_import('db_modules')
 
-@bot.message_handler(commands=['start'])
-def start_message(message: Message) -> None:
+@instrument_handler
+async def start_message(message: Message, bot: AsyncTeleBot) -> None:
     """
     Обрабатывает команду /start.
     Приветствует пользователя и показывает меню в зависимости от регистрации.
     """
     user_id = message.from_user.id
-    user = get_user_by_id(user_id)
+    user = await db.get_user_by_id(user_id)
     if user:
-        markup = types.InlineKeyboardMarkup(row_width=2)
-        markup.add(
-            types.InlineKeyboardButton(text='Сменить имя', callback_data='change_name_call'),
-            types.InlineKeyboardButton(text='Справка по боту', callback_data='help_call'),
-            types.InlineKeyboardButton(text='Начать обучение', callback_data='study_call')
-        )
-        bot.send_message(message.chat.id, f'С возвращением, {user.username}', reply_markup=markup)
+        await bot.send_message(message.chat.id, f'С возвращением, {user.username}',
+                               reply_markup=Keyboards.MAIN_MENU)
     else:
-        markup = types.InlineKeyboardMarkup(row_width=1)
-        markup.add(types.InlineKeyboardButton(text = 'Регистрация', callback_data='reg_call'))
-        bot.send_message(message.chat.id,
-                         'Добро пожаловать! Для начала обучение, пройдите регистрацию.', reply_markup=markup)
+        await bot.send_message(message.chat.id,
+                               'Добро пожаловать! Для начала обучение, пройдите регистрацию.',
+                               reply_markup=Keyboards.REGISTER)
 
-@bot.message_handler(commands=['help'])
-def help_message(message: Message) -> None:
+@instrument_handler
+async def help_message(message: Message, bot: AsyncTeleBot) -> None:
     """
     Обрабатывает команду /help.
     Отправляет справочный текст.
     """
-    bot.send_message(message.chat.id, HELP_TEXT, parse_mode='HTML',
-                     reply_markup=types.ReplyKeyboardRemove())
+    await bot.send_message(message.chat.id, HELP_TEXT, parse_mode='HTML',
+                           reply_markup=types.ReplyKeyboardRemove())
 
-@bot.callback_query_handler(func=lambda call: call.data == 'help_call')
-def help_call(call: CallbackQuery) -> None:
+@instrument_handler
+async def help_call(call: CallbackQuery, bot: AsyncTeleBot) -> None:
     """
     Отправляет справку по боту при нажатии на inline кнопку.
     """
-    clear_inline_keyboard(call)
-    bot.send_message(call.message.chat.id, HELP_TEXT, parse_mode='HTML',
-                     reply_markup=types.ReplyKeyboardRemove())
+    await clear_inline_keyboard(bot, call)
+    await bot.send_message(call.message.chat.id, HELP_TEXT, parse_mode='HTML',
+                           reply_markup=types.ReplyKeyboardRemove())
 
-@bot.message_handler(commands=['register'])
-def register_message(message: Message) -> None:
+@instrument_handler
+async def register_message(message: Message, bot: AsyncTeleBot) -> None:
     """
     Обрабатывает команду /register.
     Запускает процесс регистрации.
     """
-    registration(message.from_user.id, message.chat.id)
+    await registration(bot, message.from_user.id, message.chat.id)
 
-@bot.callback_query_handler(func=lambda call: call.data == 'reg_call')
-def registration_call(call: CallbackQuery) -> None:
+@instrument_handler
+async def registration_call(call: CallbackQuery, bot: AsyncTeleBot) -> None:
     """
     Запускает регистрацию при нажатии inline кнопки.
     """
-    clear_inline_keyboard(call)
-    registration(call.from_user.id, call.message.chat.id)
+    await clear_inline_keyboard(bot, call)
+    await registration(bot, call.from_user.id, call.message.chat.id)
 
-@bot.message_handler(state=States.wait_name)
-def set_name(message: Message) -> None:
+@instrument_handler
+async def set_name(message: Message, bot: AsyncTeleBot) -> None:
     """
     Обрабатывает ввод имени при регистрации.
     Создает пользователя и предлагает начать обучение.
     """
     user_id = message.from_user.id
     username = message.text
-    result = create_user(user_id, username)
+    result = await db.create_user(user_id, username)
     if result:
-        markup = types.InlineKeyboardMarkup(row_width=1)
-        markup.add(types.InlineKeyboardButton(text='Обучение',
-                                              callback_data='study_call'))
-        bot.send_message(message.chat.id,
-                         'Регистрация пройдена. Можете приступать к обучению.',
-                         reply_markup=markup)
+        await bot.send_message(message.chat.id,
+                               'Регистрация пройдена. Можете приступать к обучению.',
+                               reply_markup=Keyboards.START_STUDY)
     else:
-        bot.send_message(message.chat.id,
-                         'Возникла ошибка, профиль не создан')
-    bot.delete_state(message.from_user.id, message.chat.id)
+        await bot.send_message(message.chat.id,
+                               'Возникла ошибка, профиль не создан')
+    await bot.delete_state(message.from_user.id, message.chat.id)
 
-@bot.message_handler(commands=['id'])
+@instrument_handler
 @require_registration
-def get_message(message: Message) -> None:
+async def get_message(message: Message, bot: AsyncTeleBot) -> None:
     """
     Показывает ID Telegram и имя пользователя.
     """
     user_id = message.from_user.id
-    user = get_user_by_id(user_id)
+    user = await db.get_user_by_id(user_id)
     username = user.username
-    bot.send_message(message.chat.id, f'Ваш Телеграмм ID - {user_id}\n'
-                                      f'Ваше имя - {username}')
+    await bot.send_message(message.chat.id, f'Ваш Телеграмм ID - {user_id}\n'
+                                            f'Ваше имя - {username}')
 
-@bot.message_handler(commands=['change_name'])
+@instrument_handler
 @require_registration
-def change_name_message(message: Message) -> None:
+async def change_name_message(message: Message, bot: AsyncTeleBot) -> None:
     """
     Запрашивает новое имя пользователя.
     """
-    bot.set_state(message.from_user.id, States.wait_rename, message.chat.id)
-    bot.send_message(message.chat.id, 'Введите Ваше новое имя:')
+    await bot.set_state(message.from_user.id, States.wait_rename, message.chat.id)
+    await bot.send_message(message.chat.id, 'Введите Ваше новое имя:')
 
-@bot.callback_query_handler(func=lambda call: call.data == 'change_name_call')
-def change_name_call(call: CallbackQuery) -> None:
+@instrument_handler
+async def change_name_call(call: CallbackQuery, bot: AsyncTeleBot) -> None:
     """
     Запрашивает новое имя через inline кнопку.
     """
-    clear_inline_keyboard(call)
-    bot.set_state(call.from_user.id, States.wait_rename, call.message.chat.id)
-    bot.send_message(call.message.chat.id, 'Введите Ваше новое имя:')
+    await clear_inline_keyboard(bot, call)
+    await bot.set_state(call.from_user.id, States.wait_rename, call.message.chat.id)
+    await bot.send_message(call.message.chat.id, 'Введите Ваше новое имя:')
 
-@bot.message_handler(state=States.wait_rename)
-def set_new_name(message: Message) -> None:
+@instrument_handler
+async def set_new_name(message: Message, bot: AsyncTeleBot) -> None:
     """
     Обрабатывает ввод нового имени и обновляет его в базе.
     """
     user_id = message.from_user.id
     new_name = message.text
-    rename_user(user_id, new_name)
-    bot.delete_state(message.from_user.id, message.chat.id)
-    bot.send_message(message.chat.id,
-                     f'Ваше имя было заменено на "{new_name}"')
-    start_message(message)
+    await db.rename_user(user_id, new_name)
+    await bot.delete_state(message.from_user.id, message.chat.id)
+    await bot.send_message(message.chat.id,
+                           f'Ваше имя было заменено на "{new_name}"')
+    await start_message(message, bot)
 
-@bot.message_handler(commands=['study'])
+@instrument_handler
 @require_registration
-def start_study(message: Message) -> None:
+async def start_study(message: Message, bot: AsyncTeleBot) -> None:
     """
     Запускает процесс обучения пользователя.
     """
-    study(message.from_user.id, message.chat.id)
+    await study(bot, message.from_user.id, message.chat.id)
+
+@instrument_handler
+@require_registration
+async def start_typed_study(message: Message, bot: AsyncTeleBot) -> None:
+    """
+    Запускает обучение с вводом перевода вместо выбора варианта.
+    """
+    await study(bot, message.from_user.id, message.chat.id, typed=True)
+
+@instrument_handler
+@require_registration
+async def stats_message(message: Message, bot: AsyncTeleBot) -> None:
+    """
+    Обрабатывает команду /stats: статистика из user_stats вместе с ответами,
+    ещё не записанными в базу.
+    """
+    user_id = message.from_user.id
+    stats = await db.get_user_stats(user_id)
+    stats = db.accumulate_stats(stats, study_sessions.pending_answers(user_id))
+    await bot.send_message(message.chat.id, stats_text(stats), parse_mode='HTML')
+
+@instrument_handler
+@require_registration
+async def list_message(message: Message, bot: AsyncTeleBot) -> None:
+    """
+    Обрабатывает команду /list: первая страница словаря пользователя.
+    """
+    await show_word_page(bot, message.from_user.id, message.chat.id)
 
-@bot.callback_query_handler(func=lambda call: call.data == 'study_call')
-def start_study_call(call: CallbackQuery) -> None:
+@instrument_handler
+async def list_page_call(call: CallbackQuery, bot: AsyncTeleBot, anchor: int,
+                         backward: int) -> None:
+    """
+    Листает словарь: заменяет страницу в том же сообщении.
+    """
+    await bot.answer_callback_query(call.id)
+    await show_word_page(bot, call.from_user.id, call.message.chat.id, anchor,
+                         bool(backward), call.message.message_id)
+
+@instrument_handler
+@require_registration
+async def find_message(message: Message, bot: AsyncTeleBot) -> None:
+    """
+    Обрабатывает команду /find слово: поиск по словарю пользователя
+    подстрокой и с опечатками.
+    """
+    query = (message.text or '').partition(' ')[2].strip()
+    if not query:
+        await bot.send_message(message.chat.id, 'Укажите, что искать, например: /find cat')
+        return
+    words = await db.find_words(message.from_user.id, query, LIST_PAGE_SIZE)
+    await bot.send_message(message.chat.id, found_text(query, words), parse_mode='HTML')
+
+@instrument_handler
+@require_registration
+async def timezone_message(message: Message, bot: AsyncTeleBot) -> None:
+    """
+    Обрабатывает команду /timezone +3: часовой пояс, по которому
+    напоминания приходят только в дневные часы.
+    """
+    argument = (message.text or '').partition(' ')[2]
+    offset = parse_utc_offset(argument) if argument else None
+    if offset is None:
+        await bot.send_message(message.chat.id,
+                               'Укажите смещение от UTC, например: /timezone +3 или /timezone -5:30')
+        return
+    await db.update_reminder_settings(message.from_user.id, utc_offset=offset)
+    hours, minutes = divmod(abs(offset), 60)
+    await bot.send_message(message.chat.id, f'Часовой пояс: UTC{"-" if offset < 0 else "+"}'
+                                             f'{hours}:{minutes:02d}')
+
+@instrument_handler
+@require_registration
+async def reminders_message(message: Message, bot: AsyncTeleBot) -> None:
+    """
+    Обрабатывает команду /reminders on|off.
+    """
+    argument = (message.text or '').partition(' ')[2].strip().lower()
+    if argument not in ('on', 'off'):
+        await bot.send_message(message.chat.id, 'Используйте /reminders on или /reminders off')
+        return
+    enabled = argument == 'on'
+    await db.update_reminder_settings(message.from_user.id, enabled=enabled)
+    await bot.send_message(message.chat.id,
+                           'Напоминания включены' if enabled else 'Напоминания выключены')
+
+@instrument_handler
+async def start_study_call(call: CallbackQuery, bot: AsyncTeleBot) -> None:
     """
     Запускает обучение при нажатии inline кнопки.
     """
-    clear_inline_keyboard(call)
-    study(call.from_user.id, call.message.chat.id)
+    await clear_inline_keyboard(bot, call)
+    await study(bot, call.from_user.id, call.message.chat.id)
+
+@instrument_handler
+async def next_call(call: CallbackQuery, bot: AsyncTeleBot) -> None:
+    """
+    Пропускает слово: следующий вопрос заменяет текущий.
+    """
+    user_id = call.from_user.id
+    chat_id = call.message.chat.id
+    await bot.answer_callback_query(call.id)
+    typed = await bot.get_state(user_id, chat_id) == States.typing.name
+    await bot.delete_state(user_id, chat_id)
+    await study(bot, user_id, chat_id, message_id=call.message.message_id, typed=typed)
+
+@instrument_handler
+async def add_word_call(call: CallbackQuery, bot: AsyncTeleBot) -> None:
+    """
+    Начинает добавление слова.
+    """
+    await clear_inline_keyboard(bot, call)
+    await bot.set_state(call.from_user.id, States.add_value, call.message.chat.id)
+    await bot.send_message(call.message.chat.id,
+                           'Введите слово на русском или список слов, '
+                           'по одному на строке: слово - перевод')
 
-@bot.callback_query_handler(func=lambda call:
-call.data in ['next_call', 'add_word_call', 'delete_word_call'])
-def control_buttons(call: CallbackQuery) -> None:
+@instrument_handler
+async def delete_word_call(call: CallbackQuery, bot: AsyncTeleBot) -> None:
     """
-    Обрабатывает кнопки управления в процессе обучения:
-    - next_call: пропустить слово
-    - add_word_call: добавить слово
-    - delete_word_call: удалить слово
+    Удаляет текущее слово из словаря и показывает следующее.
     """
     user_id = call.from_user.id
     chat_id = call.message.chat.id
-    clear_inline_keyboard(call)
-
-    if call.data == 'next_call':
-        bot.delete_state(user_id, chat_id)
-        study(user_id, chat_id)
-    if call.data == 'add_word_call':
-        bot.set_state(user_id, States.add_value, chat_id)
-        bot.send_message(call.message.chat.id, 'Введите слово на русском:')
-    if call.data == 'delete_word_call':
-        with bot.retrieve_data(user_id, chat_id) as data:
-            word_id = data['word_id']
-            delete_word(user_id, word_id)
-            bot.send_message(call.message.chat.id,
-                             f'Слово удалено из словаря')
-            study(user_id, chat_id)
-
-@bot.callback_query_handler(func=lambda call: call.data.startswith('answer_'))
-def check_answer(call: CallbackQuery) -> None:
-    """
-    Проверяет ответ пользователя на слово.
-    Отправляет сообщение о правильности ответа и продолжает обучение.
+    await bot.answer_callback_query(call.id)
+    typed = await bot.get_state(user_id, chat_id) == States.typing.name
+    async with bot.retrieve_data(user_id, chat_id) as data:
+        word_id = data['word_id']
+    await db.delete_word(user_id, word_id)
+    study_sessions.invalidate(user_id)
+    await study(bot, user_id, chat_id, 'Слово удалено из словаря', call.message.message_id,
+                typed)
+
+@instrument_handler
+async def check_answer(call: CallbackQuery, bot: AsyncTeleBot, word_id: int, choice: int) -> None:
+    """
+    Проверяет ответ пользователя на слово и пересчитывает срок его повторения.
+    Результат и следующее слово показываются одним сообщением вместо вопроса.
+
+    Args:
+        word_id (int): ID слова из кнопки.
+        choice (int): Выбранный вариант, CORRECT_CHOICE - правильный.
     """
     user_id = call.from_user.id
     chat_id = call.message.chat.id
-    parts = call.data.split('_')
-    clear_inline_keyboard(call)
-    if parts[2] == 'correct':
-        bot.send_message(chat_id, 'Верный ответ')
+    correct = choice == CORRECT_CHOICE
+    await bot.answer_callback_query(call.id)
+    await study_sessions.record_answer(user_id, word_id, correct)
+    if correct:
+        verdict = 'Верный ответ'
     else:
-        word, translation = get_word_by_id(int(parts[1]))
-        bot.send_message(chat_id,
-                         f'Неверный ответ. Правильный: {translation}')
+        card = study_sessions.current(user_id)
+        if card and card.word_id == word_id:
+            translation = card.translation
+        else:
+            word, translation = await db.get_word_by_id(word_id)
+        verdict = f'Неверный ответ. Правильный: {translation}'
 
-    bot.delete_state(user_id, chat_id)
-    study(user_id, chat_id)
+    await bot.delete_state(user_id, chat_id)
+    await study(bot, user_id, chat_id, verdict, call.message.message_id)
 
-@bot.message_handler(state=States.add_value)
-def adding_value(message: Message) -> None:
+@instrument_handler
+async def check_typed_answer(message: Message, bot: AsyncTeleBot) -> None:
     """
-    Обрабатывает ввод нового слова на русском языке.
+    Проверяет введённый перевод с допуском опечаток по индексу переводов
+    и показывает результат вместе со следующим словом.
     """
-    with bot.retrieve_data(message.from_user.id, message.chat.id) as new_word:
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    async with bot.retrieve_data(user_id, chat_id) as data:
+        word_id = data.get('word_id') if data else None
+    card = study_sessions.current(user_id)
+    translation = None
+    if card and card.word_id == word_id:
+        translation = card.translation
+    elif word_id is not None:
+        word, translation = await db.get_word_by_id(word_id)
+    if translation is None:
+        # Слово удалено (например, через /list) или в состоянии нет вопроса:
+        # ответ не проверяется, показывается следующее слово
+        study_sessions.invalidate(user_id)
+        await bot.delete_state(user_id, chat_id)
+        await study(bot, user_id, chat_id, 'Этого слова уже нет в словаре', typed=True)
+        return
+    grade = grade_answer(message.text or '', translation, translation_index)
+    await study_sessions.record_answer(user_id, word_id, grade.correct)
+    await bot.delete_state(user_id, chat_id)
+    await study(bot, user_id, chat_id, typed_verdict(grade, translation), typed=True)
+
+@instrument_handler
+async def adding_value(message: Message, bot: AsyncTeleBot) -> None:
+    """
+    Обрабатывает ввод нового слова на русском языке. Сообщение со строками
+    «слово - перевод» добавляет все слова сразу.
+    """
+    pairs = parse_word_pairs(message.text or '')
+    if pairs:
+        user_id = message.from_user.id
+        added = await db.add_words(user_id, pairs)
+        if added is None:
+            notice = 'Слова не добавлены'
+        else:
+            study_sessions.invalidate(user_id)
+            notice = f'Добавлено слов: {added} из {len(pairs)}'
+        await bot.delete_state(user_id, message.chat.id)
+        await study(bot, user_id, message.chat.id, notice)
+        return
+    async with bot.retrieve_data(message.from_user.id, message.chat.id) as new_word:
         new_word['word'] = message.text
-    bot.set_state(message.from_user.id, States.add_translation, message.chat.id)
-    bot.send_message(message.chat.id, 'Введите перевод слова на английский:')
+    await bot.set_state(message.from_user.id, States.add_translation, message.chat.id)
+    await bot.send_message(message.chat.id, 'Введите перевод слова на английский:')
 
-@bot.message_handler(state=States.add_translation)
-def adding_translation(message: Message) -> None:
+@instrument_handler
+async def adding_translation(message: Message, bot: AsyncTeleBot) -> None:
     """
     Обрабатывает ввод перевода нового слова и добавляет его в словарь.
     """
-    with bot.retrieve_data(message.from_user.id, message.chat.id) as new_word:
+    async with bot.retrieve_data(message.from_user.id, message.chat.id) as new_word:
         new_word['translation'] = message.text
     user_id = message.from_user.id
-    if add_word(user_id, new_word['word'], new_word['translation']):
-        bot.send_message(message.chat.id, 'Слово добавлено')
+    if await db.add_word(user_id, new_word['word'], new_word['translation']):
+        study_sessions.invalidate(user_id)
+        notice = 'Слово добавлено'
+    else:
+        notice = 'Слово не добавлено'
+    await bot.delete_state(message.from_user.id, message.chat.id)
+    await study(bot, user_id, message.chat.id, notice)
+
+def register_handlers(bot: AsyncTeleBot) -> None:
+    """
+    Регистрирует хендлеры бота. Хендлеры получают экземпляр бота
+    аргументом bot, поэтому модуль можно импортировать без создания бота.
+
+    Args:
+        bot (AsyncTeleBot): Бот.
+    """
+    bot.register_message_handler(start_message, commands=['start'], pass_bot=True)
+    bot.register_message_handler(help_message, commands=['help'], pass_bot=True)
+    bot.register_message_handler(register_message, commands=['register'], pass_bot=True)
+    bot.register_message_handler(set_name, state=States.wait_name, pass_bot=True)
+    bot.register_message_handler(get_message, commands=['id'], pass_bot=True)
+    bot.register_message_handler(change_name_message, commands=['change_name'], pass_bot=True)
+    bot.register_message_handler(set_new_name, state=States.wait_rename, pass_bot=True)
+    bot.register_message_handler(start_study, commands=['study'], pass_bot=True)
+    bot.register_message_handler(start_typed_study, commands=['type'], pass_bot=True)
+    bot.register_message_handler(stats_message, commands=['stats'], pass_bot=True)
+    bot.register_message_handler(list_message, commands=['list'], pass_bot=True)
+    bot.register_message_handler(find_message, commands=['find'], pass_bot=True)
+    bot.register_message_handler(timezone_message, commands=['timezone'], pass_bot=True)
+    bot.register_message_handler(reminders_message, commands=['reminders'], pass_bot=True)
+    bot.register_message_handler(check_typed_answer, state=States.typing, pass_bot=True)
+    bot.register_message_handler(adding_value, state=States.add_value, pass_bot=True)
+    bot.register_message_handler(adding_translation, state=States.add_translation, pass_bot=True)
+    # Все inline-кнопки: один хендлер и таблица действий вместо фильтра на каждый
+    router = CallbackRouter()
+    router.register(Action.HELP, help_call)
+    router.register(Action.REGISTER, registration_call)
+    router.register(Action.CHANGE_NAME, change_name_call)
+    router.register(Action.STUDY, start_study_call)
+    router.register(Action.NEXT, next_call)
+    router.register(Action.ADD_WORD, add_word_call)
+    router.register(Action.DELETE_WORD, delete_word_call)
+    router.register(Action.ANSWER, check_answer)
+    router.register(Action.LIST_PAGE, list_page_call)
+    bot.register_callback_query_handler(router.dispatch, func=None, pass_bot=True)
+
+def create_app(settings=None, rate_share: float = 1.0) -> AsyncTeleBot:
+    """
+    Фабрика приложения: создаёт бота и регистрирует хендлеры.
+    Не обращается ни к базе, ни к Telegram: engine создаётся при первом
+    запросе, пул неверных вариантов загружается в main().
+
+    Args:
+        settings: Объект с параметрами как в config (BOT_TOKEN, STATE_STORAGE,
+            TELEGRAM_API_URL, TG_*); по умолчанию сам модуль config.
+        rate_share (float): Доля TG_GLOBAL_RATE для этого процесса.
+
+    Returns:
+        AsyncTeleBot: Готовый к обработке обновлений бот.
+    """
+    if settings is None:
+        import config as settings
+    bot = create_bot(settings, rate_share)
+    register_handlers(bot)
+    return bot
+
+async def init_db() -> None:
+    """
+    Создаёт таблицы (в существующей базе - недостающие столбцы и индексы) и загружает
+    базовые слова в колоду base (повторный запуск добавляет только новые). Выполняется отдельно от запуска бота: python bot_main.py --init-db
+    """
+    from config import get_engine
+    from models import create_tables
+    from importer import import_words
+
+    engine = get_engine()
+    await create_tables(engine)
+    await import_words('base_words.json')
+    await engine.dispose()
+
+async def shutdown(bot: AsyncTeleBot) -> None:
+    """
+    Записывает результаты учебных сессий и отложенные изменения состояний FSM
+    и закрывает HTTP-сессию к Bot API. Вызывается при остановке процесса бота.
+
+    Args:
+        bot (AsyncTeleBot): Бот из create_app().
+    """
+    await study_sessions.close()
+    if isinstance(bot.current_states, CachedStateStorage):
+        await bot.current_states.close()
+    # Постоянная HTTP-сессия к Bot API
+    await bot.close_session()
+
+async def run(bot: AsyncTeleBot) -> None:
+    """
+    Запускает бота в режиме polling или webhook (BOT_MODE): строит пул
+    неверных вариантов, поднимает сервер метрик и рассылку напоминаний
+    (REMINDER_INTERVAL) и при остановке записывает накопленные данные. Схема базы должна быть создана заранее (--init-db).
+
+    Args:
+        bot (AsyncTeleBot): Бот из create_app().
+    """
+    from config import BOT_MODE, METRICS_LISTEN, METRICS_PORT
+
+    # Строим пул неверных вариантов ответа и индекс переводов для ввода ответа
+    await distractor_pool.load()
+    await translation_index.load()
+    # Локальный HTTP-сервер метрик
+    metrics_runner = None
+    if METRICS_PORT:
+        from metrics import start_metrics_server
+        metrics_runner = await start_metrics_server(METRICS_LISTEN, METRICS_PORT)
+    reminders = start_reminders(bot)
+    # Запуск бота
+    try:
+        if BOT_MODE == 'webhook':
+            from webhook import run_webhook
+            await run_webhook(bot)
+        else:
+            await bot.delete_webhook()
+            await bot.infinity_polling()
+    finally:
+        if reminders:
+            reminders.cancel()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await shutdown(bot)
+
+def main(argv: Optional[list] = None) -> None:
+    """
+    Точка входа: python bot_main.py [--init-db] [--processes N]
+    """
+    from config import BOT_PROCESSES
+
+    parser = argparse.ArgumentParser(description='Telegram-бот для изучения слов')
+    parser.add_argument('--init-db', action='store_true',
+                        help='создать таблицы, загрузить базовый словарь и выйти')
+    parser.add_argument('--processes', type=int, default=BOT_PROCESSES,
+                        help='количество процессов-обработчиков (обновления '
+                             'распределяются по ID пользователя)')
+    args = parser.parse_args(argv)
+    if args.init_db:
+        asyncio.run(init_db())
+    elif args.processes > 1:
+        from supervisor import run_sharded
+        asyncio.run(run_sharded(args.processes))
     else:
-        bot.send_message(message.chat.id, 'Слово не добавлено')
-    bot.delete_state(message.from_user.id, message.chat.id)
-    study(user_id, message.chat.id)
+        asyncio.run(run(create_app()))
 
-# Запуск бота
-bot.infinity_polling()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -1,12 +1,21 @@
+import functools
+import html
+import json
 import random
+import re
+from typing import List, Optional, Tuple
 
-from faker import Faker
-from telebot import types
-from telebot.handler_backends import State, StatesGroup
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_handler_backends import State, StatesGroup
+from telebot.asyncio_helper import ApiTelegramException
 from telebot.types import CallbackQuery
 
-from db_modules import get_user_by_id, get_study_word
-from bot_connect import bot
+from callbacks import Action, encode, CORRECT_CHOICE
+from lazy import lazy_import
+from study_session import study_sessions
+from metrics import timed
+
+db = lazy_import('db_modules')
 
 
 class States(StatesGroup):
@@ -14,6 +23,7 @@ class States(StatesGroup):
     wait_name = State()
     wait_rename = State()
     learning = State()
+    typing = State()
     add_value = State()
     add_translation = State()
 
@@ -23,94 +33,334 @@ class Commands:
     DELETE_WORD: str = 'Удалить слово'
     NEXT: str = 'Дальше'
 
+def _keyboard_rows(*rows) -> list:
+    """Строки inline-клавиатуры из пар (текст кнопки, действие)."""
+    return [[{'text': text, 'callback_data': encode(action)} for text, action in row]
+            for row in rows]
+
+def _keyboard(*rows) -> str:
+    """
+    Сериализует клавиатуру один раз: telebot передаёт строку reply_markup
+    в запрос как есть, не создавая объекты кнопок и не вызывая to_json().
+    """
+    return json.dumps({'inline_keyboard': _keyboard_rows(*rows)}, ensure_ascii=False)
+
+class Keyboards:
+    """Неизменяемые inline-клавиатуры, готовые к отправке (JSON)."""
+    REGISTER: str = _keyboard([('Регистрация', Action.REGISTER)])
+    MAIN_MENU: str = _keyboard([('Сменить имя', Action.CHANGE_NAME),
+                                ('Справка по боту', Action.HELP)],
+                               [('Начать обучение', Action.STUDY)])
+    START_STUDY: str = _keyboard([('Обучение', Action.STUDY)])
+    NO_WORDS: str = _keyboard([(Commands.ADD_WORD, Action.ADD_WORD)])
+
+# Кнопки управления под вопросом: сериализованы заранее и дописываются
+# к вариантам ответа без повторной сериализации
+STUDY_CONTROLS = json.dumps(_keyboard_rows(
+    [(Commands.NEXT, Action.NEXT), (Commands.ADD_WORD, Action.ADD_WORD)],
+    [(Commands.DELETE_WORD, Action.DELETE_WORD)],
+), ensure_ascii=False)[1:-1]
+# Вопрос с вводом перевода: только кнопки управления
+TYPED_KEYBOARD = f'{{"inline_keyboard": [{STUDY_CONTROLS}]}}'
+# Вариантов ответа в строке клавиатуры
+ANSWERS_PER_ROW = 2
+
+def study_keyboard(word_id: int, translation: str, distractors: List[str]) -> str:
+    """
+    Клавиатура вопроса: варианты ответа в случайном порядке и кнопки управления.
+
+    Args:
+        word_id (int): ID слова.
+        translation (str): Правильный перевод.
+        distractors (List[str]): Неверные варианты.
+
+    Returns:
+        str: JSON клавиатуры для reply_markup.
+    """
+    buttons = [{'text': translation, 'callback_data': encode(Action.ANSWER, word_id, CORRECT_CHOICE)}]
+    buttons += [{'text': text, 'callback_data': encode(Action.ANSWER, word_id, choice)}
+                for choice, text in enumerate(distractors, CORRECT_CHOICE + 1)]
+    random.shuffle(buttons)
+    rows = [buttons[i:i + ANSWERS_PER_ROW] for i in range(0, len(buttons), ANSWERS_PER_ROW)]
+    answers = json.dumps(rows, ensure_ascii=False)[1:-1]
+    return f'{{"inline_keyboard": [{answers}, {STUDY_CONTROLS}]}}'
+
+# Разделитель слова и перевода в строке списка: тире, двоеточие, знак равенства или табуляция
+PAIR_SEPARATOR = re.compile(r'\s*(?:\s[-–—]\s|[:=\t])\s*')
+# Максимальная длина слова и перевода (колонки word.value и word.translation)
+MAX_WORD_LENGTH = 248
+# Слов на странице /list и в результатах /find
+LIST_PAGE_SIZE = 10
+# Часовой пояс в /timezone: «+3», «-5:30», «UTC+05:45»
+UTC_OFFSET = re.compile(r'(?:UTC|GMT)?\s*([+-])?\s*(\d{1,2})(?::?(\d{2}))?$', re.IGNORECASE)
+
 def require_registration(func):
     """
     Декоратор, проверяющий регистрацию пользователя перед выполнением функции.
     Если пользователь не зарегистрирован — отправляет сообщение с кнопкой регистрации.
     """
-    def wrapper(message, *args, **kwargs):
-        user = get_user_by_id(message.from_user.id)
+    @functools.wraps(func)
+    async def wrapper(message, bot: AsyncTeleBot, *args, **kwargs):
+        user = await db.get_user_by_id(message.from_user.id)
         if not user:
-            markup = types.InlineKeyboardMarkup(row_width=1)
-            markup.add(types.InlineKeyboardButton(text='Регистрация',
-                                                  callback_data='reg_call'))
-            bot.send_message(message.chat.id,
-                             'Вы не зарегистрированы. Пройдите регистрацию.',
-                             reply_markup=markup)
+            await bot.send_message(message.chat.id,
+                                   'Вы не зарегистрированы. Пройдите регистрацию.',
+                                   reply_markup=Keyboards.REGISTER)
             return None
-        return func(message, *args, **kwargs)
+        return await func(message, bot, *args, **kwargs)
     return wrapper
 
-def registration(user_id: int, chat_id: int) -> None:
+async def registration(bot: AsyncTeleBot, user_id: int, chat_id: int) -> None:
     """
     Начало регистрации пользователя.
 
     Устанавливает состояние ожидания имени и отправляет сообщение.
 
     Args:
+        bot (AsyncTeleBot): Бот.
         user_id (int): Telegram ID пользователя.
         chat_id (int): ID чата, куда отправлять сообщения.
     """
-    if get_user_by_id(user_id):
-        bot.send_message(chat_id, 'Вы уже зарегистрированы')
+    if await db.get_user_by_id(user_id):
+        await bot.send_message(chat_id, 'Вы уже зарегистрированы')
         return
-    bot.set_state(user_id, States.wait_name, chat_id)
-    bot.send_message(chat_id, 'Введите ваше имя')
+    await bot.set_state(user_id, States.wait_name, chat_id)
+    await bot.send_message(chat_id, 'Введите ваше имя')
 
-def study(user_id: int, chat_id: int) -> None:
+async def show_message(bot: AsyncTeleBot, chat_id: int, text: str, markup=None,
+                       message_id: Optional[int] = None, parse_mode: Optional[str] = None) -> None:
+    """
+    Отправляет новое сообщение или, если задан message_id, заменяет текст
+    и клавиатуру существующего: один запрос к Bot API вместо двух.
+
+    Args:
+        bot (AsyncTeleBot): Бот.
+        chat_id (int): ID чата.
+        text (str): Текст сообщения.
+        markup: Inline-клавиатура: объект или готовый JSON (Keyboards).
+        message_id (Optional[int]): ID сообщения для редактирования.
+        parse_mode (Optional[str]): Режим разметки текста.
+    """
+    if message_id is None:
+        await bot.send_message(chat_id, text, reply_markup=markup, parse_mode=parse_mode)
+        return
+    try:
+        await bot.edit_message_text(text, chat_id, message_id, reply_markup=markup,
+                                    parse_mode=parse_mode)
+    except ApiTelegramException as e:
+        # Повторный показ того же слова с той же клавиатурой
+        if 'message is not modified' not in e.description:
+            raise
+
+@timed('scenario_seconds')
+async def study(bot: AsyncTeleBot, user_id: int, chat_id: int, notice: str = '',
+                message_id: Optional[int] = None, typed: bool = False) -> None:
     """
     Начало или продолжение учебы пользователя.
 
-    Показывает слово на изучение и варианты перевода, включая случайные "фейковые" переводы.
+    Показывает слово на изучение и варианты перевода: правильный и неверные из пула переводов.
     Добавляет кнопки управления: Дальше, Добавить слово, Удалить слово.
+    Уведомление (например, о верном ответе) объединяется с вопросом
+    в одно сообщение; с message_id вопрос заменяет предыдущий на месте.
+    В режиме typed вариантов ответа нет: пользователь пишет перевод сам.
 
     Args:
+        bot (AsyncTeleBot): Бот.
         user_id (int): Telegram ID пользователя.
         chat_id (int): ID чата, куда отправлять сообщение.
+        notice (str): Текст перед вопросом.
+        message_id (Optional[int]): ID сообщения с предыдущим вопросом.
+        typed (bool): Режим ввода перевода.
     """
-    word, translation, word_id = get_study_word(user_id)
-    if not word or not translation:
-        markup = types.InlineKeyboardMarkup(row_width=1)
-        markup.add(types.InlineKeyboardButton(text='Добавить слово',
-                                              callback_data='add_word_call'))
-        bot.send_message(chat_id, f'Нет слов для изучения',
-                         reply_markup=markup)
+    prefix = f'{notice}\n\n' if notice else ''
+    card = await study_sessions.next_card(user_id)
+    if not card:
+        await show_message(bot, chat_id, f'{prefix}Нет слов для изучения',
+                           Keyboards.NO_WORDS, message_id)
         return
-    buttons = []
-    fake_translation = [str(item) for item in fake.words(nb=3)]
-    buttons.append(types.InlineKeyboardButton(text=translation, callback_data=f'answer_{word_id}_correct'))
-    for i, fake_t in enumerate(fake_translation):
-        buttons.append(types.InlineKeyboardButton(text=fake_t,
-                                                  callback_data=f'answer_{word_id}_fake{i}'))
-    random.shuffle(buttons)
-    buttons.extend([
-        types.InlineKeyboardButton(text=Commands.NEXT, callback_data='next_call'),
-        types.InlineKeyboardButton(text=Commands.ADD_WORD, callback_data='add_word_call'),
-        types.InlineKeyboardButton(text=Commands.DELETE_WORD, callback_data='delete_word_call')
-    ])
-    markup = types.InlineKeyboardMarkup(row_width=2)
-    markup.add(*buttons)
-    bot.send_message(chat_id, f'Какой перевод у слова {word}?',
-                     reply_markup=markup)
-    bot.set_state(user_id, States.learning, chat_id)
-    with bot.retrieve_data(user_id, chat_id) as data:
+    word, word_id = card.value, card.word_id
+    if typed:
+        await show_message(bot, chat_id, f'{prefix}Напишите перевод слова {word}',
+                           TYPED_KEYBOARD, message_id)
+        await bot.set_state(user_id, States.typing, chat_id)
+    else:
+        markup = study_keyboard(word_id, card.translation, card.distractors)
+        await show_message(bot, chat_id, f'{prefix}Какой перевод у слова {word}?', markup, message_id)
+        await bot.set_state(user_id, States.learning, chat_id)
+    async with bot.retrieve_data(user_id, chat_id) as data:
             data['word_id'] = word_id
 
-def clear_inline_keyboard(call: CallbackQuery) -> None:
+def _word_lines(words: List[Tuple[str, str, int]]) -> str:
+    """Строки «слово — перевод» для HTML-сообщения."""
+    return '\n'.join(f'{html.escape(value)} — {html.escape(translation)}'
+                     for value, translation, _ in words)
+
+def list_keyboard(first_id: int, last_id: int, has_prev: bool, has_next: bool) -> Optional[str]:
+    """
+    Кнопки листания /list. Граница страницы передаётся в callback_data,
+    поэтому состояние листания не хранится на сервере.
+
+    Args:
+        first_id (int): ID первого слова страницы.
+        last_id (int): ID последнего слова страницы.
+        has_prev (bool): Есть предыдущая страница.
+        has_next (bool): Есть следующая страница.
+
+    Returns:
+        Optional[str]: JSON клавиатуры или None, если листать некуда.
+    """
+    buttons = []
+    if has_prev:
+        buttons.append({'text': '◀ Назад', 'callback_data': encode(Action.LIST_PAGE, first_id, 1)})
+    if has_next:
+        buttons.append({'text': 'Дальше ▶', 'callback_data': encode(Action.LIST_PAGE, last_id, 0)})
+    if not buttons:
+        return None
+    return json.dumps({'inline_keyboard': [buttons]}, ensure_ascii=False)
+
+async def show_word_page(bot: AsyncTeleBot, user_id: int, chat_id: int, anchor: int = 0,
+                         backward: bool = False, message_id: Optional[int] = None) -> None:
+    """
+    Показывает страницу словаря пользователя после слова anchor
+    (или перед ним, с backward); с message_id заменяет предыдущую страницу.
+
+    Args:
+        bot (AsyncTeleBot): Бот.
+        user_id (int): Telegram ID пользователя.
+        chat_id (int): ID чата.
+        anchor (int): ID слова-границы; 0 - первая страница.
+        backward (bool): Листать назад.
+        message_id (Optional[int]): ID сообщения с предыдущей страницей.
+    """
+    # Лишнее слово показывает, есть ли страница дальше в направлении листания
+    words = await db.list_words(user_id, anchor, backward, LIST_PAGE_SIZE + 1)
+    if backward and len(words) <= LIST_PAGE_SIZE:
+        # Дошли до начала словаря: показываем первую страницу целиком
+        anchor, backward = 0, False
+        words = await db.list_words(user_id, 0, False, LIST_PAGE_SIZE + 1)
+    more = len(words) > LIST_PAGE_SIZE
+    words = words[:LIST_PAGE_SIZE]
+    if not words:
+        await show_message(bot, chat_id, 'В словаре нет слов', Keyboards.NO_WORDS, message_id)
+        return
+    if backward:
+        words.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = anchor > 0, more
+    markup = list_keyboard(words[0][2], words[-1][2], has_prev, has_next)
+    await show_message(bot, chat_id, f'<b>Ваш словарь</b>\n{_word_lines(words)}', markup,
+                       message_id, parse_mode='HTML')
+
+def found_text(query: str, words: List[Tuple[str, str, int]]) -> str:
+    """
+    Текст результатов /find.
+
+    Args:
+        query (str): Поисковый запрос.
+        words (List[Tuple[str, str, int]]): Найденные слова.
+    """
+    if not words:
+        return f'По запросу «{html.escape(query)}» ничего не найдено'
+    return f'<b>Найдено по запросу «{html.escape(query)}»</b>\n{_word_lines(words)}'
+
+async def clear_inline_keyboard(bot: AsyncTeleBot, call: CallbackQuery) -> None:
     """
     Убирает inline-клавиатуру у сообщения.
 
     Args:
+        bot (AsyncTeleBot): Бот.
         call (CallbackQuery): Объект callback запроса от Telegram.
     """
-    bot.answer_callback_query(call.id)
-    bot.edit_message_reply_markup(
+    await bot.answer_callback_query(call.id)
+    await bot.edit_message_reply_markup(
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         reply_markup=None
     )
 
-fake = Faker()
+def typed_verdict(grade, translation: str) -> str:
+    """
+    Текст результата введённого ответа.
+
+    Args:
+        grade (fuzzy.Grade): Оценка ответа.
+        translation (str): Правильный перевод.
+
+    Returns:
+        str: Текст для пользователя.
+    """
+    if grade.exact:
+        return 'Верный ответ'
+    if grade.correct:
+        return f'Почти верно, правильно: {translation}'
+    if grade.other_word:
+        return f'Неверный ответ: это перевод другого слова. Правильный: {translation}'
+    return f'Неверный ответ. Правильный: {translation}'
+
+def stats_text(stats) -> str:
+    """
+    Текст статистики для /stats.
+
+    Args:
+        stats (StatsInfo): Статистика ответов пользователя.
+    """
+    if not stats.answers:
+        return 'Вы ещё не отвечали на вопросы. Начните обучение: /study'
+    lines = [
+        '<b>Ваша статистика</b>',
+        f'Ответов: {stats.answers}, верных: {stats.correct} '
+        f'({stats.correct * 100 // stats.answers}%)',
+        f'Серия верных ответов: {stats.streak} (лучшая: {stats.best_streak})',
+    ]
+    if stats.latency_count:
+        lines.append(f'Среднее время ответа: '
+                     f'{stats.latency_ms_total / stats.latency_count / 1000:.1f} с')
+    return '\n'.join(lines)
+
+def parse_word_pairs(text: str) -> List[Tuple[str, str]]:
+    """
+    Разбирает список слов, вставленный одним сообщением: по паре
+    «слово - перевод» на строке. Строки без разделителя и слишком длинные
+    слова пропускаются.
+
+    Args:
+        text (str): Текст сообщения.
+
+    Returns:
+        List[Tuple[str, str]]: Пары (слово на русском, перевод).
+    """
+    pairs = []
+    for line in text.splitlines():
+        parts = PAIR_SEPARATOR.split(line.strip(), maxsplit=1)
+        if len(parts) != 2:
+            continue
+        value, translation = parts[0].strip(), parts[1].strip()
+        if value and translation and max(len(value), len(translation)) <= MAX_WORD_LENGTH:
+            pairs.append((value, translation))
+    return pairs
+
+def parse_utc_offset(text: str) -> Optional[int]:
+    """
+    Разбирает часовой пояс пользователя.
+
+    Args:
+        text (str): Смещение от UTC: «+3», «-5:30», «UTC+05:45».
+
+    Returns:
+        Optional[int]: Смещение в минутах или None, если формат неверный
+        или смещение вне диапазона UTC-12...UTC+14.
+    """
+    match = UTC_OFFSET.match(text.strip())
+    if not match:
+        return None
+    sign, hours, minutes = match.groups()
+    if int(minutes or 0) >= 60:
+        return None
+    offset = int(hours) * 60 + int(minutes or 0)
+    if sign == '-':
+        offset = -offset
+    return offset if -12 * 60 <= offset <= 14 * 60 else None
 
 HELP_TEXT: str = (
         "<b>Справка по боту</b>\n\n"
@@ -119,9 +369,16 @@ HELP_TEXT: str = (
         "/register - Зарегистрироваться в боте\n"
         "/id - Узнать ваш Telegram ID и имя\n"
         "/change_name - Изменить имя пользователя\n"
-        "/study - Начать учебу: бот покажет слово и варианты перевода\n\n"
+        "/study - Начать учебу: бот покажет слово и варианты перевода\n"
+        "/type - Учеба с вводом перевода; опечатки засчитываются\n"
+        "/stats - Статистика ответов\n"
+        "/list - Просмотр словаря по страницам\n"
+        "/find слово - Поиск по словарю\n"
+        "/timezone +3 - Указать часовой пояс для напоминаний\n"
+        "/reminders on|off - Включить или выключить напоминания\n\n"
         "Во время учебы доступны кнопки:\n"
         f"  • {Commands.NEXT} - Пропустить слово и перейти к следующему\n"
-        f"  • {Commands.ADD_WORD} - Добавить новое слово в словарь\n"
+        f"  • {Commands.ADD_WORD} - Добавить новое слово в словарь "
+        "или список слов строками «слово - перевод»\n"
         f"  • {Commands.DELETE_WORD} - Удалить текущее слово из словаря"
     )
\ No newline at end of file
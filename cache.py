@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Ограниченный по размеру LRU-кэш с временем жизни записей.
+
+    При переполнении вытесняется самая давно использованная запись,
+    устаревшие записи удаляются при обращении к ним.
+
+    Attributes:
+        maxsize (int): Максимальное количество записей.
+        ttl (float): Время жизни записи в секундах.
+        hits (int): Количество попаданий в кэш.
+        misses (int): Количество промахов.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Возвращает значение по ключу или None, если записи нет или она устарела.
+
+        Args:
+            key (Hashable): Ключ записи.
+        """
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        value, expires_at = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Сохраняет значение, вытесняя самую старую запись при переполнении.
+
+        Args:
+            key (Hashable): Ключ записи.
+            value (Any): Значение.
+        """
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Удаляет запись из кэша, если она есть.
+
+        Args:
+            key (Hashable): Ключ записи.
+        """
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Очищает кэш и сбрасывает счётчики."""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику кэша.
+
+        Returns:
+            dict: размер, попадания и промахи.
+        """
+        return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
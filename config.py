@@ -1,8 +1,6 @@
 import os
 from dotenv import load_dotenv
-import sqlalchemy as sq
-from sqlalchemy.orm import sessionmaker
-from models import create_tables
+from typing import Dict
 
 load_dotenv()
 
@@ -15,17 +13,228 @@ DB_PASSWORD = os.getenv('DB_PASSWORD')
 DB_NAME = os.getenv('DB_TABLE_NAME')
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
-if not all([DB_DRIVER, DB_HOST, DB_PORT, DB_LOGIN, DB_PASSWORD, DB_NAME, BOT_TOKEN]):
-    raise ValueError("Не все переменные окружения заданы!")
+# Необязательная реплика для чтения (тот же логин, пароль и база)
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST')
+DB_REPLICA_PORT = os.getenv('DB_REPLICA_PORT', DB_PORT)
 
-# Формируем строку подключения к базе данных
-DSN = f'{DB_DRIVER}://{DB_LOGIN}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+# Пул соединений: постоянные соединения, дополнительные сверх них,
+# ожидание свободного соединения и пересоздание соединений старше N секунд
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+# Ограничение времени выполнения запроса в PostgreSQL, миллисекунд (0 - без ограничения)
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 0))
 
-# Создаем SQLAlchemy engine
-engine = sq.create_engine(DSN)
+# Необязательные параметры кэша пользователей
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 300))
 
-# Создаем таблицы в базе данных, если их нет
-create_tables(engine)
+# Режим привязки базовых слов к новому пользователю: shared - подписка на
+# общую колоду (строки users_words только для показанных слов), eager - копия
+# всех слов при регистрации, lazy - копия при первом обращении к обучению
+BASE_WORDS_MODE = os.getenv('BASE_WORDS_MODE', 'shared')
 
-# Создаем фабрику сессий
-Session = sessionmaker(bind=engine)
+if BASE_WORDS_MODE not in ('shared', 'eager', 'lazy'):
+    raise ValueError("BASE_WORDS_MODE должен быть 'shared', 'eager' или 'lazy'")
+
+# Хранилище состояний FSM: memory, sql или redis
+STATE_STORAGE = os.getenv('STATE_STORAGE', 'memory')
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+# Период отложенной записи состояний в sql/redis, секунд
+STATE_FLUSH_INTERVAL = float(os.getenv('STATE_FLUSH_INTERVAL', 0.5))
+
+if STATE_STORAGE not in ('memory', 'sql', 'redis'):
+    raise ValueError("STATE_STORAGE должен быть 'memory', 'sql' или 'redis'")
+
+# Режим получения обновлений: polling или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+# Параметры webhook: публичный адрес, путь, секрет и адрес HTTP-сервера
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8080))
+# Пул обработчиков: количество, размер очереди каждого и ожидание места в очереди
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 64))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 100))
+WEBHOOK_QUEUE_TIMEOUT = float(os.getenv('WEBHOOK_QUEUE_TIMEOUT', 5))
+
+# Несколько процессов: количество процессов-обработчиков и предел обновлений,
+# принятых процессом, но ещё не обработанных (они повторяются при его падении)
+BOT_PROCESSES = int(os.getenv('BOT_PROCESSES', 1))
+SHARD_MAX_IN_FLIGHT = int(os.getenv('SHARD_MAX_IN_FLIGHT', 1000))
+
+# Учебная сессия: сколько слов загружать за раз, через сколько ответов
+# записывать результаты в базу и через сколько секунд простоя завершать сессию
+STUDY_BATCH_SIZE = int(os.getenv('STUDY_BATCH_SIZE', 10))
+STUDY_FLUSH_EVERY = int(os.getenv('STUDY_FLUSH_EVERY', 10))
+STUDY_SESSION_TIMEOUT = float(os.getenv('STUDY_SESSION_TIMEOUT', 300))
+
+# Исходящие запросы к Bot API: общий лимит бота (по всем процессам, делится
+# между ними) и лимит чата (сообщений в секунду), допустимая пачка сообщений
+# в чат и число повторов после ответа 429
+TG_GLOBAL_RATE = float(os.getenv('TG_GLOBAL_RATE', 30))
+TG_CHAT_RATE = float(os.getenv('TG_CHAT_RATE', 1))
+TG_CHAT_BURST = float(os.getenv('TG_CHAT_BURST', 3))
+TG_MAX_RETRIES = int(os.getenv('TG_MAX_RETRIES', 3))
+# Адрес Bot API, например локальный сервер или заглушка для тестов
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+
+# Повторные обновления: хранилище ключей (memory, redis - общее для процессов, off),
+# сколько секунд помнить update_id, окно повторного нажатия кнопки (секунд)
+# и сколько ключей хранить в памяти процесса
+DEDUP_STORAGE = os.getenv('DEDUP_STORAGE', 'memory')
+DEDUP_UPDATE_TTL = float(os.getenv('DEDUP_UPDATE_TTL', 600))
+DEDUP_TAP_WINDOW = float(os.getenv('DEDUP_TAP_WINDOW', 1))
+DEDUP_INFLIGHT_TTL = float(os.getenv('DEDUP_INFLIGHT_TTL', 10))
+DEDUP_CACHE_SIZE = int(os.getenv('DEDUP_CACHE_SIZE', 100000))
+
+# Напоминания: период запуска рассылки (секунд, 0 - выключены), часы рассылки
+# по местному времени пользователя, смещение от UTC по умолчанию (минут),
+# через сколько часов без ответов напоминать (и не чаще), скорость отправки
+# (сообщений в секунду), параллельность и пачка пользователей между контрольными точками
+REMINDER_INTERVAL = float(os.getenv('REMINDER_INTERVAL', 0))
+REMINDER_HOUR_FROM = int(os.getenv('REMINDER_HOUR_FROM', 10))
+REMINDER_HOUR_TO = int(os.getenv('REMINDER_HOUR_TO', 21))
+REMINDER_DEFAULT_UTC_OFFSET = int(os.getenv('REMINDER_DEFAULT_UTC_OFFSET', 180))
+REMINDER_IDLE_HOURS = float(os.getenv('REMINDER_IDLE_HOURS', 24))
+REMINDER_RATE = float(os.getenv('REMINDER_RATE', 20))
+REMINDER_CONCURRENCY = int(os.getenv('REMINDER_CONCURRENCY', 50))
+REMINDER_BATCH = int(os.getenv('REMINDER_BATCH', 500))
+
+# Метрики: запись включена при старте, порт локального HTTP-сервера (0 - не запускать)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+if BOT_MODE not in ('polling', 'webhook'):
+    raise ValueError("BOT_MODE должен быть 'polling' или 'webhook'")
+
+if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+    raise ValueError("Для BOT_MODE=webhook нужно задать WEBHOOK_URL")
+# Без секрета любой, кто знает адрес, может отправлять боту поддельные обновления
+if BOT_MODE == 'webhook' and not WEBHOOK_SECRET:
+    raise ValueError("Для BOT_MODE=webhook нужно задать WEBHOOK_SECRET")
+
+# Готовая строка подключения вместо DB_DRIVER, DB_HOST и т.д.,
+# например sqlite+aiosqlite:///bench.db для нагрузочного теста
+DB_DSN = os.getenv('DB_DSN')
+
+# Параметры базы проверяются при создании engine, а BOT_TOKEN - при создании
+# бота, поэтому модуль можно импортировать без настроенного окружения
+DB_CONFIGURED = bool(DB_DSN or all([DB_DRIVER, DB_HOST, DB_PORT, DB_LOGIN,
+                                    DB_PASSWORD, DB_NAME]))
+
+# Формируем строку подключения к базе данных.
+# Драйвер должен быть асинхронным, например postgresql+psycopg или postgresql+asyncpg
+DSN = DB_DSN or f'{DB_DRIVER}://{DB_LOGIN}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+DB_DRIVER = DSN.split('://', 1)[0]
+
+
+def _connect_args() -> dict:
+    """
+    Возвращает параметры подключения драйвера: statement_timeout для PostgreSQL.
+    """
+    if not DB_STATEMENT_TIMEOUT or not DB_DRIVER.startswith('postgresql'):
+        return {}
+    if DB_DRIVER.endswith('asyncpg'):
+        return {'server_settings': {'statement_timeout': str(DB_STATEMENT_TIMEOUT)}}
+    return {'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'}
+
+
+def _create_engine(dsn: str, name: str):
+    """
+    Создаёт асинхронный engine с настройками пула из окружения.
+    pool_pre_ping проверяет соединение перед выдачей, поэтому разорванные
+    сервером соединения заменяются незаметно для запросов.
+
+    Args:
+        dsn (str): Строка подключения.
+        name (str): Имя пула в метриках.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from db_pool import metered_pool
+
+    from metrics import instrument_engine
+
+    if not DB_CONFIGURED:
+        raise ValueError("Не все переменные окружения заданы!")
+    engine = create_async_engine(dsn,
+                                 poolclass=metered_pool(name),
+                                 pool_size=DB_POOL_SIZE,
+                                 max_overflow=DB_MAX_OVERFLOW,
+                                 pool_timeout=DB_POOL_TIMEOUT,
+                                 pool_recycle=DB_POOL_RECYCLE,
+                                 pool_pre_ping=True,
+                                 connect_args=_connect_args())
+    # Счётчики SQL-запросов для метрик
+    instrument_engine(engine)
+    return engine
+
+
+# Созданные engine по имени пула: создаются при первом обращении,
+# импорт модуля не загружает драйвер базы и не проверяет параметры
+_engines: Dict[str, object] = {}
+
+
+def get_engine():
+    """
+    Возвращает асинхронный SQLAlchemy engine основной базы, создавая его при первом вызове.
+
+    Returns:
+        AsyncEngine: Engine основной базы.
+    """
+    if 'primary' not in _engines:
+        _engines['primary'] = _create_engine(DSN, 'primary')
+    return _engines['primary']
+
+
+def get_replica_engine():
+    """
+    Возвращает engine реплики для запросов только на чтение
+    или None, если реплика не задана.
+
+    Returns:
+        Optional[AsyncEngine]: Engine реплики.
+    """
+    if not DB_REPLICA_HOST:
+        return None
+    if 'replica' not in _engines:
+        _engines['replica'] = _create_engine(f'{DB_DRIVER}://{DB_LOGIN}:{DB_PASSWORD}@'
+                                             f'{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_NAME}',
+                                             'replica')
+    return _engines['replica']
+
+
+def engines() -> Dict[str, object]:
+    """Возвращает уже созданные engine по имени пула."""
+    return dict(_engines)
+
+
+class LazySessionmaker:
+    """
+    Фабрика асинхронных сессий, создающая engine при первой сессии.
+    Используется как async_sessionmaker: async with Session() as session.
+
+    Attributes:
+        get_bind: Функция, возвращающая engine.
+    """
+
+    def __init__(self, get_bind) -> None:
+        self.get_bind = get_bind
+        self._factory = None
+
+    def __call__(self, **kwargs):
+        if self._factory is None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker
+            # expire_on_commit=False: после commit атрибуты объектов остаются доступными
+            # без повторного обращения к базе (ленивые загрузки в asyncio недоступны)
+            self._factory = async_sessionmaker(bind=self.get_bind(), expire_on_commit=False)
+        return self._factory(**kwargs)
+
+
+# Фабрика асинхронных сессий основной базы
+Session = LazySessionmaker(get_engine)
+# Фабрика сессий только для чтения: реплика, если задана
+ReadSession = LazySessionmaker(lambda: get_replica_engine() or get_engine())
\ No newline at end of file
@@ -1,34 +1,196 @@
-from datetime import datetime
-from typing import Tuple
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
-from models import User, Words, Users_words
-from config import Session
+import sqlalchemy as sq
+from sqlalchemy import (select, insert, update, delete, exists, literal, or_,
+                        values, column, bindparam, union_all)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 
+from cache import TTLCache
+from distractors import distractor_pool
+from fuzzy import translation_index
+from search import word_index, MIN_TRIGRAM_QUERY
+from models import (User, Words, Users_words, AnswerEvent, UserStats, ReminderRun,
+                    Deck, DeckWord, UserDeck, BASE_DECK)
+from scheduler import Card, review, SHOWN_DELAY
+from db_pool import pool_stats
+from metrics import registry, timed
+from config import (get_engine, engines, Session, ReadSession,
+                    USER_CACHE_SIZE, USER_CACHE_TTL, BASE_WORDS_MODE)
 
-def add_base_words(path: str) -> None:
+
+class UserInfo(NamedTuple):
+    """
+    Данные пользователя, кэшируемые по Telegram ID.
+
+    Attributes:
+        id (int): PK пользователя.
+        username (Optional[str]): Имя пользователя.
+        base_linked (bool): Привязаны ли базовые слова (скопированы
+            или оформлена подписка на колоду).
+    """
+    id: int
+    username: Optional[str]
+    base_linked: bool = True
+
+class StatsInfo(NamedTuple):
+    """
+    Статистика ответов пользователя (строка user_stats).
+
+    Attributes:
+        answers (int): Всего ответов.
+        correct (int): Верных ответов.
+        streak (int): Текущая серия верных ответов.
+        best_streak (int): Лучшая серия.
+        latency_ms_total (int): Сумма времени ответов, мс.
+        latency_count (int): Ответов с известным временем.
+        last_answer_at (Optional[datetime]): Время последнего ответа.
     """
-    Загружает базовые слова из JSON-файла и добавляет их в таблицу Words.
-    Если базовые слова уже есть, ничего не делает.
+    answers: int = 0
+    correct: int = 0
+    streak: int = 0
+    best_streak: int = 0
+    latency_ms_total: int = 0
+    latency_count: int = 0
+    last_answer_at: Optional[datetime] = None
+
+def accumulate_stats(stats: StatsInfo, answers: List[tuple]) -> StatsInfo:
+    """
+    Добавляет ответы к статистике.
 
     Args:
-        path (str): Путь к JSON-файлу с базовыми словами.
+        stats (StatsInfo): Текущая статистика.
+        answers (List[tuple]): (верен ли ответ, время ответа, задержка в мс
+            или None) в порядке ответов.
+
+    Returns:
+        StatsInfo: Новая статистика.
     """
-    with Session() as session:
-        if session.query(Words).filter_by(base_word=True).first():
-            return
-        import json
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            for item in data:
-                word = Words(value=item['word'],
-                             translation=item['translation'],
-                             base_word=True)
-                session.add(word)
-            session.commit()
+    answered, correct, streak, best = stats.answers, stats.correct, stats.streak, stats.best_streak
+    latency_total, latency_count, last = stats.latency_ms_total, stats.latency_count, stats.last_answer_at
+    for is_correct, answered_at, latency_ms in answers:
+        answered += 1
+        if is_correct:
+            correct += 1
+            streak += 1
+            best = max(best, streak)
+        else:
+            streak = 0
+        if latency_ms is not None:
+            latency_total += latency_ms
+            latency_count += 1
+        last = answered_at
+    return StatsInfo(answered, correct, streak, best, latency_total, latency_count, last)
+
+# Кэш tg_id -> UserInfo, через который проходят все поиски пользователя
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+# Сколько пар слов добавлять одним INSERT
+ADD_WORDS_BATCH = 500
+# Кандидатов поиска, проверяемых по словарю пользователя одним запросом
+FIND_CHECK_BATCH = 500
+# Больше стольких лучших кандидатов поиска по словарю не проверяется:
+# время поиска не растёт вместе с общей таблицей слов
+FIND_MAX_CANDIDATES = 2000
+
+async def _get_user(session, tg_id: int) -> Optional[UserInfo]:
+    """
+    Ищет пользователя сначала в кэше, затем в базе, и кэширует результат.
+
+    Args:
+        session (AsyncSession): Открытая сессия.
+        tg_id (int): Telegram ID пользователя.
+
+    Returns:
+        UserInfo или None, если пользователь не найден.
+    """
+    user = user_cache.get(tg_id)
+    if user:
+        return user
+    row = (await session.execute(select(User.id, User.username, User.base_linked)
+                                 .filter_by(tg_id=tg_id))).first()
+    if not row:
+        return None
+    user = UserInfo(row.id, row.username, row.base_linked)
+    user_cache.set(tg_id, user)
+    return user
+
+
+def _dialect_insert(model):
+    """INSERT с поддержкой ON CONFLICT для диалекта текущего engine."""
+    if get_engine().dialect.name == 'sqlite':
+        return sqlite_insert(model)
+    return pg_insert(model)
 
-def create_user(tg_id: int, username: str) -> bool:
+def insert_or_ignore(model):
     """
-    Создаёт нового пользователя и добавляет ему все базовые слова.
+    INSERT, пропускающий строки, которые нарушают уникальные ограничения
+    (ON CONFLICT DO NOTHING для PostgreSQL и SQLite).
+
+    Args:
+        model: Модель SQLAlchemy.
+    """
+    return _dialect_insert(model).on_conflict_do_nothing()
+
+def upsert(model, values, index_elements: list, update_columns: list):
+    """
+    INSERT ... ON CONFLICT DO UPDATE: вставляет строки или обновляет
+    указанные колонки существующих.
+
+    Args:
+        model: Модель SQLAlchemy.
+        values (dict | list[dict]): Значения колонок одной или нескольких строк.
+        index_elements (list): Колонки уникального ключа.
+        update_columns (list): Колонки, обновляемые при конфликте.
+    """
+    stmt = _dialect_insert(model).values(values)
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: stmt.excluded[column] for column in update_columns}
+    )
+
+def _link_base_words(user_id: int):
+    """
+    Запрос INSERT ... SELECT, привязывающий пользователю все базовые слова
+    одним set-based выражением, без загрузки слов в Python.
+
+    Args:
+        user_id (int): PK пользователя.
+    """
+    return insert(Users_words).from_select(
+        ['user_id', 'word_id'],
+        select(literal(user_id), Words.id).filter(Words.base_word.is_(True))
+    )
+
+def _subscribe_base_deck(user_id: int):
+    """
+    Запрос, подписывающий пользователя на колоду базовых слов: одна строка
+    user_deck вместо строки users_words на каждое базовое слово.
+
+    Args:
+        user_id (int): PK пользователя.
+    """
+    return insert_or_ignore(UserDeck).from_select(
+        ['user_id', 'deck_id'],
+        select(literal(user_id), Deck.id).where(Deck.name == BASE_DECK)
+    )
+
+def _link_base(user_id: int):
+    """Привязка базовых слов в текущем режиме: подписка или копия слов."""
+    if BASE_WORDS_MODE == 'shared':
+        return _subscribe_base_deck(user_id)
+    return _link_base_words(user_id)
+
+@timed('db_seconds')
+async def create_user(tg_id: int, username: str) -> bool:
+    """
+    Создаёт нового пользователя и добавляет ему все базовые слова:
+    в режиме BASE_WORDS_MODE=shared - подпиской на колоду базовых слов,
+    в режиме eager - копией слов в users_words. В режиме lazy базовые слова
+    привязываются при первом обращении к обучению, и регистрация выполняет
+    один INSERT.
 
     Args:
         tg_id (int): Telegram ID пользователя.
@@ -37,20 +199,57 @@ def create_user(tg_id: int, username: str) -> bool:
     Returns:
         bool: True если пользователь создан, False если уже существует.
     """
-    with Session() as session:
-        if session.query(User).filter_by(tg_id=tg_id).first():
+    eager = BASE_WORDS_MODE != 'lazy'
+    async with Session() as session:
+        if await _get_user(session, tg_id):
+            return False
+        try:
+            # Пользователь и его базовые слова создаются в одной транзакции
+            user_id = await session.scalar(insert(User)
+                                           .values(tg_id=tg_id, username=username,
+                                                   base_linked=eager)
+                                           .returning(User.id))
+            if eager:
+                await session.execute(_link_base(user_id))
+            await session.commit()
+        except IntegrityError:
+            # Параллельная регистрация того же пользователя
+            await session.rollback()
             return False
-        user = User(tg_id=tg_id, username=username)
-        session.add(user)
-        session.commit()
-        words = session.query(Words).filter_by(base_word=True).all()
-        for word in words:
-            user_word = Users_words(user_id=user.id, word_id=word.id)
-            session.add(user_word)
-        session.commit()
+        user_cache.set(tg_id, UserInfo(user_id, username, eager))
         return True
 
-def rename_user(tg_id: int, username: str) -> bool:
+@timed('db_seconds')
+async def ensure_base_words(tg_id: int) -> bool:
+    """
+    Привязывает базовые слова пользователю, зарегистрированному в режиме lazy:
+    копирует их или, в режиме shared, подписывает на колоду.
+    Повторные вызовы не обращаются к базе: флаг base_linked хранится в кэше.
+
+    Args:
+        tg_id (int): Telegram ID пользователя.
+
+    Returns:
+        bool: True, если слова привязаны этим вызовом.
+    """
+    async with Session() as session:
+        user = await _get_user(session, tg_id)
+        if not user or user.base_linked:
+            return False
+        # UPDATE блокирует строку пользователя, поэтому параллельный вызов
+        # не привяжет слова повторно
+        user_id = await session.scalar(update(User)
+                                       .filter_by(id=user.id, base_linked=False)
+                                       .values(base_linked=True)
+                                       .returning(User.id))
+        if user_id is not None:
+            await session.execute(_link_base(user_id))
+        await session.commit()
+        user_cache.set(tg_id, user._replace(base_linked=True))
+        return user_id is not None
+
+@timed('db_seconds')
+async def rename_user(tg_id: int, username: str) -> bool:
     """
    Изменяет имя пользователя.
 
@@ -59,15 +258,25 @@ def rename_user(tg_id: int, username: str) -> bool:
        username (str): Новое имя пользователя.
 
    Returns:
-       bool: Всегда True (успешно изменено).
+       bool: True если имя изменено, False если пользователь не найден.
    """
-    with Session() as session:
-        user = session.query(User).filter_by(tg_id=tg_id).first()
-        user.username = username
-        session.commit()
+    async with Session() as session:
+        row = (await session.execute(update(User).filter_by(tg_id=tg_id)
+                                     .values(username=username)
+                                     .returning(User.id, User.base_linked))).first()
+        await session.commit()
+        if not row:
+            user_cache.invalidate(tg_id)
+            return False
+        user_cache.set(tg_id, UserInfo(row.id, username, row.base_linked))
         return True
 
-def add_word(tg_id: int, value: str, translation: str) -> bool:
+def word_key(value, translation):
+    """Ключ слова без учёта регистра - выражение уникального индекса word."""
+    return sq.tuple_(sq.func.lower(value), sq.func.lower(translation))
+
+@timed('db_seconds')
+async def add_word(tg_id: int, value: str, translation: str) -> bool:
     """
     Добавляет новое слово пользователю. Если слово уже есть, добавляет связь с пользователем.
 
@@ -79,28 +288,69 @@ def add_word(tg_id: int, value: str, translation: str) -> bool:
     Returns:
         bool: True если слово добавлено или уже есть, False если пользователь не найден.
     """
-    with Session() as session:
-        user = session.query(User).filter_by(tg_id=tg_id).first()
+    return await add_words(tg_id, [(value, translation)]) is not None
+
+@timed('db_seconds')
+async def add_words(tg_id: int, pairs: List[Tuple[str, str]]) -> Optional[int]:
+    """
+    Добавляет пользователю несколько слов в одной транзакции, по два запроса
+    на каждые ADD_WORDS_BATCH пар: INSERT ... ON CONFLICT DO NOTHING в word
+    и INSERT ... SELECT ... ON CONFLICT DO UPDATE в users_words, который
+    возвращает в словарь удалённые пользователем слова колоды.
+    Слова сравниваются без учёта регистра и пробелов по краям, поэтому
+    одновременное добавление одного слова не создаёт дубликатов.
+    Новые слова сразу попадают в пул неверных вариантов и индекс переводов.
+
+    Args:
+        tg_id (int): Telegram ID пользователя.
+        pairs (List[Tuple[str, str]]): Пары (слово на русском, перевод).
+
+    Returns:
+        Optional[int]: Количество слов, которых у пользователя ещё не было,
+        или None, если пользователь не найден.
+    """
+    unique = {}
+    for value, translation in pairs:
+        value, translation = value.strip(), translation.strip()
+        if value and translation:
+            unique.setdefault((value.lower(), translation.lower()), (value, translation))
+    async with Session() as session:
+        user = await _get_user(session, tg_id)
         if not user:
-            return False
-        word = session.query(Words).filter_by(value=value,
-                                              translation=translation).first()
-        if word:
-            user_word = session.query(Users_words).filter_by(user_id=user.id, word_id=word.id).first()
-            if user_word:
-                return True
-            session.add(Users_words(user_id=user.id, word_id=word.id))
-            session.commit()
-            return True
-        else:
-            word = Words(value=value, translation=translation, base_word=False)
-            session.add(word)
-            session.flush()
-            session.add(Users_words(user_id=user.id, word_id=word.id))
-            session.commit()
-            return True
+            return None
+        rows = list(unique.values())
+        linked = 0
+        new_words = []
+        for start in range(0, len(rows), ADD_WORDS_BATCH):
+            batch = rows[start:start + ADD_WORDS_BATCH]
+            new_words += (await session.execute(
+                insert_or_ignore(Words)
+                .values([{'value': value, 'translation': translation, 'base_word': False}
+                         for value, translation in batch])
+                .returning(Words.id, Words.translation)
+            )).all()
+            keys = [word_key(sq.literal(value), sq.literal(translation))
+                    for value, translation in batch]
+            link = _dialect_insert(Users_words).from_select(
+                ['user_id', 'word_id'],
+                select(literal(user.id), Words.id)
+                .where(word_key(Words.value, Words.translation).in_(keys),
+                       # Непоказанное слово колоды уже есть в словаре пользователя
+                       ~_unseen_deck_words(user.id).where(DeckWord.word_id == Words.id).exists())
+            )
+            linked += len((await session.execute(
+                link.on_conflict_do_update(index_elements=['user_id', 'word_id'],
+                                           set_={'hidden': False},
+                                           where=Users_words.hidden.is_(True))
+                .returning(Users_words.id)
+            )).all())
+        await session.commit()
+    distractor_pool.extend(translation for _, translation in new_words)
+    translation_index.extend(new_words)
+    return linked
 
-def delete_word(tg_id: int, word_id: int) -> bool:
+@timed('db_seconds')
+async def delete_word(tg_id: int, word_id: int) -> bool:
     """
     Удаляет слово из словаря пользователя. Если слово не используется другими
     пользователями и не является базовым, удаляет его полностью.
@@ -110,71 +360,517 @@ def delete_word(tg_id: int, word_id: int) -> bool:
         word_id (int): ID слова.
 
     Returns:
-        bool: True если слово удалено или не найдено у пользователя, False если пользователь не найден.
+        bool: True если слово удалено, False если пользователь не найден
+        или у него нет этого слова.
+    """
+    return await delete_words(tg_id, [word_id]) > 0
+
+@timed('db_seconds')
+async def delete_words(tg_id: int, word_ids: List[int]) -> int:
     """
-    with Session() as session:
-        user = session.query(User).filter_by(tg_id=tg_id).first()
+    Удаляет несколько слов из словаря пользователя в одной транзакции:
+    DELETE связей пользователя с RETURNING и DELETE ставших ненужными
+    небазовых слов с проверкой NOT EXISTS по индексам users_words.word_id
+    и deck_word.word_id.
+    Слова колод, на которые подписан пользователь, не удаляются, а
+    скрываются строкой users_words с hidden. Удалённые из word слова
+    убираются из индекса переводов, поискового индекса и пула неверных
+    вариантов.
+
+    Args:
+        tg_id (int): Telegram ID пользователя.
+        word_ids (List[int]): ID слов.
+
+    Returns:
+        int: Количество удалённых из словаря слов.
+    """
+    if not word_ids:
+        return 0
+    async with Session() as session:
+        user = await _get_user(session, tg_id)
         if not user:
-            return False
-        user_word = (session.query(Users_words).join(Words)
-                     .filter(Words.id == word_id).first())
-        if not user_word:
-            return False
-        session.delete(user_word)
-        check = session.query(Users_words).filter_by(word_id=word_id).count()
-        word = session.query(Words).filter_by(id=word_id).first()
-        if word and not word.base_word and check==0:
-            session.delete(word)
-        return True
+            return 0
+        word_ids = set(word_ids)
+        deck_words = set((await session.scalars(
+            _deck_words(user.id).where(DeckWord.word_id.in_(word_ids)).distinct()
+        )).all())
+        hidden = 0
+        if deck_words:
+            hide = _dialect_insert(Users_words).values(
+                [{'user_id': user.id, 'word_id': word_id, 'hidden': True}
+                 for word_id in deck_words])
+            hidden = len((await session.execute(
+                hide.on_conflict_do_update(index_elements=['user_id', 'word_id'],
+                                           set_={'hidden': True},
+                                           where=Users_words.hidden.is_(False))
+                .returning(Users_words.word_id)
+            )).all())
+            word_ids -= deck_words
+        deleted = []
+        if word_ids:
+            deleted = (await session.scalars(
+                delete(Users_words)
+                .where(Users_words.user_id == user.id,
+                       Users_words.word_id.in_(word_ids))
+                .returning(Users_words.word_id)
+            )).all()
+        removed = []
+        if deleted:
+            # Слово удаляется, только если оно больше не нужно ни одному
+            # пользователю и не входит ни в одну колоду
+            removed = (await session.execute(
+                delete(Words)
+                .where(Words.id.in_(deleted),
+                       Words.base_word.is_(False),
+                       ~exists().where(Users_words.word_id == Words.id),
+                       ~exists().where(DeckWord.word_id == Words.id))
+                .returning(Words.id, Words.translation)
+            )).all()
+        await session.commit()
+    for word_id, translation in removed:
+        translation_index.remove(word_id, translation)
+        word_index.remove(word_id)
+        distractor_pool.remove(translation)
+    return hidden + len(deleted)
+
+def _deck_words(user_id, *columns):
+    """
+    SELECT по словам колод, на которые подписан пользователь.
+
+    Args:
+        user_id: PK пользователя или колонка User.id (коррелированный подзапрос).
+        *columns: Выбираемые колонки; по умолчанию ID слова.
+    """
+    return (select(*(columns or (DeckWord.word_id,))).select_from(UserDeck)
+            .join(DeckWord, DeckWord.deck_id == UserDeck.deck_id)
+            .where(UserDeck.user_id == user_id))
+
+def _unseen_deck_words(user_id, *columns):
+    """
+    Слова колод пользователя без строки users_words - ещё не показанные.
+    Слова читаются после курсора подписки (user_deck.cursor), поэтому уже
+    показанные слова в начале колоды не перебираются; NOT EXISTS
+    отсеивает слова после курсора, показанные не по порядку (удалённые
+    или добавленные пользователем), по уникальному индексу (user_id, word_id).
+    Слово из нескольких колод пользователя берётся только из колоды с
+    меньшим ID: строки уникальны без DISTINCT, который заставил бы
+    прочитать всю колоду до LIMIT.
+
+    Args:
+        user_id: PK пользователя или колонка User.id.
+        *columns: Выбираемые колонки; по умолчанию ID слова.
+    """
+    other, other_word = aliased(UserDeck), aliased(DeckWord)
+    return _deck_words(user_id, *columns).where(
+        DeckWord.word_id > UserDeck.cursor,
+        ~exists().where(Users_words.user_id == user_id,
+                        Users_words.word_id == DeckWord.word_id),
+        ~exists().where(other.user_id == user_id,
+                        other.deck_id < DeckWord.deck_id,
+                        other_word.deck_id == other.deck_id,
+                        other_word.word_id == DeckWord.word_id))
+
+async def _advance_deck_cursors(session, user_id: int) -> None:
+    """
+    Сдвигает курсоры подписок пользователя к первому непоказанному слову
+    колоды. Перебираются только слова после курсора, у которых уже есть
+    строка users_words - обычно только что показанные, - поэтому стоимость
+    не зависит от того, сколько слов колоды пользователь уже прошёл.
+
+    Args:
+        session (AsyncSession): Открытая сессия.
+        user_id (int): PK пользователя.
+    """
+    first_unseen = (select(DeckWord.word_id - 1)
+                    .where(DeckWord.deck_id == UserDeck.deck_id,
+                           DeckWord.word_id > UserDeck.cursor,
+                           ~exists().where(Users_words.user_id == user_id,
+                                           Users_words.word_id == DeckWord.word_id))
+                    .order_by(DeckWord.word_id)
+                    .limit(1)
+                    .scalar_subquery())
+    # Все слова колоды показаны: курсор после последнего
+    last = (select(sq.func.max(DeckWord.word_id))
+            .where(DeckWord.deck_id == UserDeck.deck_id)
+            .scalar_subquery())
+    await session.execute(update(UserDeck)
+                          .where(UserDeck.user_id == user_id)
+                          .values(cursor=sq.func.coalesce(first_unseen, last, UserDeck.cursor)))
+
+def _study_queue(user_id: int, limit: int, now: datetime):
+    """
+    Первые limit слов очереди повторения: словарь пользователя (users_words
+    без скрытых слов) вместе с непоказанными словами его колод.
+    Каждая часть читается диапазоном по индексу и ограничена limit; слова
+    колоды перебираются по порядку deck_word, пропуская уже показанные.
+    Порядок (колонка rank): слова, срок повторения которых наступил (по
+    сроку), новые слова пользователя, новые слова колод, затем слова с
+    ещё не наступившим сроком. Слово, на которое ответили неверно,
+    возвращается через RELEARN_DELAY, не дожидаясь новых слов.
+
+    Args:
+        user_id (int): PK пользователя.
+        limit (int): Количество слов.
+        now (datetime): Текущее время UTC.
+
+    Returns:
+        Subquery: колонки word_id, due_at, rank.
+    """
+    def own(condition, name):
+        return (select(Users_words.word_id, Users_words.due_at)
+                .where(Users_words.user_id == user_id, Users_words.hidden.is_(False), condition)
+                .order_by(Users_words.due_at)
+                .limit(limit)
+                .subquery(name))
+
+    due = own(Users_words.due_at <= now, 'due')
+    new = own(Users_words.due_at.is_(None), 'new')
+    later = own(Users_words.due_at > now, 'later')
+    deck = (_unseen_deck_words(user_id)
+            .order_by(DeckWord.word_id)
+            .limit(limit)
+            .subquery('deck'))
+    return union_all(
+        select(due.c.word_id, due.c.due_at, literal(0).label('rank')),
+        select(new.c.word_id, new.c.due_at, literal(1).label('rank')),
+        select(deck.c.word_id, sq.cast(sq.null(), sq.DateTime).label('due_at'),
+               literal(2).label('rank')),
+        select(later.c.word_id, later.c.due_at, literal(3).label('rank')),
+    ).subquery('queue')
+
+def _queue_order(queue):
+    """ORDER BY очереди _study_queue."""
+    return queue.c.rank, queue.c.due_at, queue.c.word_id
+
+@timed('db_seconds')
+async def get_due_words(tg_id: int, limit: int) -> List[Tuple[str, str, int]]:
+    """
+    Возвращает следующие limit слов очереди повторения (словарь пользователя
+    и непоказанные слова колод) одним запросом, не отмечая их показанными.
+
+    Args:
+        tg_id (int): Telegram ID пользователя.
+        limit (int): Количество слов.
+
+    Returns:
+        List[Tuple[str, str, int]]: слово, перевод и ID слова в порядке повторения.
+    """
+    # Чтение идёт с реплики. Только что привязанные базовые слова могут
+    # ещё не дойти до неё, поэтому в этом случае читаем из основной базы
+    factory = ReadSession
+    if BASE_WORDS_MODE != 'eager' and await ensure_base_words(tg_id):
+        factory = Session
+    async with factory() as session:
+        user = await _get_user(session, tg_id)
+        if not user:
+            return []
+        queue = _study_queue(user.id, limit, datetime.utcnow())
+        stmt = (select(Words.value, Words.translation, Words.id)
+                .join(queue, queue.c.word_id == Words.id)
+                .order_by(*_queue_order(queue))
+                .limit(limit))
+        return [tuple(row) for row in await session.execute(stmt)]
+
+def _in_dictionary(user_id: int, word_id):
+    """
+    Условие «слово в словаре пользователя»: своя нескрытая строка
+    users_words или непоказанное слово колоды. Обе проверки - по индексам.
+
+    Args:
+        user_id (int): PK пользователя.
+        word_id: Колонка с ID слова.
+    """
+    return or_(
+        exists().where(Users_words.user_id == user_id, Users_words.word_id == word_id,
+                       Users_words.hidden.is_(False)),
+        _unseen_deck_words(user_id).where(DeckWord.word_id == word_id).exists(),
+    )
+
+@timed('db_seconds')
+async def list_words(tg_id: int, anchor: int = 0, backward: bool = False,
+                     limit: int = 10) -> List[Tuple[str, str, int]]:
+    """
+    Страница словаря пользователя по возрастанию ID слова (keyset-пагинация):
+    слова после anchor или, с backward, перед ним. Словарь пользователя и
+    непоказанные слова колод читаются диапазоном по индексам (user_id, word_id)
+    и (deck_id, word_id) от anchor, поэтому время не зависит ни от номера
+    страницы, ни от размера словаря.
+
+    Args:
+        tg_id (int): Telegram ID пользователя.
+        anchor (int): ID слова, от которого читается страница; 0 - начало.
+        backward (bool): Читать слова перед anchor.
+        limit (int): Размер страницы.
+
+    Returns:
+        List[Tuple[str, str, int]]: слово, перевод и ID слова; с backward -
+        в обратном порядке (ближайшие к anchor первыми).
+    """
+    def page(column):
+        bound = column < anchor if backward else column > anchor
+        return bound, column.desc() if backward else column.asc()
+
+    async with ReadSession() as session:
+        user = await _get_user(session, tg_id)
+        if not user:
+            return []
+        bound, order = page(Users_words.word_id)
+        own = (select(Users_words.word_id)
+               .where(Users_words.user_id == user.id, Users_words.hidden.is_(False), bound)
+               .order_by(order)
+               .limit(limit)
+               .subquery('own'))
+        bound, order = page(DeckWord.word_id)
+        deck = (_unseen_deck_words(user.id)
+                .where(bound)
+                .order_by(order)
+                .limit(limit)
+                .subquery('deck'))
+        ids = union_all(select(own.c.word_id), select(deck.c.word_id)).subquery('ids')
+        stmt = (select(Words.value, Words.translation, Words.id)
+                .join(ids, ids.c.word_id == Words.id)
+                .order_by(Words.id.desc() if backward else Words.id)
+                .limit(limit))
+        return [tuple(row) for row in await session.execute(stmt)]
+
+def _like_escape(text: str) -> str:
+    """Экранирует спецсимволы LIKE (escape-символ - обратная косая черта)."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
 
-def get_study_word(tg_id: int) -> Tuple:
+@timed('db_seconds')
+async def find_words(tg_id: int, query: str, limit: int = 10) -> List[Tuple[str, str, int]]:
     """
-    Возвращает слово для изучения пользователя (наиболее давно не показываемое).
+    Поиск по словарю пользователя: подстрока или нечёткое совпадение
+    слова или перевода. В PostgreSQL - по триграммным индексам pg_trgm
+    (LIKE '%...%' и оператор %), в других СУБД - по индексу search.word_index
+    в памяти процесса с проверкой не больше FIND_MAX_CANDIDATES лучших
+    кандидатов по словарю пользователя. Запрос короче трёх символов ищется
+    по началу слова или перевода (LIKE '...%' по индексам начал).
 
     Args:
         tg_id (int): Telegram ID пользователя.
+        query (str): Поисковый запрос.
+        limit (int): Максимум результатов.
 
     Returns:
-        Tuple:
-            - слово на русском (str),
-            - перевод (str),
-            - ID слова (int)
+        List[Tuple[str, str, int]]: слово, перевод и ID слова: сначала
+        совпадения подстрокой, затем по убыванию похожести.
+    """
+    query = query.strip().lower()
+    if not query:
+        return []
+    async with ReadSession() as session:
+        user = await _get_user(session, tg_id)
+        if not user:
+            return []
+        if get_engine().dialect.name == 'postgresql':
+            value, translation = sq.func.lower(Words.value), sq.func.lower(Words.translation)
+            if len(query) < MIN_TRIGRAM_QUERY:
+                # Триграммные индексы коротким запросам не помогают
+                pattern = f'{_like_escape(query)}%'
+                stmt = (select(Words.value, Words.translation, Words.id)
+                        .where(or_(value.like(pattern, escape='\\'),
+                                   translation.like(pattern, escape='\\')),
+                               _in_dictionary(user.id, Words.id))
+                        .order_by(Words.id)
+                        .limit(limit))
+                return [tuple(row) for row in await session.execute(stmt)]
+            pattern = f'%{_like_escape(query)}%'
+            substring = or_(value.like(pattern, escape='\\'),
+                            translation.like(pattern, escape='\\'))
+            score = sq.func.greatest(sq.func.similarity(value, query),
+                                     sq.func.similarity(translation, query))
+            stmt = (select(Words.value, Words.translation, Words.id)
+                    .where(or_(substring, value.op('%')(query), translation.op('%')(query)),
+                           _in_dictionary(user.id, Words.id))
+                    .order_by(substring.desc(), score.desc(), Words.id)
+                    .limit(limit))
+            return [tuple(row) for row in await session.execute(stmt)]
+        await word_index.refresh()
+        candidates = word_index.search(query, FIND_MAX_CANDIDATES)
+        found = []
+        for start in range(0, len(candidates), FIND_CHECK_BATCH):
+            batch = candidates[start:start + FIND_CHECK_BATCH]
+            owned = set((await session.scalars(
+                select(Words.id).where(Words.id.in_(batch), _in_dictionary(user.id, Words.id))
+            )).all())
+            found += [word_id for word_id in batch if word_id in owned]
+            if len(found) >= limit:
+                break
+        return [word_index.word(word_id) + (word_id,) for word_id in found[:limit]]
 
-    Если не найден пользователь, либо у него нет слов для изучения:
-        Tuple:
-            - None,
-            - None,
-            - None
+@timed('db_seconds')
+async def flush_reviews(tg_id: int, reviews: Dict[int, Tuple[datetime, list]]) -> None:
     """
-    with Session() as session:
-        user = session.query(User).filter_by(tg_id=tg_id).first()
+    Записывает накопленные за учебную сессию показы и ответы одним пакетом:
+    один SELECT текущих расписаний и один UPDATE ... FROM (VALUES ...),
+    а в той же транзакции - ответы в answer_event одним многострочным
+    INSERT и статистику пользователя в user_stats. Для слов колод,
+    показанных впервые, строки users_words создаются здесь же.
+
+    Args:
+        tg_id (int): Telegram ID пользователя.
+        reviews (Dict[int, Tuple[datetime, list]]): ID слова -> (время показа,
+            список ответов (верен ли ответ, время ответа, задержка в мс)
+            в порядке поступления).
+    """
+    if not reviews:
+        return
+    async with Session() as session:
+        user = await _get_user(session, tg_id)
         if not user:
-            return None, None, None
-        user_word = (
-            session.query(Users_words).join(Words).filter(Users_words.user_id == user.id)
-            .order_by(Users_words.last_shown.asc().nullsfirst()).first()
+            return
+        schedule = (select(Users_words.id, Users_words.word_id, Users_words.ease,
+                           Users_words.interval, Users_words.streak, Users_words.due_at)
+                    .filter(Users_words.user_id == user.id)
+                    .with_for_update())
+        current = (await session.execute(
+            schedule.filter(Users_words.word_id.in_(list(reviews)))
+        )).all()
+        missing = set(reviews) - {row.word_id for row in current}
+        if missing:
+            await _materialize_deck_words(session, user.id, missing)
+            current += (await session.execute(
+                schedule.filter(Users_words.word_id.in_(missing))
+            )).all()
+        rows = []
+        for row in current:
+            shown_at, answers = reviews[row.word_id]
+            card = Card(row.ease, row.interval, row.streak, row.due_at)
+            for correct, answered_at, latency_ms in answers:
+                card = review(card, correct, answered_at)
+            if not answers:
+                # Показано, но пропущено без ответа: откладываем, чтобы слово
+                # не пришло снова сразу
+                postponed = shown_at + SHOWN_DELAY
+                if card.due_at is None or card.due_at < postponed:
+                    card = card._replace(due_at=postponed)
+            rows.append((row.id, shown_at, card.ease, card.interval,
+                         card.streak, card.due_at))
+        if rows:
+            await _bulk_update_schedule(session, rows)
+        # Журнал пишется и для слов, удалённых из словаря до записи
+        answers = sorted(((word_id,) + answer for word_id, (_, word_answers) in reviews.items()
+                          for answer in word_answers), key=lambda answer: answer[2])
+        if answers:
+            await session.execute(insert(AnswerEvent), [
+                {'user_id': user.id, 'word_id': word_id, 'correct': correct,
+                 'answered_at': answered_at, 'latency_ms': latency_ms}
+                for word_id, correct, answered_at, latency_ms in answers
+            ])
+            await _update_stats(session, user.id, [answer[1:] for answer in answers])
+        await session.commit()
+
+async def _materialize_deck_words(session, user_id: int, word_ids) -> None:
+    """
+    Создаёт строки users_words для слов колод пользователя, у которых их
+    ещё нет (первый показ или ответ), и сдвигает курсоры подписок.
+    Слова не из колод пропускаются.
+
+    Args:
+        session (AsyncSession): Открытая сессия.
+        user_id (int): PK пользователя.
+        word_ids: ID слов.
+    """
+    await session.execute(
+        insert_or_ignore(Users_words).from_select(
+            ['user_id', 'word_id'],
+            _deck_words(user_id, literal(user_id), DeckWord.word_id)
+            .where(DeckWord.word_id.in_(list(word_ids)))
+            .distinct()
         )
-        if not user_word:
-            return None, None, None
-        user_word.last_shown = datetime.utcnow()
-        session.commit()
-        return user_word.word.value, user_word.word.translation, user_word.word.id
+    )
+    await _advance_deck_cursors(session, user_id)
+
+async def _update_stats(session, user_id: int, answers: List[tuple]) -> None:
+    """
+    Добавляет ответы к строке user_stats пользователя.
+
+    Args:
+        session (AsyncSession): Открытая сессия.
+        user_id (int): PK пользователя.
+        answers (List[tuple]): (верен ли ответ, время ответа, задержка в мс).
+    """
+    row = (await session.execute(select(*_stats_columns())
+                                 .filter(UserStats.user_id == user_id)
+                                 .with_for_update())).first()
+    stats = accumulate_stats(StatsInfo(*row) if row else StatsInfo(), answers)
+    await session.execute(upsert(UserStats, dict(stats._asdict(), user_id=user_id),
+                                 ['user_id'], list(StatsInfo._fields)))
+
+def _stats_columns():
+    """Колонки user_stats в порядке полей StatsInfo."""
+    return [getattr(UserStats, name) for name in StatsInfo._fields]
 
-def get_user_by_id(tg_id: int):
+@timed('db_seconds')
+async def get_user_stats(tg_id: int) -> Optional[StatsInfo]:
     """
-    Возвращает объект пользователя по Telegram ID.
+    Возвращает статистику ответов пользователя, записанных в базу:
+    одна строка user_stats по первичному ключу.
 
     Args:
         tg_id (int): Telegram ID пользователя.
 
     Returns:
-        Объект User или None, если пользователь не найден.
+        StatsInfo (пустая, если ответов ещё нет) или None, если пользователь не найден.
     """
-    with Session() as session:
-        user = session.query(User).filter_by(tg_id=tg_id).first()
-        return user
+    # Основная база: только что записанные ответы могут не дойти до реплики
+    async with Session() as session:
+        user = await _get_user(session, tg_id)
+        if not user:
+            return None
+        row = (await session.execute(select(*_stats_columns())
+                                     .filter(UserStats.user_id == user.id))).first()
+        return StatsInfo(*row) if row else StatsInfo()
 
-def get_word_by_id(word_id: int) -> tuple:
+async def _bulk_update_schedule(session, rows: List[tuple]) -> None:
+    """
+    Обновляет расписания нескольких связей одним запросом.
+
+    Args:
+        session (AsyncSession): Открытая сессия.
+        rows (List[tuple]): (id, last_shown, ease, interval, streak, due_at).
+    """
+    columns = ('id', 'last_shown', 'ease', 'interval', 'streak', 'due_at')
+    if get_engine().dialect.name == 'sqlite':
+        # SQLite не поддерживает VALUES с именами колонок в FROM:
+        # executemany одного UPDATE
+        await session.execute(
+            update(Users_words.__table__)
+            .where(Users_words.id == bindparam('row_id'))
+            .values({name: bindparam(name) for name in columns[1:]}),
+            [dict(zip(('row_id',) + columns[1:], row)) for row in rows]
+        )
+        return
+    batch = values(column('id', sq.Integer), column('last_shown', sq.DateTime),
+                   column('ease', sq.Float), column('interval', sq.Float),
+                   column('streak', sq.Integer), column('due_at', sq.DateTime),
+                   name='batch').data(rows)
+    await session.execute(
+        update(Users_words)
+        .where(Users_words.id == batch.c.id)
+        .values({name: batch.c[name] for name in columns[1:]})
+        .execution_options(synchronize_session=False)
+    )
+
+@timed('db_seconds')
+async def get_user_by_id(tg_id: int) -> Optional[UserInfo]:
+    """
+    Возвращает данные пользователя по Telegram ID.
+    При попадании в кэш обращения к базе не происходит.
+
+    Args:
+        tg_id (int): Telegram ID пользователя.
+
+    Returns:
+        UserInfo или None, если пользователь не найден.
+    """
+    # Сессия не берёт соединение из пула, пока не выполнен запрос
+    async with ReadSession() as session:
+        return await _get_user(session, tg_id)
+
+@timed('db_seconds')
+async def get_word_by_id(word_id: int) -> tuple:
     """
     Возвращает слово и перевод по ID слова.
 
@@ -184,8 +880,170 @@ def get_word_by_id(word_id: int) -> tuple:
     Returns:
         Tuple[str, str]: слово и перевод, или (None, None), если не найдено.
     """
-    with Session() as session:
-        word = session.query(Words).filter_by(id=word_id).first()
+    async with ReadSession() as session:
+        word = await session.scalar(select(Words).filter_by(id=word_id))
         if not word:
             return None, None
         return word.value, word.translation
+
+class ReminderRunInfo(NamedTuple):
+    """
+    Состояние рассылки напоминаний (строка reminder_run).
+
+    Attributes:
+        id (int): PK рассылки.
+        cursor (int): PK последнего обработанного пользователя.
+        sent (int): Отправлено напоминаний.
+        blocked (int): Пользователей, заблокировавших бота.
+        failed (int): Ошибок отправки.
+        resumed (bool): Рассылка продолжена после перезапуска.
+    """
+    id: int
+    cursor: int = 0
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+    resumed: bool = False
+
+@timed('db_seconds')
+async def update_reminder_settings(tg_id: int, utc_offset: Optional[int] = None,
+                                   enabled: Optional[bool] = None) -> bool:
+    """
+    Изменяет часовой пояс пользователя и/или включает и выключает напоминания.
+
+    Args:
+        tg_id (int): Telegram ID пользователя.
+        utc_offset (Optional[int]): Смещение от UTC, минут.
+        enabled (Optional[bool]): Отправлять ли напоминания.
+
+    Returns:
+        bool: True если пользователь найден.
+    """
+    changes = {}
+    if utc_offset is not None:
+        changes['utc_offset'] = utc_offset
+    if enabled is not None:
+        changes['reminders'] = enabled
+    async with Session() as session:
+        user_id = await session.scalar(update(User).filter_by(tg_id=tg_id)
+                                       .values(**changes).returning(User.id))
+        await session.commit()
+        return user_id is not None
+
+@timed('db_seconds')
+async def reminder_targets(cursor: int, limit: int, now: datetime,
+                           offset_ranges: List[Tuple[int, int]], default_offset: int,
+                           idle: timedelta) -> List[Tuple[int, int]]:
+    """
+    Следующая пачка пользователей для напоминания после PK cursor:
+    напоминания включены, местное время попадает в окно рассылки
+    (смещение от UTC в offset_ranges), не было ответов и напоминаний
+    дольше idle и есть слова к повторению. Один запрос по первичному ключу
+    пользователя; слова проверяются EXISTS по индексу (user_id, due_at).
+
+    Args:
+        cursor (int): PK последнего обработанного пользователя.
+        limit (int): Размер пачки.
+        now (datetime): Текущее время UTC.
+        offset_ranges (List[Tuple[int, int]]): Полуинтервалы [от, до) смещений, минут.
+        default_offset (int): Смещение пользователей без часового пояса.
+        idle (timedelta): Сколько пользователь не занимался.
+
+    Returns:
+        List[Tuple[int, int]]: PK и Telegram ID пользователей по возрастанию PK.
+    """
+    if not offset_ranges:
+        return []
+    offset = sq.func.coalesce(User.utc_offset, default_offset)
+    since = now - idle
+    due = exists().where(Users_words.user_id == User.id,
+                         Users_words.hidden.is_(False),
+                         or_(Users_words.due_at.is_(None), Users_words.due_at <= now))
+    stmt = (
+        select(User.id, User.tg_id)
+        .outerjoin(UserStats, UserStats.user_id == User.id)
+        .where(User.id > cursor,
+               User.reminders.is_(True),
+               or_(User.reminded_at.is_(None), User.reminded_at < since),
+               or_(UserStats.last_answer_at.is_(None), UserStats.last_answer_at < since),
+               or_(*(offset.between(low, high - 1) for low, high in offset_ranges)),
+               # Базовые слова пользователя в режиме lazy ещё не привязаны
+               or_(User.base_linked.is_(False), due,
+                   _unseen_deck_words(User.id).exists()))
+        .order_by(User.id)
+        .limit(limit)
+    )
+    async with ReadSession() as session:
+        return [tuple(row) for row in await session.execute(stmt)]
+
+@timed('db_seconds')
+async def open_reminder_run(now: datetime) -> ReminderRunInfo:
+    """
+    Продолжает незавершённую рассылку или начинает новую.
+
+    Args:
+        now (datetime): Текущее время UTC.
+    """
+    async with Session() as session:
+        row = (await session.execute(
+            select(ReminderRun.id, ReminderRun.cursor, ReminderRun.sent,
+                   ReminderRun.blocked, ReminderRun.failed)
+            .filter(ReminderRun.finished_at.is_(None))
+            .order_by(ReminderRun.id.desc()).limit(1)
+        )).first()
+        if row:
+            return ReminderRunInfo(*row, resumed=True)
+        run_id = await session.scalar(insert(ReminderRun).values(started_at=now)
+                                      .returning(ReminderRun.id))
+        await session.commit()
+        return ReminderRunInfo(run_id)
+
+@timed('db_seconds')
+async def save_reminder_batch(run: ReminderRunInfo, sent: List[int], blocked: List[int],
+                              now: datetime, finished: bool = False) -> None:
+    """
+    Записывает результат пачки одной транзакцией: время напоминания
+    получившим его, отключение напоминаний заблокировавшим бота и
+    контрольную точку рассылки.
+
+    Args:
+        run (ReminderRunInfo): Рассылка с новыми cursor и счётчиками.
+        sent (List[int]): PK пользователей, получивших напоминание.
+        blocked (List[int]): PK пользователей, заблокировавших бота.
+        now (datetime): Текущее время UTC.
+        finished (bool): Рассылка завершена.
+    """
+    async with Session() as session:
+        if sent:
+            await session.execute(update(User).where(User.id.in_(sent))
+                                  .values(reminded_at=now)
+                                  .execution_options(synchronize_session=False))
+        if blocked:
+            await session.execute(update(User).where(User.id.in_(blocked))
+                                  .values(reminders=False)
+                                  .execution_options(synchronize_session=False))
+        await session.execute(update(ReminderRun).filter_by(id=run.id)
+                              .values(cursor=run.cursor, sent=run.sent,
+                                      blocked=run.blocked, failed=run.failed,
+                                      finished_at=now if finished else None))
+        await session.commit()
+
+def pool_metrics() -> Dict[str, dict]:
+    """
+    Возвращает состояние созданных пулов соединений основной базы и реплики:
+    занятые соединения и время ожидания соединения.
+
+    Returns:
+        Dict[str, dict]: статистика по имени пула.
+    """
+    return {name: pool_stats(engine) for name, engine in engines().items()}
+
+def _collect_db_gauges():
+    """Текущие значения пулов соединений и кэша пользователей для /metrics."""
+    for pool, stats in pool_metrics().items():
+        for key, value in stats.items():
+            yield f'db_pool_{key}', (('pool', pool),), value
+    yield 'user_cache_hits', (), user_cache.hits
+    yield 'user_cache_misses', (), user_cache.misses
+
+registry.gauge(_collect_db_gauges)
\ No newline at end of file
@@ -0,0 +1,81 @@
+import time
+from typing import Dict
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolStats:
+    """
+    Статистика ожидания соединений пула: сколько раз соединение выдавалось,
+    суммарное и максимальное время ожидания.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """
+        Учитывает одно получение соединения.
+
+        Args:
+            seconds (float): Время ожидания соединения.
+        """
+        self.checkouts += 1
+        self.wait_total += seconds
+        if seconds > self.wait_max:
+            self.wait_max = seconds
+
+
+def metered_pool(name: str):
+    """
+    Возвращает класс пула, замеряющий время ожидания соединения.
+    Статистика хранится в атрибуте класса, поэтому переживает пересоздание
+    пула (pool.recreate() после потери соединений создаёт экземпляр того же класса).
+
+    Args:
+        name (str): Имя пула в метриках, например 'primary' или 'replica'.
+
+    Returns:
+        type: Подкласс AsyncAdaptedQueuePool.
+    """
+    class MeteredPool(AsyncAdaptedQueuePool):
+        stats = PoolStats()
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                self.stats.observe(time.perf_counter() - started)
+
+    MeteredPool.__name__ = f'MeteredPool_{name}'
+    return MeteredPool
+
+
+def pool_stats(engine) -> Dict[str, float]:
+    """
+    Возвращает текущее состояние пула соединений engine.
+
+    Args:
+        engine (AsyncEngine): Асинхронный engine.
+
+    Returns:
+        Dict[str, float]: размер пула, занятые соединения, переполнение
+        и статистика ожидания.
+    """
+    pool = engine.pool
+    stats = getattr(pool, 'stats', None)
+    result = {
+        'size': pool.size(),
+        'in_use': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+    }
+    if stats is not None:
+        result.update({
+            'checkouts': stats.checkouts,
+            'wait_total': stats.wait_total,
+            'wait_max': stats.wait_max,
+        })
+    return result
@@ -0,0 +1,325 @@
+import asyncio
+import functools
+import logging
+import time
+import uuid
+import zlib
+from typing import Dict, List, Optional
+
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
+
+from cache import TTLCache
+from config import (DEDUP_STORAGE, DEDUP_UPDATE_TTL, DEDUP_TAP_WINDOW, DEDUP_INFLIGHT_TTL,
+                    DEDUP_CACHE_SIZE, REDIS_URL)
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Причины отбрасывания: повторная доставка обновления и повторное нажатие кнопки
+REDELIVERY, DOUBLE_TAP = 'redelivery', 'double_tap'
+
+# Как часто копия обновления проверяет, обработано ли оно другой копией, секунд
+INFLIGHT_POLL = 0.05
+
+
+class MemorySeenStore:
+    """
+    Ключи обработанных обновлений в памяти процесса: отдельный
+    ограниченный TTLCache на каждое время жизни.
+
+    Attributes:
+        maxsize (int): Максимальное количество ключей с одним временем жизни.
+    """
+
+    def __init__(self, maxsize: int = DEDUP_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._caches: Dict[float, TTLCache] = {}
+
+    def _cache(self, ttl: float) -> TTLCache:
+        cache = self._caches.get(ttl)
+        if cache is None:
+            cache = self._caches[ttl] = TTLCache(self.maxsize, ttl)
+        return cache
+
+    async def seen(self, key: str, ttl: float) -> bool:
+        """Есть ли ключ, записанный с временем жизни ttl."""
+        return self._cache(ttl).get(key) is not None
+
+    async def remember(self, key: str, ttl: float) -> None:
+        """Записывает ключ на ttl секунд."""
+        self._cache(ttl).set(key, '1')
+
+    async def claim(self, key: str, value: str, ttl: float) -> Optional[str]:
+        """
+        Записывает ключ со значением value на ttl секунд, если его ещё нет.
+
+        Args:
+            key (str): Ключ.
+            value (str): Значение.
+            ttl (float): Время жизни, секунд.
+
+        Returns:
+            Optional[str]: None, если ключ записан, иначе значение, записанное раньше.
+        """
+        cache = self._cache(ttl)
+        # Проверка и запись без await между ними: из одновременных копий
+        # нажатия в одном процессе ключ получает только одна
+        current = cache.get(key)
+        if current is None:
+            cache.set(key, value)
+        return current
+
+
+class RedisSeenStore:
+    """
+    Ключи обработанных обновлений в Redis - общие для всех процессов
+    и серверов бота. При недоступности Redis обновления считаются новыми:
+    лучше обработать повтор, чем потерять обновление.
+
+    Attributes:
+        prefix (str): Префикс ключей (с ID бота, если Redis общий для нескольких ботов).
+    """
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = 'dedup') -> None:
+        # Клиент Redis нужен только с этим хранилищем
+        from redis.asyncio import Redis
+
+        self.prefix = prefix
+        self._redis = Redis.from_url(url, decode_responses=True)
+
+    async def seen(self, key: str, ttl: float) -> bool:
+        """Есть ли ключ (EXISTS)."""
+        try:
+            return bool(await self._redis.exists(f'{self.prefix}:{key}'))
+        except Exception:
+            logger.exception('Redis недоступен, повторы обновлений не отбрасываются')
+            return False
+
+    async def remember(self, key: str, ttl: float) -> None:
+        """Записывает ключ на ttl секунд (SET PX)."""
+        try:
+            await self._redis.set(f'{self.prefix}:{key}', '1', px=max(1, int(ttl * 1000)))
+        except Exception:
+            logger.exception('Redis недоступен, обработанное обновление не записано')
+
+    async def claim(self, key: str, value: str, ttl: float) -> Optional[str]:
+        """
+        Записывает ключ со значением value на ttl секунд, если его ещё нет
+        (SET NX PX, при неудаче GET).
+
+        Returns:
+            Optional[str]: None, если ключ записан, иначе значение, записанное раньше.
+        """
+        name = f'{self.prefix}:{key}'
+        try:
+            if await self._redis.set(name, value, nx=True, px=max(1, int(ttl * 1000))):
+                return None
+            return await self._redis.get(name)
+        except Exception:
+            logger.exception('Redis недоступен, повторы обновлений не отбрасываются')
+            return None
+
+
+def tap_key(call: types.CallbackQuery) -> Optional[str]:
+    """
+    Ключ нажатия кнопки: сообщение, его версия и callback_data. Повторное
+    нажатие той же кнопки приходит новым обновлением с новым ID, но с тем же
+    ключом. Вопрос заменяет предыдущий в том же сообщении с теми же кнопками
+    управления, поэтому в ключ входят время последнего изменения сообщения
+    (edit_date, у неизменённого - date) и контрольная сумма текста: нажатие
+    «Дальше» под новым вопросом - не повтор, даже если вопрос тот же.
+
+    Args:
+        call (CallbackQuery): Нажатие inline-кнопки.
+
+    Returns:
+        Optional[str]: Ключ или None, если сообщение неизвестно.
+    """
+    message = call.message
+    if message is not None:
+        place = f'{message.chat.id}:{message.message_id}'
+    elif call.inline_message_id:
+        place = call.inline_message_id
+    else:
+        return None
+    if message is not None:
+        edited = message.edit_date or message.date or 0
+        text = message.text or ''
+    else:
+        edited, text = 0, ''
+    version = zlib.crc32(text.encode())
+    return f'tap:{place}:{edited}:{version:x}:{call.data}'
+
+
+class UpdateDeduplicator:
+    """
+    Отбрасывает повторные обновления до хендлеров (и запросов к базе):
+
+    - повторную доставку: update_id уже обработан в течение update_ttl секунд
+      (polling после перезапуска, повтор webhook). До обработки update_id
+      занимается на inflight_ttl секунд: копия, пришедшая во время обработки,
+      ждёт её окончания и отбрасывается. Обработанный update_id записывается
+      после обработки, поэтому обновление, которое процесс-обработчик не
+      успел обработать до падения, не теряется: его копия дожидается
+      истечения занятости и обрабатывается;
+    - двойное нажатие: та же кнопка того же сообщения в течение tap_window
+      секунд. Нажатие занимается до обработки, отброшенное подтверждается
+      answerCallbackQuery, чтобы у кнопки не висели часы.
+
+    Attributes:
+        store: Хранилище ключей (MemorySeenStore или RedisSeenStore).
+        update_ttl (float): Сколько секунд помнить update_id.
+        tap_window (float): Окно повторного нажатия, секунд.
+        inflight_ttl (float): Сколько секунд update_id занят обработкой.
+        suppressed (Dict[str, int]): Отброшено обновлений по причинам.
+    """
+
+    def __init__(self, store, update_ttl: float = DEDUP_UPDATE_TTL,
+                 tap_window: float = DEDUP_TAP_WINDOW,
+                 inflight_ttl: float = DEDUP_INFLIGHT_TTL) -> None:
+        self.store = store
+        self.update_ttl = update_ttl
+        self.tap_window = tap_window
+        self.inflight_ttl = inflight_ttl
+        self.suppressed: Dict[str, int] = {REDELIVERY: 0, DOUBLE_TAP: 0}
+
+    async def _claim_update(self, update: types.Update) -> bool:
+        """
+        Занимает update_id на время обработки. Если его обрабатывает другая
+        копия, ждёт, пока она запишет update_id обработанным или занятость
+        истечёт (копия упала, не обработав обновление).
+
+        Args:
+            update (Update): Обновление Telegram.
+
+        Returns:
+            bool: True, если update_id занят этой копией, False, если он уже обработан.
+        """
+        key = f'update:{update.update_id}'
+        # Значение уникально для каждой копии: копии одного обновления в одном
+        # процессе тоже различаются
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.inflight_ttl
+        while await self.store.claim(f'inflight:{update.update_id}', token,
+                                     self.inflight_ttl) is not None:
+            if time.monotonic() >= deadline:
+                return True
+            await asyncio.sleep(INFLIGHT_POLL)
+            if await self.store.seen(key, self.update_ttl):
+                return False
+        return True
+
+    async def duplicate(self, update: types.Update) -> Optional[str]:
+        """
+        Проверяет обновление; новое обновление занимает update_id до обработки,
+        нажатие кнопки - ещё и ключ нажатия.
+
+        Args:
+            update (Update): Обновление Telegram.
+
+        Returns:
+            Optional[str]: Причина, по которой обновление повторное, или None.
+        """
+        if await self.store.seen(f'update:{update.update_id}', self.update_ttl):
+            return REDELIVERY
+        if not await self._claim_update(update):
+            return REDELIVERY
+        call = update.callback_query
+        if call is not None and self.tap_window > 0:
+            key = tap_key(call)
+            if key is not None:
+                holder = await self.store.claim(key, str(update.update_id), self.tap_window)
+                # Ключ, занятый этим же обновлением, - его копия, не обработанная
+                # до падения процесса-обработчика
+                if holder is not None and holder != str(update.update_id):
+                    return DOUBLE_TAP
+        return None
+
+    async def filter(self, bot: AsyncTeleBot, updates: List[types.Update]) -> List[types.Update]:
+        """
+        Возвращает обновления без повторов и считает отброшенные.
+
+        Args:
+            bot (AsyncTeleBot): Бот (для ответа на повторное нажатие).
+            updates (List[Update]): Полученные обновления.
+
+        Returns:
+            List[Update]: Новые обновления.
+        """
+        fresh = []
+        batch = set()
+        for update in updates:
+            # Копия из той же пачки не дождалась бы обработки первой
+            if update.update_id in batch:
+                reason = REDELIVERY
+            else:
+                reason = await self.duplicate(update)
+            if reason is None:
+                fresh.append(update)
+                batch.add(update.update_id)
+                continue
+            self.suppressed[reason] += 1
+            if registry.enabled:
+                registry.inc('updates_suppressed_total', (('reason', reason),))
+            if reason == DOUBLE_TAP:
+                # Отброшенное нажатие обработано: его повторная доставка
+                # после окна нажатия тоже отбрасывается
+                await self.store.remember(f'update:{update.update_id}', self.update_ttl)
+                try:
+                    await bot.answer_callback_query(update.callback_query.id)
+                except Exception:
+                    logger.debug('Повторное нажатие не подтверждено', exc_info=True)
+        return fresh
+
+    async def processed(self, updates: List[types.Update]) -> None:
+        """
+        Запоминает update_id обработанных обновлений.
+
+        Args:
+            updates (List[Update]): Обработанные обновления.
+        """
+        for update in updates:
+            await self.store.remember(f'update:{update.update_id}', self.update_ttl)
+
+
+def create_deduplicator(kind: str = DEDUP_STORAGE, bot_id: Optional[int] = None
+                        ) -> Optional[UpdateDeduplicator]:
+    """
+    Создаёт фильтр повторных обновлений по имени хранилища из конфигурации.
+
+    Args:
+        kind (str): memory - в памяти процесса, redis - общее хранилище
+            по адресу REDIS_URL, off - без фильтра.
+        bot_id (Optional[int]): ID бота для префикса ключей в Redis.
+
+    Returns:
+        Optional[UpdateDeduplicator]: Фильтр или None для off.
+    """
+    if kind == 'off':
+        return None
+    if kind == 'redis':
+        return UpdateDeduplicator(RedisSeenStore(prefix=f'dedup:{bot_id}'))
+    return UpdateDeduplicator(MemorySeenStore())
+
+
+def install_deduplicator(bot: AsyncTeleBot, deduplicator: UpdateDeduplicator) -> None:
+    """
+    Ставит фильтр перед обработкой обновлений бота: через process_new_updates
+    проходят обновления при polling, webhook и в процессах супервизора.
+
+    Args:
+        bot (AsyncTeleBot): Бот.
+        deduplicator (UpdateDeduplicator): Фильтр повторов.
+    """
+    process_new_updates = bot.process_new_updates
+
+    @functools.wraps(process_new_updates)
+    async def wrapper(updates: List[types.Update]) -> None:
+        fresh = await deduplicator.filter(bot, updates)
+        if fresh:
+            await process_new_updates(fresh)
+            await deduplicator.processed(fresh)
+
+    bot.deduplicator = deduplicator
+    bot.process_new_updates = wrapper
@@ -0,0 +1,155 @@
+import random
+from typing import Dict, Iterable, List, Optional
+
+from config import Session
+
+# Насколько длина неверного варианта может отличаться от правильного,
+# прежде чем брать варианты из всего пула
+MAX_LENGTH_DISTANCE = 3
+
+
+class DistractorPool:
+    """
+    Пул неверных вариантов ответа, построенный по колонке word.translation.
+
+    Переводы хранятся в списках, сгруппированных по длине, поэтому выбор
+    правдоподобного варианта похожей длины выполняется за O(1). Для каждого
+    перевода считается, у скольких слов он есть: перевод уходит из пула,
+    когда удалено последнее такое слово.
+
+    Attributes:
+        size (int): Количество уникальных переводов в пуле.
+    """
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        self._random = random.Random(seed)
+        self._all: List[str] = []
+        self._buckets: Dict[int, List[str]] = {}
+        # Перевод (casefold) -> количество слов и позиции в _all и в корзине
+        self._counts: Dict[str, int] = {}
+        self._all_positions: Dict[str, int] = {}
+        self._bucket_positions: Dict[str, int] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self._all)
+
+    def seed(self, seed: int) -> None:
+        """Задаёт зерно выбора вариантов (воспроизводимые прогоны нагрузочного теста)."""
+        self._random.seed(seed)
+
+    def add(self, translation: str) -> None:
+        """
+        Добавляет в пул перевод слова; одинаковые переводы хранятся один раз.
+
+        Args:
+            translation (str): Перевод слова.
+        """
+        key = translation.casefold()
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count:
+            return
+        bucket = self._buckets.setdefault(len(translation), [])
+        self._all_positions[key] = len(self._all)
+        self._bucket_positions[key] = len(bucket)
+        self._all.append(translation)
+        bucket.append(translation)
+
+    def remove(self, translation: str) -> None:
+        """
+        Убирает перевод удалённого слова; из пула он уходит вместе
+        с последним словом с таким переводом.
+
+        Args:
+            translation (str): Перевод слова.
+        """
+        key = translation.casefold()
+        count = self._counts.get(key)
+        if count is None:
+            return
+        if count > 1:
+            self._counts[key] = count - 1
+            return
+        del self._counts[key]
+        stored = self._all[self._all_positions[key]]
+        _swap_remove(self._all, self._all_positions, key)
+        bucket = self._buckets[len(stored)]
+        _swap_remove(bucket, self._bucket_positions, key)
+        if not bucket:
+            del self._buckets[len(stored)]
+
+    def extend(self, translations: Iterable[str]) -> None:
+        """
+        Добавляет несколько переводов в пул.
+
+        Args:
+            translations (Iterable[str]): Переводы слов.
+        """
+        for translation in translations:
+            self.add(translation)
+
+    async def load(self) -> None:
+        """Заполняет пул переводами всех слов из таблицы Words."""
+        # Слой данных нужен только при загрузке пула
+        from sqlalchemy import select
+        from models import Words
+
+        async with Session() as session:
+            result = await session.stream_scalars(select(Words.translation))
+            async for translation in result:
+                self.add(translation)
+
+    def _candidates(self, length: int) -> Iterable[List[str]]:
+        """Корзины переводов в порядке удаления длины от заданной, затем весь пул."""
+        yield self._buckets.get(length, [])
+        for distance in range(1, MAX_LENGTH_DISTANCE + 1):
+            yield self._buckets.get(length - distance, [])
+            yield self._buckets.get(length + distance, [])
+        yield self._all
+
+    def sample(self, correct: str, k: int = 3) -> List[str]:
+        """
+        Возвращает до k различных неверных вариантов, не совпадающих с правильным.
+
+        Args:
+            correct (str): Правильный перевод.
+            k (int): Количество вариантов.
+
+        Returns:
+            List[str]: Неверные варианты (меньше k, только если в пуле
+            меньше k других переводов).
+        """
+        result = []
+        seen = {correct.casefold()}
+
+        def take(candidate: str) -> bool:
+            key = candidate.casefold()
+            if key not in seen:
+                seen.add(key)
+                result.append(candidate)
+            return len(result) == k
+
+        for bucket in self._candidates(len(correct)):
+            # Ограниченное число случайных попыток на корзину
+            for _ in range(min(len(bucket), k * 2)):
+                if take(self._random.choice(bucket)):
+                    return result
+        # Случайные попытки могут раз за разом попадать в уже выбранные
+        # варианты: перед отказом перебираем весь пул в случайном порядке
+        for candidate in self._random.sample(self._all, len(self._all)):
+            if take(candidate):
+                break
+        return result
+
+
+def _swap_remove(items: List[str], positions: Dict[str, int], key: str) -> None:
+    """Удаляет элемент списка за O(1): на его место ставится последний."""
+    index = positions.pop(key)
+    last = items.pop()
+    if index < len(items):
+        items[index] = last
+        positions[last.casefold()] = index
+
+# Общий пул, заполняется при старте бота
+distractor_pool = DistractorPool()
@@ -0,0 +1,315 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from config import Session
+
+# Артикли и частица инфинитива, которые не учитываются при сравнении ответа
+ARTICLES = frozenset({'a', 'an', 'the', 'to'})
+# Варианты перевода в одной строке: «cat, kitty», «cat / kitty»
+VARIANT_SEPARATOR = re.compile(r'[,;/]')
+# Длина префикса, по которому строятся удаления (как prefix length в SymSpell)
+PREFIX_LENGTH = 7
+
+_WORD = re.compile(r'[^\W_]+(?:[-\'][^\W_]+)*')
+
+
+def normalize(text: str) -> str:
+    """
+    Приводит перевод или ответ к виду для сравнения: нижний регистр, ё -> е,
+    без знаков препинания, лишних пробелов и артикля в начале.
+
+    Args:
+        text (str): Перевод или ответ пользователя.
+
+    Returns:
+        str: Нормализованная строка (пустая, если в тексте нет слов).
+    """
+    words = _WORD.findall(text.casefold().replace('ё', 'е'))
+    if len(words) > 1 and words[0] in ARTICLES:
+        words = words[1:]
+    return ' '.join(words)
+
+
+def variants(translation: str) -> Set[str]:
+    """Нормализованные варианты перевода, перечисленные через запятую, точку с запятой или /."""
+    return {term for term in map(normalize, VARIANT_SEPARATOR.split(translation)) if term}
+
+
+def allowed_distance(length: int) -> int:
+    """
+    Сколько опечаток допускается в слове такой длины: в коротких словах
+    одна опечатка уже даёт другое слово.
+    """
+    if length < 3:
+        return 0
+    if length < 6:
+        return 1
+    return 2
+
+
+def edit_distance(left: str, right: str, limit: int) -> int:
+    """
+    Расстояние Дамерау-Левенштейна (перестановка соседних букв - одна правка)
+    с отсечением: результат больше limit означает «больше limit».
+
+    Args:
+        left (str): Первая строка.
+        right (str): Вторая строка.
+        limit (int): Наибольшее интересующее расстояние.
+
+    Returns:
+        int: Расстояние или limit + 1.
+    """
+    far = limit + 1
+    if abs(len(left) - len(right)) > limit:
+        return far
+    # Общие начало и конец не меняют расстояние: обычно после них остаётся
+    # одна-две буквы с опечаткой
+    size = min(len(left), len(right))
+    start = 0
+    while start < size and left[start] == right[start]:
+        start += 1
+    end = 0
+    while end < size - start and left[-1 - end] == right[-1 - end]:
+        end += 1
+    left, right = left[start:len(left) - end], right[start:len(right) - end]
+    if not left or not right:
+        return min(len(left) + len(right), far)
+    # Считается только полоса |i - j| <= limit: клетки вне её больше limit
+    width = len(right)
+    previous = None
+    row = [min(j, far) for j in range(width + 1)]
+    for i, char in enumerate(left, 1):
+        low, high = max(1, i - limit), min(width, i + limit)
+        current = [far] * (width + 1)
+        current[0] = min(i, far)
+        for j in range(low, high + 1):
+            other = right[j - 1]
+            value = min(row[j] + 1, current[j - 1] + 1, row[j - 1] + (char != other))
+            if (previous is not None and j > 1 and char == right[j - 2]
+                    and left[i - 2] == other):
+                value = min(value, previous[j - 2] + 1)
+            current[j] = value
+        if min(current[low - 1:high + 1]) > limit:
+            return far
+        previous, row = row, current
+    return min(row[width], far)
+
+
+def _deletes(term: str, depth: int) -> Set[str]:
+    """Префикс термина и все строки, получаемые из него удалением до depth букв."""
+    result = frontier = {term[:PREFIX_LENGTH]}
+    for _ in range(depth):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        result = result | frontier
+    return result
+
+
+def _bag_add(bag: dict, key, value) -> bool:
+    """
+    Добавляет value к значениям ключа (вызывающий не добавляет одно значение
+    дважды). Одно значение хранится без списка: у большинства ключей оно
+    единственное. Возвращает True для нового ключа.
+    """
+    current = bag.get(key)
+    if current is None:
+        bag[key] = value
+        return True
+    if isinstance(current, list):
+        current.append(value)
+    else:
+        bag[key] = [current, value]
+    return False
+
+
+def _bag_remove(bag: dict, key, value) -> bool:
+    """Удаляет value из значений ключа. Возвращает True, если ключ удалён."""
+    current = bag.get(key)
+    if isinstance(current, list):
+        if value in current:
+            current.remove(value)
+            if len(current) == 1:
+                bag[key] = current[0]
+        return False
+    if current == value:
+        del bag[key]
+        return True
+    return False
+
+
+def _bag_values(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+class FuzzyIndex:
+    """
+    Индекс переводов для проверки ответа с опечатками (удаления как в
+    SymSpell): для каждого термина заранее сохранены строки, получаемые из
+    его префикса удалением нескольких букв. Термины на расстоянии k правок
+    от ответа находятся среди терминов с общими удалениями: поиск проверяет
+    несколько десятков удалений независимо от размера словаря и считает
+    расстояние только до терминов с общим удалением.
+
+    Attributes:
+        size (int): Количество различных терминов.
+    """
+
+    def __init__(self) -> None:
+        self._terms: Dict[str, object] = {}
+        self._deletes: Dict[str, object] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self._terms)
+
+    def add(self, word_id: int, translation: str) -> None:
+        """
+        Добавляет перевод слова в индекс.
+
+        Args:
+            word_id (int): ID слова.
+            translation (str): Перевод.
+        """
+        for term in variants(translation):
+            if word_id in self.word_ids(term):
+                continue
+            if _bag_add(self._terms, term, word_id):
+                for delete in _deletes(term, allowed_distance(len(term))):
+                    _bag_add(self._deletes, delete, term)
+
+    def remove(self, word_id: int, translation: str) -> None:
+        """
+        Удаляет перевод удалённого слова из индекса.
+
+        Args:
+            word_id (int): ID слова.
+            translation (str): Перевод.
+        """
+        for term in variants(translation):
+            if _bag_remove(self._terms, term, word_id):
+                for delete in _deletes(term, allowed_distance(len(term))):
+                    _bag_remove(self._deletes, delete, term)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._terms
+
+    def word_ids(self, term: str) -> List[int]:
+        """ID слов, у которых есть такой вариант перевода."""
+        return _bag_values(self._terms.get(term))
+
+    def lookup(self, text: str) -> List[Tuple[str, int]]:
+        """
+        Ближайшие к тексту термины, отличающиеся от него не больше чем на
+        допустимое для их длины число опечаток.
+
+        Удаления запроса перебираются по числу удалённых букв: термин на
+        расстоянии d находится по удалению не больше d букв запроса, поэтому
+        после найденного термина более глубокие удаления не проверяются,
+        а расстояние до следующих кандидатов считается только до d.
+
+        Args:
+            text (str): Нормализованный ответ.
+
+        Returns:
+            List[Tuple[str, int]]: Ближайшие термины и расстояние до них
+            (одинаковое у всех); пустой список, если таких нет.
+        """
+        if not text:
+            return []
+        if text in self._terms:
+            return [(text, 0)]
+        best = allowed_distance(len(text))
+        found: List[str] = []
+        seen = set()
+        level = {text[:PREFIX_LENGTH]}
+        for depth in range(best + 1):
+            if depth > best:
+                break
+            for delete in level:
+                for term in _bag_values(self._deletes.get(delete)):
+                    if term in seen:
+                        continue
+                    seen.add(term)
+                    limit = min(best, allowed_distance(min(len(text), len(term))))
+                    distance = edit_distance(text, term, limit)
+                    if distance > limit:
+                        continue
+                    if distance < best:
+                        best, found = distance, []
+                    found.append(term)
+            level = {word[:i] + word[i + 1:] for word in level for i in range(len(word))}
+        return [(term, best) for term in sorted(found)]
+
+    def extend(self, words: Iterable[Tuple[int, str]]) -> None:
+        """
+        Добавляет несколько слов.
+
+        Args:
+            words (Iterable[Tuple[int, str]]): Пары (ID слова, перевод).
+        """
+        for word_id, translation in words:
+            self.add(word_id, translation)
+
+    async def load(self) -> None:
+        """Заполняет индекс всеми переводами из таблицы Words."""
+        from sqlalchemy import select
+        from models import Words
+
+        async with Session() as session:
+            result = await session.stream(select(Words.id, Words.translation))
+            async for word_id, translation in result:
+                self.add(word_id, translation)
+
+
+class Grade(NamedTuple):
+    """
+    Оценка введённого ответа.
+
+    Attributes:
+        correct (bool): Засчитывается ли ответ.
+        exact (bool): Ответ совпал с переводом без опечаток.
+        other_word (bool): Ответ - перевод другого слова словаря.
+    """
+    correct: bool
+    exact: bool
+    other_word: bool
+
+
+def grade_answer(answer: str, translation: str, index: FuzzyIndex) -> Grade:
+    """
+    Оценивает введённый перевод. Ответ с опечатками засчитывается, если
+    ближайший к нему термин словаря - правильный перевод; совпадение с
+    переводом другого слова («car» вместо «cat») считается ошибкой.
+    Правильный перевод сравнивается и напрямую, поэтому слово, которого
+    ещё нет в индексе этого процесса, оценивается верно.
+
+    Args:
+        answer (str): Ответ пользователя.
+        translation (str): Правильный перевод.
+        index (FuzzyIndex): Индекс переводов словаря.
+
+    Returns:
+        Grade: Оценка ответа.
+    """
+    text = normalize(answer)
+    expected = variants(translation)
+    if text in expected:
+        return Grade(True, True, False)
+    if not text:
+        return Grade(False, False, False)
+    distance = None
+    for term in expected:
+        limit = allowed_distance(min(len(text), len(term)))
+        value = edit_distance(text, term, limit)
+        if value <= limit and (distance is None or value < distance):
+            distance = value
+    closest = index.lookup(text)
+    if distance is not None and (not closest or distance <= closest[0][1]):
+        return Grade(True, False, False)
+    return Grade(False, False, bool(closest) and closest[0][1] == 0)
+
+
+# Общий индекс, заполняется при старте бота
+translation_index = FuzzyIndex()
@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import csv
+import json
+import time
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import select, literal, update
+
+from config import Session
+from db_modules import insert_or_ignore, word_key
+from models import Words, Deck, DeckWord, UserDeck, BASE_DECK
+
+# Размер куска при потоковом чтении JSON-файла
+CHUNK_SIZE = 1 << 16
+
+
+def _iter_json_array(f) -> Iterator[dict]:
+    """
+    Потоково разбирает JSON-массив объектов, не загружая файл целиком.
+
+    Args:
+        f: Открытый текстовый файл.
+
+    Yields:
+        dict: Очередной элемент массива.
+    """
+    decoder = json.JSONDecoder()
+    buf = f.read(CHUNK_SIZE).lstrip()
+    if not buf.startswith('['):
+        raise ValueError('Ожидался JSON-массив')
+    pos = 1
+    eof = False
+    while True:
+        # Пропускаем пробелы и разделители между элементами
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buf) and buf[pos] == ']':
+            return
+        try:
+            item, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Элемент оборван на границе куска: дочитываем файл
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        yield item
+
+def _iter_jsonl(f) -> Iterator[dict]:
+    """
+    Разбирает файл JSON Lines: по одному объекту в строке.
+
+    Args:
+        f: Открытый текстовый файл.
+    """
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def iter_words(path: str) -> Iterator[Dict[str, str]]:
+    """
+    Потоково читает словарь из файла JSON, JSONL или CSV.
+    Каждая запись должна содержать поля word и translation.
+
+    Args:
+        path (str): Путь к файлу; формат определяется по расширению.
+
+    Yields:
+        Dict[str, str]: Словарь с ключами value и translation.
+    """
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if path.endswith('.jsonl'):
+            items = _iter_jsonl(f)
+        elif path.endswith('.csv'):
+            items = csv.DictReader(f)
+        else:
+            items = _iter_json_array(f)
+        for item in items:
+            yield {'value': item['word'], 'translation': item['translation']}
+
+async def _deck_id(name: str) -> int:
+    """Возвращает ID колоды, создавая её при первом импорте."""
+    async with Session() as session:
+        await session.execute(insert_or_ignore(Deck).values(name=name))
+        deck_id = await session.scalar(select(Deck.id).filter_by(name=name))
+        await session.commit()
+    return deck_id
+
+async def _insert_batch(batch: List[dict], base_word: bool, deck_id: Optional[int] = None) -> int:
+    """
+    Вставляет пачку слов, пропуская уже существующие пары (value, translation),
+    и добавляет слова пачки в колоду deck_id (в том числе уже существовавшие).
+
+    Returns:
+        int: Количество действительно добавленных строк.
+    """
+    stmt = (insert_or_ignore(Words)
+            .values([dict(item, base_word=base_word) for item in batch])
+            .returning(Words.id))
+    async with Session() as session:
+        inserted = len((await session.execute(stmt)).all())
+        if deck_id is not None:
+            keys = [word_key(literal(item['value']), literal(item['translation']))
+                    for item in batch]
+            added = (await session.scalars(
+                insert_or_ignore(DeckWord).from_select(
+                    ['deck_id', 'word_id'],
+                    select(literal(deck_id), Words.id)
+                    .where(word_key(Words.value, Words.translation).in_(keys))
+                ).returning(DeckWord.word_id)
+            )).all()
+            if added:
+                # Уже существовавшее слово может оказаться в колоде перед курсором
+                # подписки: курсор возвращается, чтобы слово было показано
+                first = min(added)
+                await session.execute(update(UserDeck)
+                                      .where(UserDeck.deck_id == deck_id,
+                                             UserDeck.cursor >= first)
+                                      .values(cursor=first - 1))
+        await session.commit()
+    return inserted
+
+async def import_words(path: str, base_word: bool = True,
+                       batch_size: int = 1000, deck: Optional[str] = None) -> dict:
+    """
+    Идемпотентно импортирует словарь из файла пачками.
+    Память не зависит от размера файла; повторный запуск добавляет только новые слова.
+
+    Args:
+        path (str): Путь к файлу JSON, JSONL или CSV.
+        base_word (bool): Помечать ли новые слова как базовые.
+        batch_size (int): Количество строк в одном INSERT.
+        deck (Optional[str]): Имя колоды, в которую добавляются слова файла;
+            по умолчанию базовые слова добавляются в колоду BASE_DECK.
+
+    Returns:
+        dict: Количество прочитанных и добавленных строк, время и скорость (строк/с).
+    """
+    started = time.perf_counter()
+    if deck is None and base_word:
+        deck = BASE_DECK
+    deck_id = await _deck_id(deck) if deck else None
+    total = inserted = 0
+    batch = []
+    for item in iter_words(path):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            inserted += await _insert_batch(batch, base_word, deck_id)
+            total += len(batch)
+            batch = []
+    if batch:
+        inserted += await _insert_batch(batch, base_word, deck_id)
+        total += len(batch)
+    elapsed = time.perf_counter() - started
+    return {'total': total, 'inserted': inserted, 'seconds': round(elapsed, 3),
+            'rows_per_sec': round(total / elapsed) if elapsed else total}
+
+def main() -> None:
+    """
+    CLI импорта словаря: python importer.py base_words.json
+    """
+    parser = argparse.ArgumentParser(description='Импорт словаря в базу данных')
+    parser.add_argument('path', help='файл JSON, JSONL или CSV с полями word и translation')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='количество строк в одном INSERT')
+    parser.add_argument('--not-base', action='store_true',
+                        help='не помечать слова как базовые')
+    parser.add_argument('--deck', help=f'колода, в которую добавляются слова '
+                                       f'(по умолчанию базовые - в {BASE_DECK})')
+    args = parser.parse_args()
+    stats = asyncio.run(import_words(args.path, base_word=not args.not_base,
+                                     batch_size=args.batch_size, deck=args.deck))
+    print(f"Прочитано: {stats['total']}, добавлено: {stats['inserted']}, "
+          f"{stats['seconds']} с, {stats['rows_per_sec']} строк/с")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Возвращает модуль, который выполняется при первом обращении к его атрибуту.
+    Так тяжёлые зависимости (SQLAlchemy и слой данных) не замедляют импорт
+    хендлеров и загружаются с первым запросом к базе.
+
+    Args:
+        name (str): Полное имя модуля.
+
+    Returns:
+        ModuleType: Модуль; уже загруженный возвращается как есть.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,1401 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+
+from callbacks import Action, CORRECT_CHOICE, decode, encode
+
+# Адрес локальной заглушки Bot API
+FAKE_API_HOST = '127.0.0.1'
+# Доли действий пользователя во время обучения
+ACTION_WEIGHTS = {'answer': 80, 'next': 8, 'add': 6, 'delete': 6}
+# Холодный старт: импорт bot_main и create_app() в новом процессе
+STARTUP_SNIPPET = ('import time; started = time.perf_counter(); '
+                   'from bot_main import create_app; create_app(); '
+                   'print(time.perf_counter() - started)')
+# Целевое время холодного старта, миллисекунд
+STARTUP_TARGET_MS = 300
+# Обновлений на один замер микробенчмарка выбора обработчика
+DISPATCH_ITERATIONS = 2000
+# Telegram ID пользователей рассылки: не пересекаются с пользователями прогона
+BROADCAST_TG_BASE = 10 ** 9
+# Модельное время рассылки по умолчанию (UTC)
+BROADCAST_CLOCK = '2024-01-15T12:00'
+# Сравнение хранения базовых слов: слов, изученных каждым пользователем,
+# и число пользователей, на которое пересчитываются результаты
+DECK_BENCH_STUDIED = 20
+DECK_BENCH_SCALE = 1_000_000
+# Слов в одной загрузке очереди --deck-bench (и пользователей в пачке отбора)
+DECK_BENCH_BATCH = 20
+# Пользователей, на которых замеряется выбор следующего слова (по пачке
+# карточек на каждого), и слов колоды, уже показанных каждому пользователю --study-bench
+STUDY_BENCH_SAMPLES = 2000
+STUDY_BENCH_SEEN = 10
+# Регистраций на каждый размер базового словаря в --register-bench
+REGISTER_BENCH_USERS = 200
+# Обновлений каждого пользователя в --state-bench (по четыре операции с состоянием)
+STATE_BENCH_ROUNDS = 5
+# Пользователей, проходящих учебную сессию в --srs-bench, и пачек по
+# DECK_BENCH_BATCH слов в сессии
+SRS_BENCH_SAMPLES = 300
+SRS_BENCH_BATCHES = 3
+# Повторов каждого замера --list-bench
+LIST_BENCH_ITERATIONS = 50
+# Запросов каждого вида в --fuzzy-bench
+FUZZY_BENCH_QUERIES = 2000
+# Вопросов в --distractor-bench
+DISTRACTOR_BENCH_QUERIES = 20000
+# Слов, показанных пользователю перед проверкой --queue-check
+QUEUE_CHECK_SHOWN = 10
+
+
+class FakeBotAPI:
+    """
+    Локальная заглушка Telegram Bot API для нагрузочного теста.
+
+    Отвечает на любые методы правдоподобным результатом и запоминает
+    последнюю клавиатуру и ID сообщения в каждом чате, чтобы виртуальные
+    пользователи могли нажимать кнопки.
+
+    Attributes:
+        delay (float): Задержка каждого ответа, секунд (время запроса к Telegram).
+        requests (Dict[str, int]): Количество вызовов по методам.
+        sent (Dict[int, int]): Количество sendMessage по чатам.
+        blocked (Set[int]): Чаты, в которых бот заблокирован (ответ 403).
+    """
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.requests: Dict[str, int] = {}
+        self.sent: Dict[int, int] = {}
+        self.blocked: Set[int] = set()
+        self.markups: Dict[int, dict] = {}
+        self.message_ids: Dict[int, int] = {}
+        self.texts: Dict[int, str] = {}
+        self.edit_dates: Dict[int, int] = {}
+        self._message_id = itertools.count(1)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.requests[method] = self.requests.get(method, 0) + 1
+        params = dict(await request.post())
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if 'chat_id' in params and int(params['chat_id']) in self.blocked:
+            return web.json_response({'ok': False, 'error_code': 403,
+                                      'description': 'Forbidden: bot was blocked by the user'},
+                                     status=403)
+        if method == 'sendMessage':
+            chat_id = int(params['chat_id'])
+            self.sent[chat_id] = self.sent.get(chat_id, 0) + 1
+        result = True
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'loadtest', 'username': 'loadtest'}
+        elif method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params['chat_id'])
+            message_id = (int(params['message_id']) if 'message_id' in params
+                          else next(self._message_id))
+            self.message_ids[chat_id] = message_id
+            self.markups[chat_id] = json.loads(params.get('reply_markup') or '{}')
+            self.texts[chat_id] = params.get('text', '')
+            result = {'message_id': message_id, 'date': int(time.time()),
+                      'chat': {'id': chat_id, 'type': 'private'},
+                      'text': params.get('text', '')}
+            # Как в Telegram: у изменённого сообщения есть время изменения
+            if method == 'editMessageText':
+                self.edit_dates[chat_id] = result['edit_date'] = int(time.time())
+            else:
+                self.edit_dates.pop(chat_id, None)
+        return web.json_response({'ok': True, 'result': result})
+
+    def buttons(self, chat_id: int) -> List[str]:
+        """Возвращает callback_data кнопок последнего сообщения чата."""
+        markup = self.markups.get(chat_id, {})
+        return [button['callback_data'] for row in markup.get('inline_keyboard', [])
+                for button in row if 'callback_data' in button]
+
+    async def start(self, port: int) -> web.AppRunner:
+        """Запускает HTTP-сервер заглушки на FAKE_API_HOST:port."""
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, FAKE_API_HOST, port).start()
+        return runner
+
+
+class UpdateFactory:
+    """Создаёт синтетические обновления Telegram."""
+
+    def __init__(self) -> None:
+        self._update_id = itertools.count(1)
+        self._message_id = itertools.count(1 << 30)
+
+    def message(self, user_id: int, text: str):
+        from telebot import types
+        message = {'message_id': next(self._message_id), 'date': int(time.time()),
+                   'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+                   'chat': {'id': user_id, 'type': 'private'}, 'text': text}
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0,
+                                    'length': len(text.split()[0])}]
+        return types.Update.de_json({'update_id': next(self._update_id), 'message': message})
+
+    def callback(self, user_id: int, data: str, message_id: int, text: str = '',
+                 edit_date: Optional[int] = None):
+        from telebot import types
+        message = {'message_id': message_id, 'date': int(time.time()), 'text': text,
+                   'chat': {'id': user_id, 'type': 'private'}}
+        if edit_date is not None:
+            message['edit_date'] = edit_date
+        return types.Update.de_json({
+            'update_id': next(self._update_id),
+            'callback_query': {
+                'id': str(next(self._update_id)), 'chat_instance': str(user_id), 'data': data,
+                'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+                'message': message,
+            },
+        })
+
+
+class HandlerErrors:
+    """
+    Обработчик исключений бота (интерфейс ExceptionHandler telebot), который
+    считает исключения хендлеров: AsyncTeleBot перехватывает их и пишет в
+    лог, поэтому process_new_updates их не выбрасывает.
+
+    Attributes:
+        count (int): Количество исключений.
+        by_type (Dict[str, int]): Исключения по именам типов.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.by_type: Dict[str, int] = {}
+
+    def handle(self, exception: Exception) -> bool:
+        self.count += 1
+        name = type(exception).__name__
+        self.by_type[name] = self.by_type.get(name, 0) + 1
+        # Не обработано: AsyncTeleBot по-прежнему пишет исключение в лог
+        return False
+
+
+class LoadTest:
+    """
+    Прогон нагрузочного теста: N виртуальных пользователей параллельно
+    регистрируются, учат слова, отвечают, добавляют и удаляют слова.
+    Обновления обрабатываются настоящими хендлерами bot_main: в этом
+    процессе или процессами-обработчиками супервизора (process).
+
+    С долей duplicate_rate нажатие приходит дважды: треть повторов -
+    двойное нажатие (вторая копия с новым update_id одновременно с первой),
+    треть - повторная доставка того же обновления во время обработки,
+    треть - после обработки.
+
+    Attributes:
+        latencies (Dict[str, List[float]]): Время обработки обновлений по действиям.
+        duplicates (int): Отправлено повторных нажатий.
+    """
+
+    def __init__(self, process: Callable[[Any], Awaitable[None]], api: FakeBotAPI,
+                 users: int, steps: int, correct_rate: float, seed: Optional[int],
+                 duplicate_rate: float = 0.0) -> None:
+        self.process = process
+        self.api = api
+        self.users = users
+        self.steps = steps
+        self.correct_rate = correct_rate
+        self.seed = seed
+        self.duplicate_rate = duplicate_rate
+        self.updates = UpdateFactory()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors = 0
+        self.duplicates = 0
+
+    async def _send(self, action: str, update) -> None:
+        started = time.perf_counter()
+        try:
+            await self.process(update)
+        except Exception:
+            self.errors += 1
+        self.latencies.setdefault(action, []).append(time.perf_counter() - started)
+
+    async def _click(self, action: str, user_id: int, data: str, rng: random.Random) -> None:
+        message_id = self.api.message_ids.get(user_id, 1)
+        text = self.api.texts.get(user_id, '')
+        edit_date = self.api.edit_dates.get(user_id)
+        update = self.updates.callback(user_id, data, message_id, text, edit_date)
+        # Без повторов генератор не используется: сценарий прежний
+        if not self.duplicate_rate or rng.random() >= self.duplicate_rate:
+            await self._send(action, update)
+            return
+        self.duplicates += 1
+        kind = rng.random()
+        if kind < 1 / 3:
+            tap = self.updates.callback(user_id, data, message_id, text, edit_date)
+            await asyncio.gather(self._send(action, update), self._send(action, tap))
+        elif kind < 2 / 3:
+            await asyncio.gather(self._send(action, update), self._send(action, update))
+        else:
+            await self._send(action, update)
+            await self._send(action, update)
+
+    async def _user(self, index: int) -> None:
+        # Отдельный генератор на пользователя: сценарий не зависит от
+        # порядка переключения задач
+        rng = random.Random(None if self.seed is None else self.seed * 1000003 + index)
+        user_id = 10 ** 9 + index
+        await self._send('start', self.updates.message(user_id, '/start'))
+        await self._send('register', self.updates.message(user_id, '/register'))
+        await self._send('set_name', self.updates.message(user_id, f'user{index}'))
+        await self._send('study', self.updates.message(user_id, '/study'))
+        actions, weights = zip(*ACTION_WEIGHTS.items())
+        for _ in range(self.steps):
+            buttons = [(data, decode(data)) for data in self.api.buttons(user_id)]
+            answers = [(data, payload[1][1]) for data, payload in buttons
+                       if payload and payload[0] == Action.ANSWER]
+            action = rng.choices(actions, weights)[0] if answers else 'add'
+            if action == 'answer':
+                correct = [data for data, choice in answers if choice == CORRECT_CHOICE]
+                wrong = [data for data, choice in answers if choice != CORRECT_CHOICE]
+                pick = correct if rng.random() < self.correct_rate or not wrong else wrong
+                await self._click('answer', user_id, rng.choice(pick), rng)
+            elif action == 'next':
+                await self._click('next', user_id, encode(Action.NEXT), rng)
+            elif action == 'delete':
+                await self._click('delete', user_id, encode(Action.DELETE_WORD), rng)
+            else:
+                number = rng.randrange(10 ** 6)
+                await self._click('add', user_id, encode(Action.ADD_WORD), rng)
+                await self._send('add', self.updates.message(user_id, f'слово{number}'))
+                await self._send('add', self.updates.message(user_id, f'word{number}'))
+
+    async def run(self) -> float:
+        """
+        Запускает всех пользователей и ждёт завершения.
+
+        Returns:
+            float: Длительность прогона, секунд.
+        """
+        started = time.perf_counter()
+        await asyncio.gather(*(self._user(index) for index in range(self.users)))
+        return time.perf_counter() - started
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Перцентиль q (0..100) методом ближайшего ранга.
+
+    Args:
+        values (List[float]): Отсортированные значения.
+        q (float): Перцентиль.
+    """
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * q // 100))
+    return values[int(rank) - 1]
+
+
+def report(test: LoadTest, elapsed: float, args, processes: Optional[int] = None,
+           handler_errors: Optional[HandlerErrors] = None) -> dict:
+    """
+    Собирает результаты прогона: пропускную способность, перцентили времени
+    по действиям, SQL-запросы на обновление по хендлерам и ошибки: errors -
+    исключения process_new_updates, handler_errors - исключения хендлеров,
+    перехваченные ботом. Метрики и исключения хендлеров при прогоне через
+    супервизор (processes) остаются в процессах-обработчиках, поэтому
+    SQL-запросы, отброшенные повторы и handler_errors не попадают в отчёт.
+    """
+    from config import DEDUP_STORAGE
+    from metrics import registry
+
+    total = sum(len(values) for values in test.latencies.values())
+    actions = {}
+    for action, values in sorted(test.latencies.items()):
+        values = sorted(values)
+        actions[action] = {
+            'count': len(values),
+            'mean_ms': round(sum(values) / len(values) * 1000, 3),
+            'p50_ms': round(percentile(values, 50) * 1000, 3),
+            'p95_ms': round(percentile(values, 95) * 1000, 3),
+            'p99_ms': round(percentile(values, 99) * 1000, 3),
+        }
+    handlers = {}
+    for labels, histogram in sorted(registry.series('update_queries').items()):
+        handlers[dict(labels)['handler']] = {
+            'updates': histogram.count,
+            'queries_per_update': round(histogram.total / histogram.count, 3),
+        }
+    return {
+        'config': {'users': args.users, 'steps': args.steps, 'seed': args.seed,
+                   'correct_rate': args.correct_rate,
+                   'dialect': args.dsn.split('://', 1)[0],
+                   'real_limits': args.real_limits, 'processes': processes,
+                   'duplicate_rate': args.duplicate_rate, 'dedup': DEDUP_STORAGE,
+                   'serial': args.serial, 'api_delay_ms': args.api_delay},
+        'elapsed_s': round(elapsed, 3),
+        'updates': total,
+        'updates_per_s': round(total / elapsed, 1) if elapsed else 0.0,
+        'errors': test.errors,
+        'handler_errors': handler_errors.count if handler_errors else None,
+        'handler_errors_by_type': handler_errors.by_type if handler_errors else None,
+        'duplicates_sent': test.duplicates,
+        'suppressed': {reason: registry.value('updates_suppressed_total', (('reason', reason),))
+                       for reason in ('redelivery', 'double_tap')},
+        'db_queries': registry.value('db_queries_total'),
+        'api_requests': test.api.requests,
+        'actions': actions,
+        'handlers': handlers,
+    }
+
+
+async def dispatch_bench(counts: List[int], iterations: int) -> dict:
+    """
+    Микробенчмарк выбора обработчика inline-кнопки: время обработки одного
+    callback-обновления в AsyncTeleBot при count обработчиках - с фильтром
+    func=lambda на каждый хендлер (нажата последняя кнопка, худший случай)
+    и с одним CallbackRouter. Обработчики пустые, запросов к API нет.
+
+    Args:
+        counts (List[int]): Количества обработчиков (не больше 255).
+        iterations (int): Обновлений на замер.
+
+    Returns:
+        dict: Микросекунд на обновление по количеству обработчиков.
+    """
+    from telebot.async_telebot import AsyncTeleBot
+    from callbacks import CallbackRouter
+
+    async def handler(call, bot, *args) -> None:
+        pass
+
+    async def measure(bot, update) -> float:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await bot.process_new_updates([update])
+        return (time.perf_counter() - started) / iterations * 1e6
+
+    updates = UpdateFactory()
+    result = {}
+    for count in counts:
+        filters = AsyncTeleBot('0:bench')
+        for index in range(count):
+            filters.register_callback_query_handler(
+                handler, pass_bot=True,
+                func=lambda call, data=f'action{index}_call': call.data == data)
+        # Коды с конца диапазона: без аргументов, как у большинства кнопок
+        router = CallbackRouter()
+        for index in range(count):
+            router.register(255 - index, handler)
+        table = AsyncTeleBot('0:bench')
+        table.register_callback_query_handler(router.dispatch, func=None, pass_bot=True)
+        result[count] = {
+            'filters_us': round(await measure(filters, updates.callback(
+                1, f'action{count - 1}_call', 1)), 2),
+            'router_us': round(await measure(table, updates.callback(1, encode(256 - count), 1)), 2),
+        }
+    return result
+
+
+def cold_start(runs: int, target_ms: float = STARTUP_TARGET_MS, top: int = 10) -> dict:
+    """
+    Замеряет холодный старт: время от запуска импорта до готового бота
+    (create_app()) в новых процессах, и по одному прогону с -X importtime
+    определяет, какие пакеты занимают время импорта.
+
+    Args:
+        runs (int): Количество замеров.
+        target_ms (float): Целевое время, миллисекунд.
+        top (int): Сколько самых долгих пакетов показать.
+
+    Returns:
+        dict: медиана и минимум времени, цель и пакеты по собственному времени импорта.
+    """
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, '-c', STARTUP_SNIPPET], cwd=cwd,
+                              capture_output=True, text=True, check=True)
+        timings.append(float(proc.stdout.split()[-1]) * 1000)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_SNIPPET],
+                          cwd=cwd, capture_output=True, text=True, check=True)
+    packages: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        # import time: <собственное, мкс> | <с зависимостями, мкс> | <модуль>
+        parts = line.split('|')
+        if len(parts) != 3 or not parts[0].split(':')[-1].strip().isdigit():
+            continue
+        name = parts[2].strip().split('.')[0]
+        packages[name] = packages.get(name, 0) + int(parts[0].split(':')[-1])
+    median = statistics.median(timings)
+    return {
+        'runs': runs,
+        'ready_ms_median': round(median, 1),
+        'ready_ms_min': round(min(timings), 1),
+        'target_ms': target_ms,
+        'ok': median <= target_ms,
+        'import_ms_by_package': {name: round(us / 1000, 1) for name, us in
+                                 sorted(packages.items(), key=lambda item: -item[1])[:top]},
+    }
+
+
+async def prepare(args) -> None:
+    """
+    Создаёт таблицы (с --reset - заново) и загружает базовый словарь.
+    """
+    from config import get_engine
+    from models import Base, create_tables
+    from importer import import_words
+
+    engine = get_engine()
+    if args.reset:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+    await create_tables(engine)
+    await import_words('base_words.json')
+
+
+async def run(args) -> dict:
+    """
+    Готовит базу, поднимает заглушку Bot API и выполняет прогон.
+    С --serial обновления обрабатываются по одному, как в прежнем
+    синхронном боте (TeleBot с блокирующими запросами к базе и Bot API):
+    так сравнивается пропускная способность асинхронной обработки.
+    """
+    api = FakeBotAPI(args.api_delay / 1000)
+    runner = await api.start(args.api_port)
+
+    # Модули бота читают настройки при импорте
+    from config import get_engine
+    from distractors import distractor_pool
+    from study_session import study_sessions
+    from metrics import registry
+    from bot_main import create_app
+
+    bot = create_app()
+    handler_errors = bot.exception_handler = HandlerErrors()
+    await prepare(args)
+    await distractor_pool.load()
+    if args.seed is not None:
+        random.seed(args.seed)
+        distractor_pool.seed(args.seed)
+
+    serial = asyncio.Lock() if args.serial else None
+
+    async def process(update) -> None:
+        if serial is None:
+            await bot.process_new_updates([update])
+            return
+        async with serial:
+            await bot.process_new_updates([update])
+
+    registry.enabled = True
+    test = LoadTest(process, api, args.users, args.steps, args.correct_rate, args.seed,
+                    args.duplicate_rate)
+    try:
+        elapsed = await test.run()
+        await study_sessions.close()
+    finally:
+        await bot.close_session()
+        await runner.cleanup()
+        await get_engine().dispose()
+    return report(test, elapsed, args, handler_errors=handler_errors)
+
+
+async def run_scaling(args) -> dict:
+    """
+    Прогоняет один и тот же сценарий через супервизор с разным количеством
+    процессов-обработчиков (--processes 1,2,4,8). Время запуска процессов
+    в замеры не входит.
+    """
+    api = FakeBotAPI(args.api_delay / 1000)
+    runner = await api.start(args.api_port)
+
+    from config import get_engine
+    from supervisor import ShardSupervisor
+
+    results = []
+    try:
+        for processes in args.processes:
+            await prepare(args)
+            # Соединения родителя не нужны во время прогона
+            await get_engine().dispose()
+            supervisor = ShardSupervisor(processes)
+            supervisor.start()
+            try:
+                await supervisor.wait_ready()
+                test = LoadTest(supervisor.process, api, args.users, args.steps,
+                                args.correct_rate, args.seed, args.duplicate_rate)
+                elapsed = await test.run()
+            finally:
+                await supervisor.close()
+            results.append(report(test, elapsed, args, processes))
+    finally:
+        await runner.cleanup()
+    return {
+        'runs': results,
+        'updates_per_s': {result['config']['processes']: result['updates_per_s']
+                          for result in results},
+    }
+
+
+async def broadcast(args) -> dict:
+    """
+    Прогон рассылки напоминаний по --broadcast пользователям с модельным
+    временем --clock: первая рассылка прерывается после одной пачки,
+    вторая (новый Broadcaster, как после перезапуска) продолжает её с
+    контрольной точки, третья не должна отправить ничего. Проверяется, что
+    каждый подходящий пользователь получил ровно одно напоминание.
+    """
+    api = FakeBotAPI()
+    runner = await api.start(args.api_port)
+
+    import config
+    from bot_connect import create_bot
+    from models import User, ReminderRun
+    from reminders import Broadcaster, offset_ranges
+    from db_modules import upsert
+
+    await prepare(args)
+    rng = random.Random(args.seed)
+    now = datetime.fromisoformat(args.clock)
+    # Часовые поясы с шагом 30 минут; у части пользователей пояс не указан
+    users = [{'tg_id': BROADCAST_TG_BASE + index,
+              'username': f'broadcast{index}',
+              'utc_offset': rng.choice([None] + list(range(-12 * 60, 14 * 60 + 1, 30))),
+              'base_linked': False, 'reminders': True, 'reminded_at': None}
+             for index in range(args.broadcast)]
+    api.blocked = {user['tg_id'] for user in users if rng.random() < args.blocked_rate}
+    ranges = offset_ranges(now, config.REMINDER_HOUR_FROM, config.REMINDER_HOUR_TO)
+    expected = {user['tg_id'] for user in users
+                if any(low <= (config.REMINDER_DEFAULT_UTC_OFFSET if user['utc_offset'] is None
+                               else user['utc_offset']) < high for low, high in ranges)}
+    async with config.Session() as session:
+        for start in range(0, len(users), 500):
+            await session.execute(upsert(User, users[start:start + 500], ['tg_id'],
+                                         ['utc_offset', 'base_linked', 'reminders',
+                                          'reminded_at']))
+        await session.execute(ReminderRun.__table__.update()
+                              .where(ReminderRun.finished_at.is_(None)).values(finished_at=now))
+        await session.commit()
+
+    bot = create_bot(config)
+    try:
+        interrupted = await Broadcaster(bot, clock=lambda: now).run_once(max_batches=1)
+        resumed = await Broadcaster(bot, clock=lambda: now).run_once()
+        repeated = await Broadcaster(bot, clock=lambda: now).run_once()
+    finally:
+        await bot.close_session()
+        await runner.cleanup()
+        await config.get_engine().dispose()
+    delivered = {chat_id for chat_id in api.sent if chat_id not in api.blocked}
+    return {
+        'clock': now.isoformat(),
+        'users': len(users),
+        'expected': len(expected - api.blocked),
+        'delivered': len(delivered),
+        'missed': len(expected - api.blocked - delivered),
+        'unexpected': len(delivered - expected),
+        'duplicates': sum(count - 1 for count in api.sent.values() if count > 1),
+        'blocked': len(expected & api.blocked),
+        'runs': {'interrupted': interrupted, 'resumed': resumed, 'repeated': repeated},
+    }
+
+
+async def _database_bytes(session) -> int:
+    """Размер базы данных в байтах."""
+    from sqlalchemy import text
+
+    if session.bind.dialect.name == 'sqlite':
+        pages = await session.scalar(text('PRAGMA page_count'))
+        return pages * await session.scalar(text('PRAGMA page_size'))
+    return await session.scalar(text('SELECT pg_database_size(current_database())'))
+
+
+def _latency(values: List[float]) -> dict:
+    """p50/p95 задержек в миллисекундах."""
+    values = sorted(values)
+    return {'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2)}
+
+
+async def deck_bench(args) -> dict:
+    """
+    Хранение базовых слов в текущем режиме BASE_WORDS_MODE: регистрирует
+    --deck-bench пользователей, каждый изучает --deck-seen слов (пачками
+    по DECK_BENCH_BATCH, как учебная сессия). Замеряет рост базы и строки
+    users_words на пользователя (с пересчётом на DECK_BENCH_SCALE
+    пользователей), задержку регистрации, загрузки очереди и записи
+    ответов, а для пользователей, далеко прошедших колоду, - загрузку
+    очереди, первую страницу /list и отбор для напоминаний.
+    Режимы и глубину сравнивают несколькими запусками.
+    """
+    from sqlalchemy import select, func
+    from config import BASE_WORDS_MODE, Session, get_engine
+    from importer import import_words
+    from models import Users_words
+    import db_modules as db
+
+    await prepare(args)
+    await import_words(args.deck_words)
+    async with Session() as session:
+        before = await _database_bytes(session)
+    timings: Dict[str, List[float]] = {name: [] for name in (
+        'create_user', 'get_due_words', 'flush_reviews', 'get_due_words_studied',
+        'list_words_studied', 'reminder_targets_studied')}
+
+    async def timed(name: str, coro):
+        started = time.perf_counter()
+        result = await coro
+        timings[name].append(time.perf_counter() - started)
+        return result
+
+    for index in range(args.deck_bench):
+        tg_id = BROADCAST_TG_BASE + index
+        await timed('create_user', db.create_user(tg_id, f'deck{index}'))
+        studied = 0
+        while studied < args.deck_seen:
+            words = await timed('get_due_words', db.get_due_words(
+                tg_id, min(DECK_BENCH_BATCH, args.deck_seen - studied)))
+            if not words:
+                break
+            now = datetime.utcnow()
+            await timed('flush_reviews', db.flush_reviews(
+                tg_id, {word_id: (now, [(True, now, 1000)]) for _, _, word_id in words}))
+            studied += len(words)
+    # Пользователи, которые уже прошли --deck-seen слов колоды
+    for index in range(args.deck_bench):
+        tg_id = BROADCAST_TG_BASE + index
+        await timed('get_due_words_studied', db.get_due_words(tg_id, DECK_BENCH_BATCH))
+        await timed('list_words_studied', db.list_words(tg_id, 0, False, DECK_BENCH_BATCH))
+    # Все пользователи ответили только что, и повторять им нечего: в отбор
+    # проходит тот, у кого остались непоказанные слова колоды
+    now = datetime.utcnow()
+    cursor = 0
+    while True:
+        batch = await timed('reminder_targets_studied', db.reminder_targets(
+            cursor, DECK_BENCH_BATCH, now, [(-24 * 60, 24 * 60)], 0, timedelta(days=-1)))
+        if not batch:
+            break
+        cursor = batch[-1][0]
+    async with Session() as session:
+        after = await _database_bytes(session)
+        rows = await session.scalar(select(func.count()).select_from(Users_words))
+    await get_engine().dispose()
+    per_user = (after - before) / args.deck_bench
+    return {
+        'mode': BASE_WORDS_MODE,
+        'users': args.deck_bench,
+        'studied_per_user': args.deck_seen,
+        'users_words_per_user': round(rows / args.deck_bench, 1),
+        'bytes_per_user': round(per_user),
+        f'users_words_rows_at_{DECK_BENCH_SCALE}': round(rows / args.deck_bench * DECK_BENCH_SCALE),
+        f'gb_at_{DECK_BENCH_SCALE}': round(per_user * DECK_BENCH_SCALE / 1e9, 2),
+        'latency': {name: _latency(values) for name, values in timings.items() if values},
+    }
+
+
+async def _legacy_study_word(tg_id: int) -> Tuple:
+    """
+    Прежний выбор слова, с которым сравнивается --study-bench: поиск
+    пользователя, самое давно не показанное слово его словаря, чтение
+    слова и отметка показа - четыре запроса на каждую карточку.
+    """
+    from sqlalchemy import select
+    from config import Session
+    from models import User, Words, Users_words
+
+    async with Session() as session:
+        user_id = await session.scalar(select(User.id).filter_by(tg_id=tg_id))
+        if user_id is None:
+            return None, None, None
+        user_word = await session.scalar(select(Users_words).filter_by(user_id=user_id)
+                                         .order_by(Users_words.last_shown.asc().nullsfirst())
+                                         .limit(1))
+        if user_word is None:
+            return None, None, None
+        word = await session.get(Words, user_word.word_id)
+        user_word.last_shown = datetime.utcnow()
+        await session.commit()
+        return word.value, word.translation, word.id
+
+
+async def study_bench(args) -> dict:
+    """
+    Выбор следующего слова в базе на --study-bench пользователей:
+    пользователи и их история (по STUDY_BENCH_SEEN показанных слов колоды,
+    у трети срок повторения наступил) создаются set-based запросами.
+    Для STUDY_BENCH_SAMPLES случайных пользователей замеряются карточки
+    учебной сессии бота (StudySessions.next_card: пачка get_due_words
+    загружается каждые STUDY_BATCH_SIZE карточек, первая - без пользователя
+    в кэше), отдельно загрузка пачки и прежний выбор по одному слову
+    (_legacy_study_word): среднее, p50/p95/p99 и SQL-запросов на карточку.
+    """
+    from sqlalchemy import select, insert, literal, case, true
+    from config import BASE_WORDS_MODE, STUDY_BATCH_SIZE, Session, get_engine
+    from metrics import registry
+    from models import User, Words, Users_words, Deck, UserDeck, BASE_DECK
+    from study_session import StudySessions
+    import db_modules as db
+
+    await prepare(args)
+    now = datetime.utcnow()
+    async with Session() as session:
+        for start in range(0, args.study_bench, 10000):
+            await session.execute(insert(User), [
+                {'tg_id': BROADCAST_TG_BASE + index, 'username': f'study{index}',
+                 'base_linked': True}
+                for index in range(start, min(start + 10000, args.study_bench))])
+        base = select(Words.id).where(Words.base_word.is_(True)).order_by(Words.id)
+        seen = base.limit(STUDY_BENCH_SEEN).scalar_subquery()
+        await session.execute(insert(Users_words).from_select(
+            ['user_id', 'word_id', 'last_shown', 'due_at'],
+            select(User.id, Words.id, literal(now - timedelta(days=2)),
+                   case(((User.id + Words.id) % 3 == 0, literal(now - timedelta(hours=1))),
+                        else_=literal(now + timedelta(days=1))))
+            .join_from(User, Words, true())
+            .where(Words.id.in_(seen))))
+        if BASE_WORDS_MODE == 'shared':
+            await session.execute(insert(UserDeck).from_select(
+                ['user_id', 'deck_id'],
+                select(User.id, Deck.id).join_from(User, Deck, true())
+                .where(Deck.name == BASE_DECK)))
+        else:
+            await session.execute(insert(Users_words).from_select(
+                ['user_id', 'word_id'],
+                select(User.id, Words.id).join_from(User, Words, true())
+                .where(Words.base_word.is_(True), Words.id.notin_(seen))))
+        await session.commit()
+    rng = random.Random(args.seed)
+    sample = rng.sample(range(args.study_bench), min(STUDY_BENCH_SAMPLES, args.study_bench))
+    names = ('next_card', 'get_due_words', 'legacy')
+    timings: Dict[str, List[float]] = {name: [] for name in names}
+    queries = dict.fromkeys(names, 0)
+    registry.enabled = True
+    sessions = StudySessions()
+
+    async def measure(name, call):
+        before = registry.value('db_queries_total')
+        started = time.perf_counter()
+        await call
+        timings[name].append(time.perf_counter() - started)
+        queries[name] += registry.value('db_queries_total') - before
+
+    for index in sample:
+        tg_id = BROADCAST_TG_BASE + index
+        for _ in range(STUDY_BATCH_SIZE):
+            await measure('next_card', sessions.next_card(tg_id))
+        await measure('get_due_words', db.get_due_words(tg_id, STUDY_BATCH_SIZE))
+        await measure('legacy', _legacy_study_word(tg_id))
+    await sessions.close()
+    await get_engine().dispose()
+    latency = {}
+    for name, values in timings.items():
+        values = sorted(values)
+        latency[name] = {'mean_ms': round(statistics.mean(values) * 1000, 3),
+                         'p50_ms': round(percentile(values, 50) * 1000, 3),
+                         'p95_ms': round(percentile(values, 95) * 1000, 3),
+                         'p99_ms': round(percentile(values, 99) * 1000, 3)}
+    return {
+        'mode': BASE_WORDS_MODE,
+        'users': args.study_bench,
+        'samples': len(sample),
+        'batch_size': STUDY_BATCH_SIZE,
+        'queries_per_card': {
+            'next_card': round(queries['next_card'] / len(timings['next_card']), 2),
+            'legacy': round(queries['legacy'] / len(timings['legacy']), 2),
+        },
+        'queries_per_batch': round(queries['get_due_words'] / len(timings['get_due_words']), 2),
+        'latency': latency,
+    }
+
+
+async def queue_check(args) -> dict:
+    """
+    Проверка порядка очереди повторения: пользователь с колодой базовых
+    слов и своим новым словом отвечает на первые QUEUE_CHECK_SHOWN слов,
+    на одно - неверно. Когда срок повторения этого слова наступает, оно
+    должно прийти раньше непоказанных слов колоды и новых слов
+    пользователя - и в пачке get_due_words, и в карточке учебной сессии.
+    """
+    from config import BASE_WORDS_MODE, get_engine
+    from scheduler import RELEARN_DELAY
+    from study_session import StudySessions
+    import db_modules as db
+
+    await prepare(args)
+    tg_id = BROADCAST_TG_BASE
+    await db.create_user(tg_id, 'queue')
+    await db.add_words(tg_id, [('новое', 'new')])
+    shown = await db.get_due_words(tg_id, QUEUE_CHECK_SHOWN)
+    # Ответы в прошлом: срок повторения неверного ответа уже наступил
+    answered = datetime.utcnow() - 2 * RELEARN_DELAY
+    reviews = {word_id: (answered, [(True, answered, 1000)]) for _, _, word_id in shown}
+    overdue = shown[-1][2]
+    reviews[overdue] = (answered, [(False, answered, 1000)])
+    await db.flush_reviews(tg_id, reviews)
+    queue = [word_id for _, _, word_id in await db.get_due_words(tg_id, QUEUE_CHECK_SHOWN)]
+    sessions = StudySessions()
+    card = await sessions.next_card(tg_id)
+    study_word = card.word_id if card else None
+    await sessions.close()
+    await get_engine().dispose()
+    return {
+        'mode': BASE_WORDS_MODE,
+        'overdue_word': overdue,
+        'queue_head': queue[:3],
+        'study_word': study_word,
+        'ok': bool(queue) and queue[0] == overdue and study_word == overdue,
+    }
+
+
+def _random_word(rng: random.Random, letters: str) -> str:
+    """Случайное слово из 6-10 букв."""
+    return ''.join(rng.choice(letters) for _ in range(rng.randint(6, 10)))
+
+
+async def _import_random_words(count: int, rng: random.Random, base_word: bool = True) -> None:
+    """Импортирует count случайных пар «слово - перевод» через importer."""
+    from importer import import_words
+
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', encoding='utf-8',
+                                     delete=False) as f:
+        for _ in range(count):
+            f.write(json.dumps({
+                'word': _random_word(rng, 'абвгдежзиклмнопрстуфхцчшэюя'),
+                'translation': _random_word(rng, 'abcdefghijklmnopqrstuvwxyz')},
+                ensure_ascii=False) + '\n')
+    try:
+        await import_words(f.name, base_word)
+    finally:
+        os.remove(f.name)
+
+
+async def srs_bench(args) -> dict:
+    """
+    Симуляция интервального повторения: --srs-bench пользователей по
+    --srs-cards карточек в словаре (set-based запросами; у четверти
+    карточек срок повторения наступил, у четверти - новые, остальные -
+    в будущем). SRS_BENCH_SAMPLES случайных пользователей проходят учебную
+    сессию: SRS_BENCH_BATCHES раз загружают пачку get_due_words и
+    записывают ответы flush_reviews. В отчёте - задержки, ответов в
+    секунду и due_first_ok: первая пачка состоит только из карточек с
+    наступившим сроком.
+    """
+    from sqlalchemy import select, insert, literal, case, null, true, func
+    from config import Session, get_engine
+    from models import User, Words, Users_words
+    import db_modules as db
+
+    await prepare(args)
+    rng = random.Random(args.seed)
+    async with Session() as session:
+        first_word = await session.scalar(select(func.max(Words.id)))
+    await _import_random_words(args.srs_cards, rng, base_word=False)
+    now = datetime.utcnow()
+    async with Session() as session:
+        for start in range(0, args.srs_bench, 10000):
+            await session.execute(insert(User), [
+                {'tg_id': BROADCAST_TG_BASE + index, 'username': f'srs{index}',
+                 'base_linked': True}
+                for index in range(start, min(start + 10000, args.srs_bench))])
+        bucket = (User.id * 7 + Words.id) % 4
+        await session.execute(insert(Users_words).from_select(
+            ['user_id', 'word_id', 'last_shown', 'due_at'],
+            select(User.id, Words.id,
+                   case((bucket == 1, null()), else_=literal(now - timedelta(days=3))),
+                   case((bucket == 0, literal(now - timedelta(hours=1))),
+                        (bucket == 1, null()),
+                        (bucket == 2, literal(now + timedelta(days=1))),
+                        else_=literal(now + timedelta(days=7))))
+            .join_from(User, Words, true())
+            .where(Words.id > first_word)))
+        await session.commit()
+    timings: Dict[str, List[float]] = {'get_due_words': [], 'flush_reviews': []}
+    reviews = 0
+    due_first_ok = True
+    started = time.perf_counter()
+    for index in rng.sample(range(args.srs_bench), min(SRS_BENCH_SAMPLES, args.srs_bench)):
+        tg_id = BROADCAST_TG_BASE + index
+        for batch in range(SRS_BENCH_BATCHES):
+            moment = time.perf_counter()
+            words = await db.get_due_words(tg_id, DECK_BENCH_BATCH)
+            timings['get_due_words'].append(time.perf_counter() - moment)
+            word_ids = [word_id for _, _, word_id in words]
+            if batch == 0:
+                async with Session() as session:
+                    due = await session.scalars(
+                        select(Users_words.due_at)
+                        .join(User, User.id == Users_words.user_id)
+                        .where(User.tg_id == tg_id, Users_words.word_id.in_(word_ids)))
+                    due_first_ok &= all(value is not None and value <= now for value in due)
+            answered = datetime.utcnow()
+            moment = time.perf_counter()
+            await db.flush_reviews(tg_id, {
+                word_id: (answered, [(rng.random() < args.correct_rate, answered, 1000)])
+                for word_id in word_ids})
+            timings['flush_reviews'].append(time.perf_counter() - moment)
+            reviews += len(word_ids)
+    elapsed = time.perf_counter() - started
+    await get_engine().dispose()
+    return {
+        'users': args.srs_bench,
+        'cards_per_user': args.srs_cards,
+        'sessions': min(SRS_BENCH_SAMPLES, args.srs_bench),
+        'reviews': reviews,
+        'reviews_per_s': round(reviews / elapsed, 1),
+        'due_first_ok': due_first_ok,
+        'latency': {name: {**_latency(values),
+                           'p99_ms': round(percentile(sorted(values), 99) * 1000, 2)}
+                    for name, values in timings.items()},
+    }
+
+
+async def register_bench(args) -> dict:
+    """
+    Задержка регистрации в зависимости от размера базового словаря в
+    текущем режиме BASE_WORDS_MODE: базовый словарь дополняется случайными
+    словами до каждого размера из --register-bench, затем регистрируются
+    REGISTER_BENCH_USERS пользователей. Замеряются create_user и первая
+    карточка учебной сессии (в режиме lazy базовые слова привязываются
+    при загрузке её пачки).
+    """
+    from sqlalchemy import select, func
+    from config import BASE_WORDS_MODE, Session, get_engine
+    from models import Words, Users_words
+    from study_session import StudySessions
+    import db_modules as db
+
+    await prepare(args)
+    rng = random.Random(args.seed)
+    sessions = StudySessions()
+    results = {}
+    for size in sorted(args.register_bench):
+        async with Session() as session:
+            count = await session.scalar(select(func.count()).select_from(Words)
+                                         .where(Words.base_word.is_(True)))
+            rows_before = await session.scalar(select(func.count()).select_from(Users_words))
+        if size > count:
+            await _import_random_words(size - count, rng)
+        timings: Dict[str, List[float]] = {'create_user': [], 'first_study': []}
+        for index in range(REGISTER_BENCH_USERS):
+            tg_id = BROADCAST_TG_BASE + size * REGISTER_BENCH_USERS + index
+            started = time.perf_counter()
+            await db.create_user(tg_id, f'register{index}')
+            timings['create_user'].append(time.perf_counter() - started)
+            started = time.perf_counter()
+            await sessions.next_card(tg_id)
+            timings['first_study'].append(time.perf_counter() - started)
+        async with Session() as session:
+            rows = await session.scalar(select(func.count()).select_from(Users_words))
+        results[size] = {
+            'users_words_per_user': round((rows - rows_before) / REGISTER_BENCH_USERS, 1),
+            'latency': {name: _latency(values) for name, values in timings.items()},
+        }
+    await sessions.close()
+    await get_engine().dispose()
+    return {'mode': BASE_WORDS_MODE, 'users': REGISTER_BENCH_USERS, 'base_words': results}
+
+
+async def state_bench(args) -> dict:
+    """
+    Операций с состоянием FSM в секунду по хранилищам: memory, таблица
+    bot_state (sql) и Redis по REDIS_URL - без кэша и с CachedStateStorage.
+    Каждый из --state-bench пользователей STATE_BENCH_ROUNDS раз выполняет
+    операции одного обновления: set_state, set_data, get_state, get_data.
+    Для постоянных хранилищ после записи отложенных изменений новое
+    хранилище без кэша читает состояния обратно (persisted_ok) - проверка
+    работает с любым сервером протокола Redis. С --fake-redis хранилища
+    Redis работают с fakeredis в памяти процесса (без сети). Если пакета
+    redis (fakeredis) нет или сервер недоступен, хранилища Redis
+    пропускаются с причиной.
+    """
+    from telebot.asyncio_storage import StateMemoryStorage, StateRedisStorage
+    from config import REDIS_URL, get_engine
+    from state_storage import CachedStateStorage
+    from state_storage_sql import StateSQLStorage
+
+    await prepare(args)
+    pools = {}
+
+    def redis_storage():
+        if not args.fake_redis:
+            return StateRedisStorage(redis_url=REDIS_URL)
+        if 'fake' not in pools:
+            import fakeredis
+            # Один сервер на все хранилища: проверка чтения видит записанное
+            pools['fake'] = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer()).connection_pool
+        return StateRedisStorage(connection_pool=pools['fake'])
+
+    backends = {
+        'memory': StateMemoryStorage,
+        'sql': StateSQLStorage,
+        'redis': redis_storage,
+    }
+    users = [BROADCAST_TG_BASE + index for index in range(args.state_bench)]
+    expected = ('learning', {'word_id': STATE_BENCH_ROUNDS - 1})
+    results = {}
+    for name, backend in backends.items():
+        for cached in ((False,) if name == 'memory' else (False, True)):
+            label = f'{name}_cached' if cached else name
+            try:
+                storage = CachedStateStorage(backend()) if cached else backend()
+                # Первая операция проверяет соединение с сервером
+                await storage.set_state(users[0], users[0], 'learning')
+            except Exception as e:
+                results[label] = {'skipped': f'{type(e).__name__}: {e}'}
+                continue
+            started = time.perf_counter()
+            for round_number in range(STATE_BENCH_ROUNDS):
+                for user_id in users:
+                    await storage.set_state(user_id, user_id, 'learning')
+                    await storage.set_data(user_id, user_id, 'word_id', round_number)
+                    await storage.get_state(user_id, user_id)
+                    await storage.get_data(user_id, user_id)
+            elapsed = time.perf_counter() - started
+            result = results[label] = {
+                'ops_per_s': round(4 * STATE_BENCH_ROUNDS * len(users) / elapsed)}
+            if name == 'memory':
+                continue
+            if cached:
+                await storage.close()
+            fresh = backend()
+            persisted = 0
+            for user_id in users[:10]:
+                record = (await fresh.get_state(user_id, user_id),
+                          await fresh.get_data(user_id, user_id))
+                persisted += record == expected
+            result['persisted_ok'] = persisted == len(users[:10])
+            for user_id in users:
+                await fresh.delete_state(user_id, user_id)
+    await get_engine().dispose()
+    return {'users': args.state_bench, 'rounds': STATE_BENCH_ROUNDS,
+            'redis': 'fakeredis' if args.fake_redis else REDIS_URL, 'backends': results}
+
+
+async def list_bench(args) -> dict:
+    """
+    Задержка /list и /find в зависимости от размера словаря: для каждого
+    размера из --list-bench создаётся пользователь с таким количеством слов
+    и замеряются первая, последняя и предыдущая страницы и поиск
+    подстрокой, с опечаткой и по началу из двух букв (медиана
+    LIST_BENCH_ITERATIONS повторов).
+    """
+    from config import get_engine
+    from bot_modules import LIST_PAGE_SIZE
+    import db_modules as db
+
+    await prepare(args)
+    results = {}
+    for size in args.list_bench:
+        tg_id = BROADCAST_TG_BASE + size
+        rng = random.Random(size)
+        # Случайные слова: у похожих строк вида word1, word2 ... все триграммы общие
+        pairs = [(_random_word(rng, 'абвгдежзиклмнопрстуфхцчшэюя'),
+                  _random_word(rng, 'abcdefghijklmnopqrstuvwxyz')) for _ in range(size)]
+        await db.create_user(tg_id, f'list{size}')
+        await db.add_words(tg_id, pairs)
+        target = pairs[size // 2][1]
+        typo = target[0] + target[2] + target[1] + target[3:]
+        words = await db.list_words(tg_id, 0, False, LIST_PAGE_SIZE)
+        last = (await db.list_words(tg_id, 2 ** 31 - 1, True, 1))[0][2]
+        cases = {
+            'first_page': lambda: db.list_words(tg_id, 0, False, LIST_PAGE_SIZE + 1),
+            'last_page': lambda: db.list_words(tg_id, last - 1, False, LIST_PAGE_SIZE + 1),
+            'previous_page': lambda: db.list_words(tg_id, last, True, LIST_PAGE_SIZE + 1),
+            'find_substring': lambda: db.find_words(tg_id, target[1:5], LIST_PAGE_SIZE),
+            'find_fuzzy': lambda: db.find_words(tg_id, typo, LIST_PAGE_SIZE),
+            'find_short': lambda: db.find_words(tg_id, target[:2], LIST_PAGE_SIZE),
+        }
+        timings = {}
+        for name, call in cases.items():
+            await call()
+            values = []
+            for _ in range(LIST_BENCH_ITERATIONS):
+                started = time.perf_counter()
+                await call()
+                values.append(time.perf_counter() - started)
+            timings[name] = round(statistics.median(values) * 1000, 2)
+        results[size] = {'words_on_first_page': len(words), 'median_ms': timings}
+    await get_engine().dispose()
+    return results
+
+
+def fuzzy_bench(size: int, seed: int = 0) -> dict:
+    """
+    Индекс переводов для ввода ответа на словаре из size случайных слов
+    (3-12 латинских букв): время построения, прирост памяти процесса
+    (пиковый RSS, Linux) и задержка поиска и оценки ответа без опечаток,
+    с одной и двумя опечатками и для слова не из словаря.
+
+    Args:
+        size (int): Слов в словаре.
+        seed (int): Зерно генератора слов.
+
+    Returns:
+        dict: Время построения, память и медиана/p99 задержки в микросекундах.
+    """
+    import resource
+    from fuzzy import FuzzyIndex, grade_answer
+
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    rng = random.Random(seed)
+    words = [''.join(rng.choice(letters) for _ in range(rng.randint(3, 12)))
+             for _ in range(size)]
+
+    def typo(word: str) -> str:
+        position = rng.randrange(len(word))
+        return word[:position] + rng.choice(letters) + word[position + 1:]
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    index = FuzzyIndex()
+    for word_id, word in enumerate(words):
+        index.add(word_id, word)
+    build = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    sample = rng.sample(words, FUZZY_BENCH_QUERIES)
+    long_words = [word for word in sample if len(word) >= 6]
+    queries = {
+        'exact': [(word, word) for word in sample],
+        'one_typo': [(typo(word), word) for word in sample],
+        'two_typos': [(typo(typo(word)), word) for word in long_words],
+        'unknown': [(''.join(rng.choice(letters) for _ in range(8)), word) for word in sample],
+    }
+    latency = {}
+    for name, pairs in queries.items():
+        for operation, call in (('lookup', lambda answer, word: index.lookup(answer)),
+                                ('grade', lambda answer, word: grade_answer(answer, word, index))):
+            values = []
+            for answer, word in pairs:
+                started = time.perf_counter()
+                call(answer, word)
+                values.append(time.perf_counter() - started)
+            values.sort()
+            latency[f'{operation}_{name}'] = {
+                'p50_us': round(percentile(values, 50) * 1e6, 1),
+                'p99_us': round(percentile(values, 99) * 1e6, 1),
+            }
+    return {
+        'words': size,
+        'terms': index.size,
+        'build_seconds': round(build, 1),
+        'rss_mb': round((rss_after - rss_before) / 1024),
+        'latency': latency,
+    }
+
+
+def distractor_bench(size: int, seed: int = 0) -> dict:
+    """
+    Неверные варианты ответа: пул DistractorPool из size случайных переводов
+    против прежних fake.words(nb=3) из Faker (если пакет установлен).
+    Замеряются построение пула, задержка выбора трёх вариантов на
+    DISTRACTOR_BENCH_QUERIES вопросов, доля вариантов с длиной, близкой к
+    правильному ответу, и время импорта Faker в отдельном процессе.
+
+    Args:
+        size (int): Переводов в пуле.
+        seed (int): Зерно генератора слов и выбора вариантов.
+
+    Returns:
+        dict: Время построения, p50/p99 выбора в микросекундах и доли.
+    """
+    from distractors import DistractorPool, MAX_LENGTH_DISTANCE
+
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    rng = random.Random(seed)
+    words = [''.join(rng.choice(letters) for _ in range(rng.randint(3, 12)))
+             for _ in range(size)]
+    started = time.perf_counter()
+    pool = DistractorPool(seed)
+    pool.extend(words)
+    build = time.perf_counter() - started
+
+    def measure(call) -> dict:
+        values, close, total = [], 0, 0
+        for correct in rng.choices(words, k=DISTRACTOR_BENCH_QUERIES):
+            started = time.perf_counter()
+            options = call(correct)
+            values.append(time.perf_counter() - started)
+            total += len(options)
+            close += sum(abs(len(option) - len(correct)) <= MAX_LENGTH_DISTANCE
+                         for option in options)
+        values.sort()
+        return {'p50_us': round(percentile(values, 50) * 1e6, 2),
+                'p99_us': round(percentile(values, 99) * 1e6, 2),
+                'close_length_share': round(close / total, 3) if total else None}
+
+    result = {
+        'words': size,
+        'pool_size': pool.size,
+        'build_ms': round(build * 1000, 1),
+        'pool': measure(pool.sample),
+        'faker': None,
+        'faker_import_ms': None,
+    }
+    try:
+        from faker import Faker
+    except ImportError:
+        # Faker больше не зависимость бота: без пакета сравнения нет
+        return result
+    fake = Faker()
+    fake.seed_instance(seed)
+    result['faker'] = measure(lambda correct: fake.words(nb=3))
+    output = subprocess.run(
+        [sys.executable, '-c', 'import time; started = time.perf_counter(); import faker; '
+                               'print(time.perf_counter() - started)'],
+        capture_output=True, text=True, check=True).stdout
+    result['faker_import_ms'] = round(float(output) * 1000, 1)
+    return result
+
+
+def main() -> None:
+    """
+    CLI нагрузочного теста:
+    python loadtest.py --users 200 --steps 50 --seed 1 --out result.json
+    """
+    parser = argparse.ArgumentParser(description='Нагрузочный тест хендлеров бота')
+    parser.add_argument('--users', type=int, default=100, help='количество пользователей')
+    parser.add_argument('--steps', type=int, default=30,
+                        help='действий каждого пользователя после /study')
+    parser.add_argument('--correct-rate', type=float, default=0.7,
+                        help='доля верных ответов')
+    parser.add_argument('--seed', type=int, help='зерно для воспроизводимого сценария')
+    parser.add_argument('--dsn', default='sqlite+aiosqlite:///loadtest.db',
+                        help='строка подключения к тестовой базе')
+    parser.add_argument('--reset', action='store_true', help='пересоздать таблицы перед прогоном')
+    parser.add_argument('--api-port', type=int, default=18080, help='порт заглушки Bot API')
+    parser.add_argument('--duplicate-rate', type=float, default=0.0,
+                        help='доля нажатий, приходящих дважды (двойное нажатие '
+                             'или повторная доставка)')
+    parser.add_argument('--api-delay', type=float, default=0.0, metavar='MS',
+                        help='задержка ответов заглушки Bot API, мс (время запроса к Telegram)')
+    parser.add_argument('--serial', action='store_true',
+                        help='обрабатывать обновления по одному, как синхронный бот')
+    parser.add_argument('--real-limits', action='store_true',
+                        help='оставить лимиты Telegram на исходящие сообщения')
+    parser.add_argument('--out', help='файл для результатов в JSON')
+    parser.add_argument('--processes', type=lambda value: [int(n) for n in value.split(',')],
+                        help='прогнать через супервизор с указанным количеством '
+                             'процессов-обработчиков, через запятую: 1,2,4,8')
+    parser.add_argument('--cold-start', type=int, metavar='RUNS',
+                        help='вместо прогона замерить холодный старт RUNS раз')
+    parser.add_argument('--target-ms', type=float, default=STARTUP_TARGET_MS,
+                        help='целевое время холодного старта, мс')
+    parser.add_argument('--dispatch-bench', type=lambda value: [int(n) for n in value.split(',')],
+                        metavar='COUNTS',
+                        help='вместо прогона замерить выбор обработчика кнопки '
+                             'при указанном количестве обработчиков: 8,32,128')
+    parser.add_argument('--broadcast', type=int, metavar='USERS',
+                        help='вместо прогона проверить рассылку напоминаний на USERS пользователях')
+    parser.add_argument('--clock', default=BROADCAST_CLOCK,
+                        help='модельное время рассылки UTC, ISO 8601')
+    parser.add_argument('--blocked-rate', type=float, default=0.05,
+                        help='доля пользователей, заблокировавших бота')
+    parser.add_argument('--deck-bench', type=int, metavar='USERS',
+                        help='вместо прогона замерить хранение базовых слов '
+                             '(режим BASE_WORDS_MODE) на USERS пользователях')
+    parser.add_argument('--deck-words', default='base_words.json',
+                        help='базовый словарь для --deck-bench')
+    parser.add_argument('--deck-seen', type=int, default=DECK_BENCH_STUDIED,
+                        help='сколько слов колоды изучает каждый пользователь --deck-bench')
+    parser.add_argument('--register-bench', type=lambda value: [int(n) for n in value.split(',')],
+                        metavar='SIZES',
+                        help='вместо прогона замерить регистрацию при базовом словаре '
+                             'указанных размеров: 1000,10000,50000')
+    parser.add_argument('--state-bench', type=int, metavar='USERS',
+                        help='вместо прогона замерить операции с состоянием FSM '
+                             'по хранилищам на USERS пользователях')
+    parser.add_argument('--fake-redis', action='store_true',
+                        help='в --state-bench использовать fakeredis в памяти '
+                             'процесса вместо сервера REDIS_URL')
+    parser.add_argument('--srs-bench', type=int, metavar='USERS',
+                        help='вместо прогона смоделировать интервальное повторение '
+                             'на USERS пользователях')
+    parser.add_argument('--srs-cards', type=int, default=1000,
+                        help='карточек в словаре каждого пользователя --srs-bench')
+    parser.add_argument('--list-bench', type=lambda value: [int(n) for n in value.split(',')],
+                        metavar='SIZES',
+                        help='вместо прогона замерить /list и /find для словарей '
+                             'указанных размеров: 100,1000,10000')
+    parser.add_argument('--study-bench', type=int, metavar='USERS',
+                        help='вместо прогона замерить выбор следующего слова '
+                             'в базе на USERS пользователей')
+    parser.add_argument('--queue-check', action='store_true',
+                        help='вместо прогона проверить, что слово с наступившим сроком '
+                             'повторения показывается раньше новых слов')
+    parser.add_argument('--distractor-bench', type=int, metavar='WORDS',
+                        help='вместо прогона сравнить выбор неверных вариантов из пула '
+                             'WORDS случайных переводов с Faker')
+    parser.add_argument('--fuzzy-bench', type=int, metavar='WORDS',
+                        help='вместо прогона замерить индекс переводов для ввода '
+                             'ответа на словаре из WORDS случайных слов')
+    args = parser.parse_args()
+
+    # Настройки задаются до импорта модулей бота
+    os.environ['DB_DSN'] = args.dsn
+    os.environ['TELEGRAM_API_URL'] = f'http://{FAKE_API_HOST}:{args.api_port}'
+    os.environ.setdefault('BOT_TOKEN', '0:loadtest')
+    os.environ['BOT_MODE'] = 'polling'
+    if not args.real_limits:
+        os.environ['TG_GLOBAL_RATE'] = os.environ['TG_CHAT_RATE'] = '1e9'
+        os.environ['TG_CHAT_BURST'] = '1e9'
+        os.environ['REMINDER_RATE'] = '1e9'
+
+    # Прогон с ошибками и нарушенный порядок очереди завершаются с кодом 1
+    failed = False
+    if args.cold_start:
+        result = cold_start(args.cold_start, args.target_ms)
+    elif args.fuzzy_bench:
+        result = fuzzy_bench(args.fuzzy_bench, args.seed or 0)
+    elif args.distractor_bench:
+        result = distractor_bench(args.distractor_bench, args.seed or 0)
+    elif args.broadcast:
+        result = asyncio.run(broadcast(args))
+    elif args.deck_bench:
+        result = asyncio.run(deck_bench(args))
+    elif args.srs_bench:
+        result = asyncio.run(srs_bench(args))
+        failed = not result['due_first_ok']
+    elif args.register_bench:
+        result = asyncio.run(register_bench(args))
+    elif args.state_bench:
+        result = asyncio.run(state_bench(args))
+    elif args.list_bench:
+        result = asyncio.run(list_bench(args))
+    elif args.study_bench:
+        result = asyncio.run(study_bench(args))
+    elif args.queue_check:
+        result = asyncio.run(queue_check(args))
+        failed = not result['ok']
+    elif args.dispatch_bench:
+        result = asyncio.run(dispatch_bench(args.dispatch_bench, DISPATCH_ITERATIONS))
+    elif args.processes:
+        result = asyncio.run(run_scaling(args))
+        failed = any(run['errors'] for run in result['runs'])
+    else:
+        result = asyncio.run(run(args))
+        failed = bool(result['errors'] or result['handler_errors'])
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
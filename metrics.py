@@ -0,0 +1,325 @@
+import bisect
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from telebot import asyncio_helper
+
+from config import METRICS_ENABLED
+
+# Границы корзин гистограмм задержки, секунд
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы корзин количества запросов к базе на одно обновление
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Количество SQL-запросов в рамках текущего обновления; None вне обработчика
+_update_queries: contextvars.ContextVar[Optional[List[int]]] = \
+    contextvars.ContextVar('update_queries', default=None)
+# Гистограммы, в которые уже пишет внешний вызов @timed: вложенные вызовы не пишут
+_timed_active: contextvars.ContextVar[frozenset] = \
+    contextvars.ContextVar('timed_active', default=frozenset())
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами в формате Prometheus.
+
+    Attributes:
+        buckets (tuple): Верхние границы корзин.
+        counts (List[int]): Количество наблюдений в каждой корзине (не накопительно).
+        total (float): Сумма наблюдений.
+        count (int): Количество наблюдений.
+    """
+
+    def __init__(self, buckets: tuple) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Учитывает одно наблюдение."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Хранилище метрик: гистограммы и счётчики с метками.
+
+    Пока enabled=False, декораторы и обработчики событий не записывают
+    ничего, а их накладные расходы сводятся к проверке флага.
+    Включается и выключается во время работы через /metrics/on и /metrics/off.
+
+    Attributes:
+        enabled (bool): Записываются ли метрики.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._buckets: Dict[str, tuple] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._gauges: List[Callable[[], Iterator[Tuple[str, Labels, float]]]] = []
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = LATENCY_BUCKETS) -> None:
+        """Объявляет гистограмму."""
+        self._histograms.setdefault(name, {})
+        self._buckets[name] = buckets
+        self._help[name] = help_text
+
+    def counter(self, name: str, help_text: str) -> None:
+        """Объявляет счётчик."""
+        self._counters.setdefault(name, {})
+        self._help[name] = help_text
+
+    def gauge(self, collect: Callable[[], Iterator[Tuple[str, Labels, float]]]) -> None:
+        """
+        Регистрирует функцию, возвращающую текущие значения (имя, метки, значение)
+        в момент чтения /metrics.
+        """
+        self._gauges.append(collect)
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        """Добавляет наблюдение в гистограмму name с метками labels."""
+        series = self._histograms[name]
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram(self._buckets[name])
+        histogram.observe(value)
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1) -> None:
+        """Увеличивает счётчик name с метками labels."""
+        series = self._counters[name]
+        series[labels] = series.get(labels, 0) + value
+
+    def series(self, name: str) -> Dict[Labels, Histogram]:
+        """Возвращает гистограммы name по меткам."""
+        return dict(self._histograms[name])
+
+    def value(self, name: str, labels: Labels = ()) -> float:
+        """Возвращает значение счётчика name."""
+        return self._counters[name].get(labels, 0)
+
+    def render(self) -> str:
+        """
+        Возвращает все метрики в текстовом формате Prometheus.
+        """
+        lines = []
+        for name, series in self._histograms.items():
+            lines.append(f'# HELP {name} {self._help[name]}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = _format_labels(labels + (('le', repr(float(bound))),))
+                    lines.append(f'{name}_bucket{le} {cumulative}')
+                le = _format_labels(labels + (('le', '+Inf'),))
+                lines.append(f'{name}_bucket{le} {histogram.count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {histogram.total}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+        for name, series in self._counters.items():
+            lines.append(f'# HELP {name} {self._help[name]}')
+            lines.append(f'# TYPE {name} counter')
+            for labels, value in series.items():
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        # Значения одного gauge могут идти вперемешку с другими: группируются по имени
+        gauges: Dict[str, List[Tuple[Labels, float]]] = {}
+        for collect in self._gauges:
+            for name, labels, value in collect():
+                gauges.setdefault(name, []).append((labels, value))
+        for name, series in gauges.items():
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in series:
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+registry = Registry(METRICS_ENABLED)
+registry.histogram('handler_seconds', 'Время обработки обновления хендлером')
+registry.histogram('scenario_seconds', 'Время сценариев бота (study)')
+registry.histogram('db_seconds', 'Время выполнения функций db_modules')
+registry.histogram('telegram_seconds', 'Время запроса к Telegram Bot API')
+registry.histogram('update_queries', 'SQL-запросов на одно обновление', QUERY_BUCKETS)
+registry.counter('db_queries_total', 'Выполненные SQL-запросы')
+registry.counter('errors_total', 'Исключения по месту возникновения')
+registry.counter('updates_suppressed_total', 'Отброшенные повторные обновления по причинам')
+
+
+@contextmanager
+def measure(name: str, labels: Labels = ()) -> Iterator[None]:
+    """
+    Контекстный менеджер: записывает длительность блока в гистограмму name
+    и считает исключения в errors_total.
+
+    Args:
+        name (str): Имя гистограммы.
+        labels (Labels): Метки, например (('function', 'add_word'),).
+    """
+    if not registry.enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        registry.inc('errors_total', (('metric', name),) + labels)
+        raise
+    finally:
+        registry.observe(name, time.perf_counter() - started, labels)
+
+
+def timed(name: str) -> Callable:
+    """
+    Декоратор асинхронной функции: записывает её длительность в гистограмму
+    name с меткой function=<имя функции>. Вызов из другой функции с тем же
+    name не записывается: время уже учтено внешним вызовом.
+
+    Args:
+        name (str): Имя гистограммы, например 'db_seconds'.
+    """
+    def decorator(func: Callable) -> Callable:
+        labels = (('function', func.__name__),)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            active = _timed_active.get()
+            if not registry.enabled or name in active:
+                return await func(*args, **kwargs)
+            token = _timed_active.set(active | {name})
+            try:
+                with measure(name, labels):
+                    return await func(*args, **kwargs)
+            finally:
+                _timed_active.reset(token)
+        return wrapper
+    return decorator
+
+
+def instrument_handler(func: Callable) -> Callable:
+    """
+    Декоратор хендлера бота: время обработки, ошибки и количество
+    SQL-запросов, выполненных за время обработки обновления.
+    Ставится под декоратором регистрации хендлера. Хендлер, вызванный из
+    другого хендлера, считает запросы в счётчик внешнего: обновление
+    попадает в update_queries один раз.
+    """
+    labels = (('handler', func.__name__),)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if not registry.enabled:
+            return await func(*args, **kwargs)
+        if _update_queries.get() is not None:
+            with measure('handler_seconds', labels):
+                return await func(*args, **kwargs)
+        counter = [0]
+        token = _update_queries.set(counter)
+        try:
+            with measure('handler_seconds', labels):
+                return await func(*args, **kwargs)
+        finally:
+            _update_queries.reset(token)
+            registry.observe('update_queries', counter[0], labels)
+    return wrapper
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    if not registry.enabled:
+        return
+    registry.inc('db_queries_total')
+    counter = _update_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def instrument_engine(engine) -> None:
+    """
+    Подписывается на выполнение SQL-запросов engine: общий счётчик запросов
+    и счётчик текущего обновления. Вызывается при создании engine.
+
+    Args:
+        engine (AsyncEngine): Асинхронный engine.
+    """
+    from sqlalchemy import event
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', _count_query)
+
+
+def instrument_telegram() -> None:
+    """
+    Оборачивает отправку запросов к Telegram Bot API: время и ошибки
+    по имени метода (sendMessage, editMessageReplyMarkup и т.д.).
+    """
+    process_request = asyncio_helper._process_request
+    if getattr(process_request, 'instrumented', False):
+        return
+
+    @functools.wraps(process_request)
+    async def wrapper(token, url, *args, **kwargs):
+        if not registry.enabled:
+            return await process_request(token, url, *args, **kwargs)
+        with measure('telegram_seconds', (('method', url),)):
+            return await process_request(token, url, *args, **kwargs)
+
+    wrapper.instrumented = True
+    asyncio_helper._process_request = wrapper
+
+
+def create_metrics_app():
+    """
+    Создаёт aiohttp-приложение с метриками:
+    GET /metrics - метрики в формате Prometheus,
+    POST /metrics/on и /metrics/off - включение и выключение записи.
+
+    Returns:
+        web.Application: Приложение для локального адреса.
+    """
+    # aiohttp.web нужен только с включённым сервером метрик
+    from aiohttp import web
+
+    async def scrape(request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(),
+                            content_type='text/plain', charset='utf-8')
+
+    async def switch(request: web.Request) -> web.Response:
+        registry.enabled = request.match_info['mode'] == 'on'
+        return web.Response(text=f'enabled={registry.enabled}\n')
+
+    app = web.Application()
+    app.router.add_get('/metrics', scrape)
+    app.router.add_post('/metrics/{mode:on|off}', switch)
+    return app
+
+
+async def start_metrics_server(host: str, port: int):
+    """
+    Запускает HTTP-сервер метрик.
+
+    Args:
+        host (str): Адрес, по умолчанию только локальный.
+        port (int): Порт.
+
+    Returns:
+        web.AppRunner: Runner, который нужно остановить через cleanup().
+    """
+    from aiohttp import web
+
+    runner = web.AppRunner(create_metrics_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
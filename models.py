@@ -1,6 +1,7 @@
 import sqlalchemy as sq
 
 from sqlalchemy import UniqueConstraint
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -25,6 +26,28 @@ class Words(Base):
 
     user_words = relationship('Users_words', back_populates='word')
 
+    __table_args__ = (
+        # Уникальность без учёта регистра: «Кот - Cat» и «кот - cat» - одно слово.
+        # По этому же индексу ищется слово при добавлении
+        sq.Index('uix_word_value_translation_lower', sq.func.lower(value),
+                 sq.func.lower(translation), unique=True),
+    )
+
+# Поиск /find: триграммные индексы pg_trgm для LIKE '%...%' и нечёткого
+# совпадения (оператор %). В SQLite поиск идёт по индексу в памяти (search.py)
+sq.Index('ix_word_value_trgm', sq.func.lower(Words.value).label('value_lower'),
+         postgresql_using='gin',
+         postgresql_ops={'value_lower': 'gin_trgm_ops'}).ddl_if(dialect='postgresql')
+sq.Index('ix_word_translation_trgm', sq.func.lower(Words.translation).label('translation_lower'),
+         postgresql_using='gin',
+         postgresql_ops={'translation_lower': 'gin_trgm_ops'}).ddl_if(dialect='postgresql')
+# Короткие запросы /find (меньше трёх символов) ищутся по началу: LIKE '...%'
+# по B-tree с text_pattern_ops, который не зависит от правил сортировки базы
+sq.Index('ix_word_value_prefix', sq.func.lower(Words.value).label('value_lower'),
+         postgresql_ops={'value_lower': 'text_pattern_ops'}).ddl_if(dialect='postgresql')
+sq.Index('ix_word_translation_prefix', sq.func.lower(Words.translation).label('translation_lower'),
+         postgresql_ops={'translation_lower': 'text_pattern_ops'}).ddl_if(dialect='postgresql')
+
 class User(Base):
     """
     Модель пользователя в базе данных.
@@ -33,6 +56,11 @@ class User(Base):
         id (int): PK пользователя.
         tg_id (int): Telegram ID пользователя.
         username (Optional[str]): Имя пользователя.
+        base_linked (bool): Флаг, привязаны ли к пользователю базовые слова.
+        utc_offset (Optional[int]): Смещение часового пояса от UTC, минут;
+            NULL - REMINDER_DEFAULT_UTC_OFFSET.
+        reminders (bool): Отправлять ли напоминания.
+        reminded_at (Optional[datetime]): Время последнего напоминания.
         user_words: Связь с таблицей Users_words.
     """
     __tablename__ = 'user'
@@ -40,6 +68,12 @@ class User(Base):
     id = sq.Column(sq.Integer, primary_key=True)
     tg_id = sq.Column(sq.BigInteger, unique=True, nullable=False)
     username = sq.Column(sq.String(length=248))
+    base_linked = sq.Column(sq.Boolean, nullable=False, default=True,
+                            server_default=sq.true())
+    utc_offset = sq.Column(sq.Integer, nullable=True)
+    reminders = sq.Column(sq.Boolean, nullable=False, default=True,
+                          server_default=sq.true())
+    reminded_at = sq.Column(sq.DateTime, nullable=True)
 
     user_words = relationship('Users_words', back_populates='user')
 
@@ -52,6 +86,11 @@ class Users_words(Base):
         user_id (int): FK на пользователя.
         word_id (int): FK на слово.
         last_shown (Optional[datetime]): Дата и время последнего показа слова пользователю.
+        ease (float): Коэффициент лёгкости интервального повторения (SM-2).
+        interval (float): Текущий интервал повторения, дней.
+        due_at (Optional[datetime]): Когда слово нужно повторить; NULL - новое слово.
+        streak (int): Количество верных ответов подряд.
+        hidden (bool): Слово колоды удалено пользователем из словаря.
         user: Связь с моделью User.
         word: Связь с моделью Words.
     """
@@ -59,8 +98,15 @@ class Users_words(Base):
 
     id = sq.Column(sq.Integer, primary_key=True)
     user_id = sq.Column(sq.Integer, sq.ForeignKey('user.id'), nullable=False)
-    word_id = sq.Column(sq.Integer, sq.ForeignKey('word.id'), nullable=False)
+    # Индекс для поиска связей слова (проверка, используется ли слово):
+    # уникальный ключ (user_id, word_id) для поиска по word_id не подходит
+    word_id = sq.Column(sq.Integer, sq.ForeignKey('word.id'), nullable=False, index=True)
     last_shown = sq.Column(sq.DateTime, nullable=True, index=True)
+    ease = sq.Column(sq.Float, nullable=False, default=2.5, server_default='2.5')
+    interval = sq.Column(sq.Float, nullable=False, default=0, server_default='0')
+    due_at = sq.Column(sq.DateTime, nullable=True)
+    streak = sq.Column(sq.Integer, nullable=False, default=0, server_default='0')
+    hidden = sq.Column(sq.Boolean, nullable=False, default=False, server_default=sq.false())
 
     user = relationship(User, back_populates='user_words')
     word = relationship(Words, back_populates='user_words')
@@ -69,11 +115,208 @@ class Users_words(Base):
         UniqueConstraint('user_id', 'word_id', name='uix_user_word'),
     )
 
-def create_tables(engine):
+# Очередь повторения: слова с наступившим сроком, новые (NULL) и с будущим
+# сроком - три диапазона одного индекса (_study_queue). SQLite не поддерживает
+# NULLS FIRST в индексах, но и так ставит NULL первыми
+sq.Index('ix_users_words_user_due', Users_words.user_id,
+         Users_words.due_at.asc().nullsfirst()).ddl_if(dialect='postgresql')
+sq.Index('ix_users_words_user_due', Users_words.user_id,
+         Users_words.due_at).ddl_if(callable_=lambda ddl, target, bind, **kw:
+                                    bind.dialect.name != 'postgresql')
+
+# Колода базовых слов (--init-db)
+BASE_DECK = 'base'
+
+class Deck(Base):
+    """
+    Общая колода слов (базовый словарь или подборка из файла).
+    Слова колоды доступны подписанным пользователям без строк в users_words:
+    строка появляется при первом показе слова, удалении или изменении.
+
+    Attributes:
+        id (int): PK колоды.
+        name (str): Уникальное имя колоды.
+    """
+    __tablename__ = 'deck'
+
+    id = sq.Column(sq.Integer, primary_key=True)
+    name = sq.Column(sq.String(length=64), unique=True, nullable=False)
+
+class DeckWord(Base):
+    """
+    Слово колоды. Первичный ключ (deck_id, word_id) задаёт порядок показа
+    новых слов колоды.
+
+    Attributes:
+        deck_id (int): FK на колоду.
+        word_id (int): FK на слово.
+    """
+    __tablename__ = 'deck_word'
+
+    deck_id = sq.Column(sq.Integer, sq.ForeignKey('deck.id'), primary_key=True)
+    # Индекс для проверки, входит ли слово в колоду (удаление слова)
+    word_id = sq.Column(sq.Integer, sq.ForeignKey('word.id'), primary_key=True, index=True)
+
+class UserDeck(Base):
+    """
+    Подписка пользователя на колоду.
+
+    Attributes:
+        user_id (int): FK на пользователя.
+        deck_id (int): FK на колоду.
+        cursor (int): Все слова колоды с word_id не больше cursor уже
+            показаны пользователю (у них есть строка users_words);
+            непоказанные слова ищутся после него.
+    """
+    __tablename__ = 'user_deck'
+
+    user_id = sq.Column(sq.Integer, sq.ForeignKey('user.id'), primary_key=True)
+    deck_id = sq.Column(sq.Integer, sq.ForeignKey('deck.id'), primary_key=True)
+    cursor = sq.Column(sq.Integer, nullable=False, default=0, server_default='0')
+
+class AnswerEvent(Base):
+    """
+    Журнал ответов: одна строка на ответ, только добавление.
+    word_id без внешнего ключа: история остаётся после удаления слова.
+
+    Attributes:
+        id (int): PK события.
+        user_id (int): FK на пользователя.
+        word_id (int): ID слова.
+        correct (bool): Верен ли ответ.
+        latency_ms (Optional[int]): Время от показа вопроса до ответа, мс.
+        answered_at (datetime): Время ответа.
+    """
+    __tablename__ = 'answer_event'
+
+    id = sq.Column(sq.BigInteger().with_variant(sq.Integer, 'sqlite'), primary_key=True)
+    user_id = sq.Column(sq.Integer, sq.ForeignKey('user.id'), nullable=False)
+    word_id = sq.Column(sq.Integer, nullable=False)
+    correct = sq.Column(sq.Boolean, nullable=False)
+    latency_ms = sq.Column(sq.Integer, nullable=True)
+    answered_at = sq.Column(sq.DateTime, nullable=False)
+
+    __table_args__ = (
+        sq.Index('ix_answer_event_user_time', 'user_id', 'answered_at'),
+    )
+
+class UserStats(Base):
+    """
+    Статистика ответов пользователя, обновляемая вместе с записью ответов
+    в answer_event (без подсчёта по журналу).
+
+    Attributes:
+        user_id (int): FK на пользователя.
+        answers (int): Всего ответов.
+        correct (int): Верных ответов.
+        streak (int): Текущая серия верных ответов.
+        best_streak (int): Лучшая серия верных ответов.
+        latency_ms_total (int): Сумма времени ответов, мс.
+        latency_count (int): Количество ответов с известным временем.
+        last_answer_at (Optional[datetime]): Время последнего ответа.
+    """
+    __tablename__ = 'user_stats'
+
+    user_id = sq.Column(sq.Integer, sq.ForeignKey('user.id'), primary_key=True)
+    answers = sq.Column(sq.Integer, nullable=False, default=0, server_default='0')
+    correct = sq.Column(sq.Integer, nullable=False, default=0, server_default='0')
+    streak = sq.Column(sq.Integer, nullable=False, default=0, server_default='0')
+    best_streak = sq.Column(sq.Integer, nullable=False, default=0, server_default='0')
+    latency_ms_total = sq.Column(sq.BigInteger, nullable=False, default=0, server_default='0')
+    latency_count = sq.Column(sq.Integer, nullable=False, default=0, server_default='0')
+    last_answer_at = sq.Column(sq.DateTime, nullable=True)
+
+class ReminderRun(Base):
+    """
+    Контрольная точка рассылки напоминаний: незавершённая рассылка
+    продолжается после перезапуска с пользователя, следующего за cursor.
+
+    Attributes:
+        id (int): PK рассылки.
+        started_at (datetime): Время начала.
+        finished_at (Optional[datetime]): Время завершения; NULL - не завершена.
+        cursor (int): PK последнего обработанного пользователя.
+        sent (int): Отправлено напоминаний.
+        blocked (int): Пользователей, заблокировавших бота.
+        failed (int): Ошибок отправки.
+    """
+    __tablename__ = 'reminder_run'
+
+    id = sq.Column(sq.Integer, primary_key=True)
+    started_at = sq.Column(sq.DateTime, nullable=False)
+    finished_at = sq.Column(sq.DateTime, nullable=True)
+    cursor = sq.Column(sq.Integer, nullable=False, default=0, server_default='0')
+    sent = sq.Column(sq.Integer, nullable=False, default=0, server_default='0')
+    blocked = sq.Column(sq.Integer, nullable=False, default=0, server_default='0')
+    failed = sq.Column(sq.Integer, nullable=False, default=0, server_default='0')
+
+class BotState(Base):
+    """
+    Состояние FSM пользователя в чате и связанные с ним данные.
+
+    Attributes:
+        user_id (int): Telegram ID пользователя.
+        chat_id (int): ID чата.
+        state (str): Имя состояния.
+        data (dict): Данные состояния (например, word_id изучаемого слова).
+    """
+    __tablename__ = 'bot_state'
+
+    user_id = sq.Column(sq.BigInteger, primary_key=True)
+    chat_id = sq.Column(sq.BigInteger, primary_key=True)
+    state = sq.Column(sq.String(length=248), nullable=False)
+    data = sq.Column(sq.JSON, nullable=False, default=dict)
+
+def _create_indexes(conn) -> None:
+    """
+    Создаёт индексы, которых ещё нет: create_all создаёт индексы только
+    вместе с новой таблицей, а в существующей базе их нужно добавить.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            # IF NOT EXISTS вместо checkfirst: SQLite не отражает индексы по
+            # выражениям, и проверка их не находит. _invoke_with учитывает ddl_if
+            CreateIndex(index, if_not_exists=True)._invoke_with(conn)
+
+def _add_missing_columns(conn) -> None:
+    """
+    Добавляет в существующие таблицы столбцы, которых в них ещё нет:
+    create_all не изменяет созданные ранее таблицы. Новые столбцы
+    заполняются значением server_default (base_linked = true: в старой схеме
+    базовые слова копировались при регистрации), due_at - временем
+    последнего показа, чтобы показанные слова сразу попали в повторение.
+    """
+    inspector = sq.inspect(conn)
+    existing = set(inspector.get_table_names())
+    compiler = conn.dialect.ddl_compiler(conn.dialect, None)
+    preparer = conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        present = {column['name'] for column in inspector.get_columns(table.name)}
+        added = [column for column in table.columns if column.name not in present]
+        for column in added:
+            # Спецификация как в CREATE TABLE: тип диалекта, DEFAULT, NOT NULL
+            conn.execute(sq.text(f'ALTER TABLE {preparer.format_table(table)} '
+                                 f'ADD COLUMN {compiler.get_column_specification(column)}'))
+        if table is Users_words.__table__ and Users_words.due_at in added:
+            conn.execute(sq.update(Users_words)
+                         .where(Users_words.due_at.is_(None),
+                                Users_words.last_shown.is_not(None))
+                         .values(due_at=Users_words.last_shown))
+
+async def create_tables(engine) -> None:
     """
-    Создаёт все таблицы в базе данных.
+    Создаёт все таблицы в базе данных, добавляет недостающие столбцы
+    и индексы существующих таблиц (обновление схемы при --init-db).
 
     Args:
-        engine (Engine): SQLAlchemy Engine для подключения к базе.
+        engine (AsyncEngine): асинхронный SQLAlchemy Engine для подключения к базе.
     """
-    Base.metadata.create_all(engine)
\ No newline at end of file
+    async with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            # Операторы триграммных индексов поиска
+            await conn.execute(sq.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_indexes)
\ No newline at end of file
@@ -0,0 +1,169 @@
+import asyncio
+import functools
+import logging
+import time
+from typing import Dict, Optional
+
+from telebot import asyncio_helper
+from telebot.asyncio_helper import ApiTelegramException
+
+from config import TG_GLOBAL_RATE, TG_CHAT_RATE, TG_CHAT_BURST, TG_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Методы, отправляющие или изменяющие сообщения: на них действуют лимиты
+# Telegram (около 30 сообщений в секунду всего и 1 в секунду на чат)
+LIMITED_METHODS = frozenset({
+    'sendMessage', 'editMessageText', 'editMessageReplyMarkup', 'sendPhoto',
+    'sendDocument', 'sendAudio', 'sendVoice', 'sendVideo', 'sendAnimation',
+    'sendSticker', 'sendMediaGroup', 'copyMessage', 'forwardMessage',
+})
+# Сколько корзин чатов хранить до очистки простаивающих
+MAX_CHAT_BUCKETS = 10000
+
+
+class TokenBucket:
+    """
+    Корзина токенов: rate токенов в секунду, не больше capacity.
+
+    reserve() списывает токен сразу, уходя в минус, и возвращает время
+    ожидания, поэтому одновременные запросы встают в очередь без блокировок.
+
+    Attributes:
+        rate (float): Пополнение, токенов в секунду.
+        capacity (float): Максимум токенов (допустимая пачка запросов).
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """
+        Занимает один токен.
+
+        Returns:
+            float: Сколько секунд подождать перед запросом.
+        """
+        self._refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Откладывает следующие запросы на seconds секунд (после ответа 429)."""
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    @property
+    def idle(self) -> bool:
+        """Корзина полная - её можно удалить без потери состояния."""
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class OutboundLimiter:
+    """
+    Ограничитель исходящих запросов к Bot API.
+
+    Запросы из LIMITED_METHODS проходят через общую корзину и корзину
+    своего чата. Ответ 429 повторяется после retry_after секунд,
+    на это же время приостанавливается корзина чата, а у запроса
+    без чата - общая корзина.
+
+    Attributes:
+        max_retries (int): Сколько раз повторять запрос после 429.
+    """
+
+    def __init__(self, global_rate: float = TG_GLOBAL_RATE,
+                 chat_rate: float = TG_CHAT_RATE,
+                 chat_burst: float = TG_CHAT_BURST,
+                 max_retries: int = TG_MAX_RETRIES) -> None:
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                self._chats = {key: value for key, value in self._chats.items()
+                               if not value.idle}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def acquire(self, chat_id: Optional[int]) -> None:
+        """
+        Ждёт разрешения на отправку в чат chat_id.
+        Сначала ожидание своего чата, затем общего лимита, чтобы занятый
+        чат не расходовал общие токены впустую.
+
+        Args:
+            chat_id (Optional[int]): ID чата или None, если запрос без чата.
+        """
+        if chat_id is not None:
+            delay = self._chat_bucket(chat_id).reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        delay = self._global.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def wrap(self, process_request):
+        """
+        Оборачивает функцию отправки запроса telebot лимитами и повтором после 429.
+
+        Args:
+            process_request: asyncio_helper._process_request.
+        """
+        @functools.wraps(process_request)
+        async def wrapper(token, url, method='get', params=None, files=None, **kwargs):
+            if url not in LIMITED_METHODS:
+                return await process_request(token, url, method, params, files, **kwargs)
+            chat_id = params.get('chat_id') if params else None
+            for attempt in range(self.max_retries + 1):
+                await self.acquire(chat_id)
+                try:
+                    # Копия: telebot изменяет params при подготовке запроса
+                    return await process_request(token, url, method,
+                                                 dict(params) if params else params,
+                                                 files, **kwargs)
+                except ApiTelegramException as e:
+                    if e.error_code != 429 or attempt == self.max_retries:
+                        raise
+                    retry_after = e.result_json.get('parameters', {}).get('retry_after', 1)
+                    logger.warning('429 на %s для чата %s, повтор через %s с',
+                                   url, chat_id, retry_after)
+                    if chat_id is not None:
+                        self._chat_bucket(chat_id).pause(retry_after)
+                    else:
+                        # Лимит без чата - общий: ждут все запросы, а не только этот
+                        self._global.pause(retry_after)
+        wrapper.limiter = self
+        return wrapper
+
+
+def install_limiter(limiter: OutboundLimiter) -> None:
+    """
+    Подключает ограничитель ко всем запросам AsyncTeleBot. Ограничитель
+    общий для процесса: подключённый раньше заменяется новым.
+
+    Args:
+        limiter (OutboundLimiter): Ограничитель.
+    """
+    process_request = asyncio_helper._process_request
+    current = getattr(process_request, 'limiter', None)
+    if current is limiter:
+        return
+    if current is not None:
+        logger.info('Ограничитель исходящих запросов заменён новым')
+        process_request = process_request.__wrapped__
+    asyncio_helper._process_request = limiter.wrap(process_request)
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_helper import ApiTelegramException
+
+from bot_modules import Keyboards
+from config import (REMINDER_HOUR_FROM, REMINDER_HOUR_TO, REMINDER_DEFAULT_UTC_OFFSET,
+                    REMINDER_IDLE_HOURS, REMINDER_RATE, REMINDER_CONCURRENCY,
+                    REMINDER_BATCH)
+from lazy import lazy_import
+from outbound import TokenBucket
+
+db = lazy_import('db_modules')
+
+logger = logging.getLogger(__name__)
+
+REMINDER_TEXT = 'Пора повторить слова! Несколько минут занятий помогут не забыть выученное.'
+# Допустимые смещения часовых поясов от UTC, минут (UTC-12 ... UTC+14)
+MIN_UTC_OFFSET = -12 * 60
+MAX_UTC_OFFSET = 14 * 60
+MINUTES_PER_DAY = 24 * 60
+
+SENT, BLOCKED, FAILED = 'sent', 'blocked', 'failed'
+
+
+def offset_ranges(now: datetime, hour_from: int, hour_to: int) -> List[Tuple[int, int]]:
+    """
+    Смещения от UTC, при которых местное время now попадает в часы
+    рассылки [hour_from, hour_to).
+
+    Args:
+        now (datetime): Время UTC.
+        hour_from (int): Начало окна, час местного времени.
+        hour_to (int): Конец окна (не включая).
+
+    Returns:
+        List[Tuple[int, int]]: Полуинтервалы [от, до) смещений в минутах.
+    """
+    minutes = now.hour * 60 + now.minute
+    ranges = []
+    for day in (-MINUTES_PER_DAY, 0, MINUTES_PER_DAY):
+        low = max(hour_from * 60 - minutes + day, MIN_UTC_OFFSET)
+        high = min(hour_to * 60 - minutes + day, MAX_UTC_OFFSET + 1)
+        if low < high:
+            ranges.append((low, high))
+    return ranges
+
+
+class Broadcaster:
+    """
+    Рассылка напоминаний пользователям, у которых есть слова к повторению
+    и которые давно не занимались.
+
+    Пользователи выбираются пачками по возрастанию PK (запрос по индексу,
+    в памяти только одна пачка); пачка отправляется параллельно с общим
+    ограничением скорости, затем одной транзакцией записываются результаты
+    и контрольная точка. После перезапуска рассылка продолжается с
+    следующей пачки; напоминание получат повторно не больше batch
+    пользователей прерванной пачки.
+
+    Attributes:
+        bot (AsyncTeleBot): Бот для отправки.
+        clock (Callable[[], datetime]): Текущее время UTC (в тестах - модельное).
+        batch (int): Пользователей в пачке.
+    """
+
+    def __init__(self, bot: AsyncTeleBot, clock: Callable[[], datetime] = datetime.utcnow,
+                 rate: float = REMINDER_RATE, concurrency: int = REMINDER_CONCURRENCY,
+                 batch: int = REMINDER_BATCH, hour_from: int = REMINDER_HOUR_FROM,
+                 hour_to: int = REMINDER_HOUR_TO,
+                 default_offset: int = REMINDER_DEFAULT_UTC_OFFSET,
+                 idle: timedelta = timedelta(hours=REMINDER_IDLE_HOURS)) -> None:
+        self.bot = bot
+        self.clock = clock
+        self.batch = batch
+        self.hour_from = hour_from
+        self.hour_to = hour_to
+        self.default_offset = default_offset
+        self.idle = idle
+        # Ниже общего лимита Bot API: ответы пользователям не ждут рассылку
+        self._bucket = TokenBucket(rate, rate)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def _send(self, tg_id: int) -> str:
+        async with self._semaphore:
+            delay = self._bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                await self.bot.send_message(tg_id, REMINDER_TEXT,
+                                            reply_markup=Keyboards.START_STUDY)
+                return SENT
+            except ApiTelegramException as e:
+                if e.error_code == 403:
+                    return BLOCKED
+                logger.warning('Напоминание %s не отправлено: %s', tg_id, e.description)
+                return FAILED
+            except Exception:
+                logger.exception('Напоминание %s не отправлено', tg_id)
+                return FAILED
+
+    async def run_once(self, max_batches: Optional[int] = None) -> dict:
+        """
+        Выполняет (или продолжает) одну рассылку.
+
+        Args:
+            max_batches (Optional[int]): Остановиться после стольких пачек, не
+                завершая рассылку (для проверки продолжения после перезапуска).
+
+        Returns:
+            dict: Отчёт: ID рассылки, продолжена ли она, отправлено в этом
+            запуске и всего, время и скорость отправки.
+        """
+        started = time.perf_counter()
+        now = self.clock()
+        run = await db.open_reminder_run(now)
+        ranges = offset_ranges(now, self.hour_from, self.hour_to)
+        totals = run
+        batches = 0
+        finished = False
+        while max_batches is None or batches < max_batches:
+            users = await db.reminder_targets(run.cursor, self.batch, now, ranges,
+                                              self.default_offset, self.idle)
+            if not users:
+                finished = True
+                await db.save_reminder_batch(run, [], [], now, finished=True)
+                break
+            results = await asyncio.gather(*(self._send(tg_id) for _, tg_id in users))
+            sent = [user_id for (user_id, _), result in zip(users, results) if result == SENT]
+            blocked = [user_id for (user_id, _), result in zip(users, results) if result == BLOCKED]
+            run = run._replace(cursor=users[-1][0], sent=run.sent + len(sent),
+                               blocked=run.blocked + len(blocked),
+                               failed=run.failed + results.count(FAILED))
+            await db.save_reminder_batch(run, sent, blocked, now)
+            batches += 1
+        elapsed = time.perf_counter() - started
+        processed = (run.sent + run.blocked + run.failed) - (totals.sent + totals.blocked + totals.failed)
+        report = {
+            'run_id': run.id,
+            'resumed': run.resumed,
+            'finished': finished,
+            'batches': batches,
+            'sent': run.sent - totals.sent,
+            'blocked': run.blocked - totals.blocked,
+            'failed': run.failed - totals.failed,
+            'total_sent': run.sent,
+            'seconds': round(elapsed, 3),
+            'per_second': round(processed / elapsed, 1) if elapsed else 0.0,
+        }
+        logger.info('Рассылка напоминаний: %s', report)
+        return report
+
+    async def run_forever(self, interval: float) -> None:
+        """
+        Запускает рассылку каждые interval секунд. Ошибка одной рассылки
+        не останавливает следующие.
+
+        Args:
+            interval (float): Период, секунд.
+        """
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception('Ошибка рассылки напоминаний')
+            await asyncio.sleep(interval)
+
+
+def start_reminders(bot: AsyncTeleBot) -> Optional[asyncio.Task]:
+    """
+    Запускает периодическую рассылку, если задан REMINDER_INTERVAL.
+    Вызывается в одном процессе: в run() или в супервизоре.
+
+    Args:
+        bot (AsyncTeleBot): Бот для отправки.
+
+    Returns:
+        Optional[asyncio.Task]: Задача рассылки, которую нужно отменить при остановке.
+    """
+    from config import REMINDER_INTERVAL
+
+    if not REMINDER_INTERVAL:
+        return None
+    return asyncio.create_task(Broadcaster(bot).run_forever(REMINDER_INTERVAL))
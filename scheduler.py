@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+# Начальный коэффициент лёгкости и его нижняя граница (SM-2)
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# Оценки ответа по шкале SM-2 (0-5) для верного и неверного ответа
+CORRECT_QUALITY = 4
+WRONG_QUALITY = 2
+# Через сколько повторить слово после ошибки
+RELEARN_DELAY = timedelta(minutes=10)
+# На сколько откладывается показанное, но не отвеченное слово
+SHOWN_DELAY = timedelta(minutes=10)
+
+
+class Card(NamedTuple):
+    """
+    Состояние интервального повторения слова у пользователя.
+
+    Attributes:
+        ease (float): Коэффициент лёгкости.
+        interval (float): Текущий интервал повторения, дней.
+        streak (int): Количество верных ответов подряд.
+        due_at (datetime): Когда слово нужно повторить.
+    """
+    ease: float
+    interval: float
+    streak: int
+    due_at: datetime
+
+
+def review(card: Card, correct: bool, now: datetime) -> Card:
+    """
+    Пересчитывает расписание слова по результату ответа (алгоритм SM-2).
+
+    Args:
+        card (Card): Текущее состояние; due_at не используется.
+        correct (bool): Верен ли ответ.
+        now (datetime): Время ответа.
+
+    Returns:
+        Card: Новое состояние с due_at следующего повторения.
+    """
+    quality = CORRECT_QUALITY if correct else WRONG_QUALITY
+    ease = card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    ease = max(MIN_EASE, ease)
+    if not correct:
+        return Card(ease, 0.0, 0, now + RELEARN_DELAY)
+    streak = card.streak + 1
+    if streak == 1:
+        interval = 1.0
+    elif streak == 2:
+        interval = 6.0
+    else:
+        interval = card.interval * card.ease
+    return Card(ease, interval, streak, now + timedelta(days=interval))
@@ -0,0 +1,217 @@
+import asyncio
+import heapq
+import math
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import ReadSession
+
+# Порог похожести для нечёткого поиска (как pg_trgm.similarity_threshold)
+SIMILARITY_THRESHOLD = 0.3
+# Запросы короче стольких символов ищутся по началу слова или перевода
+MIN_TRIGRAM_QUERY = 3
+# Слов, загружаемых из базы за один запрос
+LOAD_BATCH = 5000
+
+_WORD = re.compile(r'\w+')
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Триграммы строки так же, как их строит pg_trgm: каждое слово в нижнем
+    регистре дополняется двумя пробелами в начале и одним в конце.
+
+    Args:
+        text (str): Строка.
+
+    Returns:
+        Set[str]: Множество триграмм.
+    """
+    result = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def _prefixes(value: str, translation: str) -> Set[str]:
+    """Начала слова и перевода в нижнем регистре короче MIN_TRIGRAM_QUERY символов."""
+    return {text[:length] for text in (value.strip().lower(), translation.strip().lower())
+            for length in range(1, min(len(text), MIN_TRIGRAM_QUERY - 1) + 1)}
+
+
+def similarity(left: Set[str], right: Set[str]) -> float:
+    """Похожесть множеств триграмм: общие / все (как similarity() в pg_trgm)."""
+    if not left or not right:
+        return 0.0
+    shared = len(left & right)
+    return shared / (len(left) + len(right) - shared)
+
+
+class TrigramIndex:
+    """
+    Триграммный индекс слов в памяти процесса - замена индексу pg_trgm
+    для SQLite.
+
+    Индекс строится по всей таблице word и дозагружает слова, добавленные
+    после последнего обновления (по возрастанию PK), поэтому видит слова,
+    добавленные другими процессами. Слова, удалённые этим процессом,
+    удаляются из индекса (remove); удалённые другими процессами остаются,
+    но результаты поиска всё равно проверяются по словарю пользователя в базе.
+    Для коротких запросов есть индекс начал слова и перевода (первые
+    MIN_TRIGRAM_QUERY - 1 символов).
+
+    Attributes:
+        size (int): Количество слов в индексе.
+    """
+
+    def __init__(self) -> None:
+        self._words: Dict[int, Tuple[str, str]] = {}
+        self._trigrams: Dict[int, Tuple[Set[str], Set[str]]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._prefixes: Dict[str, Set[int]] = {}
+        self._last_id = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self._words)
+
+    def add(self, word_id: int, value: str, translation: str) -> None:
+        """
+        Добавляет слово в индекс.
+
+        Args:
+            word_id (int): ID слова.
+            value (str): Слово.
+            translation (str): Перевод.
+        """
+        value_grams, translation_grams = trigrams(value), trigrams(translation)
+        self._words[word_id] = (value, translation)
+        self._trigrams[word_id] = (value_grams, translation_grams)
+        for gram in value_grams | translation_grams:
+            self._postings.setdefault(gram, set()).add(word_id)
+        for prefix in _prefixes(value, translation):
+            self._prefixes.setdefault(prefix, set()).add(word_id)
+        self._last_id = max(self._last_id, word_id)
+
+    def remove(self, word_id: int) -> None:
+        """
+        Удаляет слово из индекса.
+
+        Args:
+            word_id (int): ID слова.
+        """
+        word = self._words.pop(word_id, None)
+        if word is None:
+            return
+        value_grams, translation_grams = self._trigrams.pop(word_id)
+        for index, keys in ((self._postings, value_grams | translation_grams),
+                            (self._prefixes, _prefixes(*word))):
+            for key in keys:
+                posting = index.get(key)
+                if posting is not None:
+                    posting.discard(word_id)
+                    if not posting:
+                        del index[key]
+
+    def word(self, word_id: int) -> Optional[Tuple[str, str]]:
+        """Слово и перевод по ID."""
+        return self._words.get(word_id)
+
+    async def refresh(self) -> None:
+        """Загружает из базы слова, добавленные после последнего обновления."""
+        from sqlalchemy import select
+        from models import Words
+
+        async with self._lock:
+            while True:
+                async with ReadSession() as session:
+                    rows = (await session.execute(
+                        select(Words.id, Words.value, Words.translation)
+                        .where(Words.id > self._last_id)
+                        .order_by(Words.id)
+                        .limit(LOAD_BATCH)
+                    )).all()
+                for word_id, value, translation in rows:
+                    self.add(word_id, value, translation)
+                if len(rows) < LOAD_BATCH:
+                    return
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """
+        Ищет слова, в которых запрос встречается подстрокой (в слове или
+        переводе) или которые похожи на запрос по триграммам. Запрос короче
+        MIN_TRIGRAM_QUERY символов ищется по началу слова или перевода
+        по индексу начал, без перебора словаря.
+
+        Args:
+            query (str): Поисковый запрос.
+            limit (Optional[int]): Максимум результатов.
+
+        Returns:
+            List[int]: ID слов: сначала совпадения подстрокой, затем по
+            убыванию похожести; для короткого запроса - по возрастанию ID.
+        """
+        needle = query.strip().lower()
+        if not needle:
+            return []
+        if len(needle) < MIN_TRIGRAM_QUERY:
+            found = self._prefixes.get(needle, ())
+            if limit is None:
+                return sorted(found)
+            return heapq.nsmallest(limit, found)
+        grams = trigrams(needle)
+        if not grams:
+            return []
+        candidates = self._substring_candidates(needle) | self._similar_candidates(grams)
+        scored = []
+        for word_id in candidates:
+            value, translation = self._words[word_id]
+            if needle in value.lower() or needle in translation.lower():
+                scored.append((2.0, word_id))
+                continue
+            # Как greatest(similarity(value), similarity(translation))
+            score = max(similarity(grams, column) for column in self._trigrams[word_id])
+            if score >= SIMILARITY_THRESHOLD:
+                scored.append((score, word_id))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [word_id for _, word_id in scored[:limit]]
+
+    def _postings_by_size(self, grams: Set[str]) -> List[Set[int]]:
+        """Списки слов по триграммам, от самых редких триграмм."""
+        return sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+
+    def _substring_candidates(self, needle: str) -> Set[int]:
+        """
+        Слова, которые могут содержать needle подстрокой: в них есть все
+        внутренние триграммы запроса. Пересечение начинается с самого
+        короткого списка.
+        """
+        inner = {word[i:i + 3] for word in _WORD.findall(needle) for i in range(len(word) - 2)}
+        if not inner:
+            return set()
+        postings = self._postings_by_size(inner)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result &= posting
+        return result
+
+    def _similar_candidates(self, grams: Set[str]) -> Set[int]:
+        """
+        Слова, похожесть которых на запрос может достигнуть порога: у них
+        не меньше m = ceil(порог × триграмм запроса) общих триграмм, значит,
+        каждое встречается хотя бы в одном из (триграмм - m + 1) самых
+        редких списков. Частые триграммы в перебор не попадают.
+        """
+        shared = max(1, math.ceil(SIMILARITY_THRESHOLD * len(grams)))
+        result = set()
+        for posting in self._postings_by_size(grams)[:len(grams) - shared + 1]:
+            result |= posting
+        return result
+
+
+# Общий индекс, заполняется при первом поиске
+word_index = TrigramIndex()
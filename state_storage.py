@@ -0,0 +1,174 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+from telebot.asyncio_storage import (StateStorageBase, StateDataContext,
+                                     StateMemoryStorage, StateRedisStorage)
+
+from cache import TTLCache
+from config import STATE_STORAGE, REDIS_URL, STATE_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Запись состояния: (имя состояния или None, если записи нет; данные)
+Record = Tuple[Optional[str], dict]
+
+
+class CachedStateStorage(StateStorageBase):
+    """
+    Кэш с отложенной записью поверх любого хранилища состояний.
+
+    Чтения обслуживаются из памяти процесса, изменения накапливаются
+    и записываются в хранилище фоновой задачей раз в flush_interval секунд.
+    При остановке бота нужно вызвать close(), чтобы записать остаток.
+
+    Attributes:
+        backend (StateStorageBase): Постоянное хранилище.
+        flush_interval (float): Период отложенной записи, секунд.
+    """
+
+    def __init__(self, backend: StateStorageBase, flush_interval: float = 0.5,
+                 maxsize: int = 10000, ttl: float = 60) -> None:
+        super().__init__()
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self._cache = TTLCache(maxsize, ttl)
+        self._dirty: Dict[tuple, Record] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def _load(self, key: tuple) -> Record:
+        """Возвращает запись из памяти, при промахе читает её из хранилища."""
+        record = self._dirty.get(key) or self._cache.get(key)
+        if record is None:
+            state = await self.backend.get_state(*key)
+            data = await self.backend.get_data(*key) if state is not None else {}
+            record = (state, data)
+            self._cache.set(key, record)
+        return record
+
+    def _store(self, key: tuple, state: Optional[str], data: dict) -> None:
+        """Обновляет запись в памяти и ставит её в очередь на запись."""
+        record = (state, data)
+        self._cache.set(key, record)
+        self._dirty[key] = record
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while self._dirty:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception('Не удалось записать состояния FSM')
+
+    async def flush(self) -> None:
+        """Записывает накопленные изменения в хранилище."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        try:
+            await self._write(dirty)
+        except Exception:
+            # Возвращаем в очередь всё, что не было перезаписано за это время
+            for key, record in dirty.items():
+                self._dirty.setdefault(key, record)
+            raise
+
+    async def _write(self, records: Dict[tuple, Record]) -> None:
+        # Хранилища с пакетной записью (StateSQLStorage) пишут всё одним запросом
+        put_many = getattr(self.backend, 'put_many', None)
+        if put_many is not None:
+            await put_many(records)
+            return
+        for key, (state, data) in records.items():
+            if state is None:
+                await self.backend.delete_state(*key)
+            else:
+                await self.backend.set_state(key[0], key[1], state, *key[2:])
+                await self.backend.save(key[0], key[1], data, *key[2:])
+
+    async def close(self) -> None:
+        """Останавливает фоновую запись и записывает остаток изменений."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+    async def set_state(self, chat_id, user_id, state, business_connection_id=None,
+                        message_thread_id=None, bot_id=None) -> bool:
+        if hasattr(state, 'name'):
+            state = state.name
+        key = (chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        old_state, data = await self._load(key)
+        self._store(key, state, data if old_state is not None else {})
+        return True
+
+    async def get_state(self, chat_id, user_id, business_connection_id=None,
+                        message_thread_id=None, bot_id=None) -> Optional[str]:
+        key = (chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return (await self._load(key))[0]
+
+    async def delete_state(self, chat_id, user_id, business_connection_id=None,
+                           message_thread_id=None, bot_id=None) -> bool:
+        key = (chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        state, _ = await self._load(key)
+        if state is None:
+            return False
+        self._store(key, None, {})
+        return True
+
+    async def set_data(self, chat_id, user_id, key, value, business_connection_id=None,
+                       message_thread_id=None, bot_id=None) -> bool:
+        record_key = (chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        state, data = await self._load(record_key)
+        if state is None:
+            raise RuntimeError(f'CachedStateStorage: key {record_key} does not exist.')
+        self._store(record_key, state, dict(data, **{key: value}))
+        return True
+
+    async def get_data(self, chat_id, user_id, business_connection_id=None,
+                       message_thread_id=None, bot_id=None) -> dict:
+        key = (chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        return dict((await self._load(key))[1])
+
+    async def reset_data(self, chat_id, user_id, business_connection_id=None,
+                         message_thread_id=None, bot_id=None) -> bool:
+        return await self.save(chat_id, user_id, {}, business_connection_id,
+                               message_thread_id, bot_id)
+
+    def get_interactive_data(self, chat_id, user_id, business_connection_id=None,
+                             message_thread_id=None, bot_id=None) -> StateDataContext:
+        return StateDataContext(self, chat_id=chat_id, user_id=user_id,
+                                business_connection_id=business_connection_id,
+                                message_thread_id=message_thread_id, bot_id=bot_id)
+
+    async def save(self, chat_id, user_id, data, business_connection_id=None,
+                   message_thread_id=None, bot_id=None) -> bool:
+        key = (chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        state, _ = await self._load(key)
+        if state is None:
+            return False
+        self._store(key, state, data)
+        return True
+
+
+def create_state_storage(kind: str = STATE_STORAGE) -> StateStorageBase:
+    """
+    Создаёт хранилище состояний FSM по имени из конфигурации.
+
+    Args:
+        kind (str): memory - в памяти процесса, sql - таблица bot_state,
+            redis - Redis (или совместимый сервер) по адресу REDIS_URL.
+
+    Returns:
+        StateStorageBase: Хранилище; sql и redis обёрнуты в CachedStateStorage.
+    """
+    if kind == 'sql':
+        # SQLAlchemy и слой данных загружаются только для этого хранилища
+        from state_storage_sql import StateSQLStorage
+        return CachedStateStorage(StateSQLStorage(), STATE_FLUSH_INTERVAL)
+    if kind == 'redis':
+        return CachedStateStorage(StateRedisStorage(redis_url=REDIS_URL),
+                                  STATE_FLUSH_INTERVAL)
+    return StateMemoryStorage()
@@ -0,0 +1,110 @@
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select, update, delete, tuple_
+from telebot.asyncio_storage import StateStorageBase, StateDataContext
+
+from config import Session
+from db_modules import upsert
+from models import BotState
+
+# Запись состояния: (имя состояния или None, если записи нет; данные)
+Record = Tuple[Optional[str], dict]
+
+
+class StateSQLStorage(StateStorageBase):
+    """
+    Хранилище состояний FSM в таблице bot_state (PostgreSQL или SQLite).
+
+    Состояние привязано к паре (user_id, chat_id) и переживает перезапуск бота,
+    поэтому может использоваться несколькими процессами одновременно.
+    """
+
+    @staticmethod
+    def _key(chat_id: int, user_id: int):
+        return (BotState.user_id == user_id) & (BotState.chat_id == chat_id)
+
+    async def set_state(self, chat_id, user_id, state, business_connection_id=None,
+                        message_thread_id=None, bot_id=None) -> bool:
+        if hasattr(state, 'name'):
+            state = state.name
+        stmt = upsert(BotState,
+                      {'user_id': user_id, 'chat_id': chat_id, 'state': state, 'data': {}},
+                      ['user_id', 'chat_id'], ['state'])
+        async with Session() as session:
+            await session.execute(stmt)
+            await session.commit()
+        return True
+
+    async def get_state(self, chat_id, user_id, business_connection_id=None,
+                        message_thread_id=None, bot_id=None) -> Optional[str]:
+        async with Session() as session:
+            return await session.scalar(select(BotState.state)
+                                        .where(self._key(chat_id, user_id)))
+
+    async def delete_state(self, chat_id, user_id, business_connection_id=None,
+                           message_thread_id=None, bot_id=None) -> bool:
+        async with Session() as session:
+            result = await session.execute(delete(BotState)
+                                           .where(self._key(chat_id, user_id)))
+            await session.commit()
+            return result.rowcount > 0
+
+    async def set_data(self, chat_id, user_id, key, value, business_connection_id=None,
+                       message_thread_id=None, bot_id=None) -> bool:
+        async with Session() as session:
+            data = await session.scalar(select(BotState.data)
+                                        .where(self._key(chat_id, user_id))
+                                        .with_for_update())
+            if data is None:
+                raise RuntimeError(f'StateSQLStorage: key {user_id}:{chat_id} does not exist.')
+            data = dict(data, **{key: value})
+            await session.execute(update(BotState).where(self._key(chat_id, user_id))
+                                  .values(data=data))
+            await session.commit()
+        return True
+
+    async def get_data(self, chat_id, user_id, business_connection_id=None,
+                       message_thread_id=None, bot_id=None) -> dict:
+        async with Session() as session:
+            data = await session.scalar(select(BotState.data)
+                                        .where(self._key(chat_id, user_id)))
+            return data or {}
+
+    async def reset_data(self, chat_id, user_id, business_connection_id=None,
+                         message_thread_id=None, bot_id=None) -> bool:
+        return await self.save(chat_id, user_id, {})
+
+    def get_interactive_data(self, chat_id, user_id, business_connection_id=None,
+                             message_thread_id=None, bot_id=None) -> StateDataContext:
+        return StateDataContext(self, chat_id=chat_id, user_id=user_id,
+                                business_connection_id=business_connection_id,
+                                message_thread_id=message_thread_id, bot_id=bot_id)
+
+    async def save(self, chat_id, user_id, data, business_connection_id=None,
+                   message_thread_id=None, bot_id=None) -> bool:
+        async with Session() as session:
+            result = await session.execute(update(BotState)
+                                           .where(self._key(chat_id, user_id))
+                                           .values(data=data))
+            await session.commit()
+            return result.rowcount > 0
+
+    async def put_many(self, records: Dict[tuple, Record]) -> None:
+        """
+        Записывает пачку состояний: один многострочный upsert и один DELETE.
+
+        Args:
+            records (Dict[tuple, Record]): Ключ (chat_id, user_id, ...) -> запись.
+        """
+        rows = [{'user_id': key[1], 'chat_id': key[0], 'state': state, 'data': data}
+                for key, (state, data) in records.items() if state is not None]
+        deleted = [(key[1], key[0]) for key, (state, _) in records.items() if state is None]
+        async with Session() as session:
+            if rows:
+                await session.execute(upsert(BotState, rows, ['user_id', 'chat_id'],
+                                             ['state', 'data']))
+            if deleted:
+                await session.execute(delete(BotState)
+                                      .where(tuple_(BotState.user_id, BotState.chat_id)
+                                             .in_(deleted)))
+            await session.commit()
\ No newline at end of file
@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from config import STUDY_BATCH_SIZE, STUDY_FLUSH_EVERY, STUDY_SESSION_TIMEOUT
+from lazy import lazy_import
+from distractors import distractor_pool
+
+db = lazy_import('db_modules')
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед повтором неудавшейся пакетной записи, секунд; удваивается
+# после каждой неудачи до FLUSH_RETRY_MAX_DELAY
+FLUSH_RETRY_DELAY = 1.0
+FLUSH_RETRY_MAX_DELAY = 60.0
+
+
+class StudyCard(NamedTuple):
+    """
+    Карточка учебной сессии.
+
+    Attributes:
+        value (str): Слово на русском.
+        translation (str): Правильный перевод.
+        word_id (int): ID слова.
+        distractors (List[str]): Неверные варианты ответа.
+    """
+    value: str
+    translation: str
+    word_id: int
+    distractors: List[str]
+
+
+class StudySession:
+    """
+    Буфер карточек и накопленных результатов одного пользователя.
+
+    Attributes:
+        tg_id (int): Telegram ID пользователя.
+        cards (Deque[StudyCard]): Загруженные, но ещё не показанные карточки.
+        current (Optional[StudyCard]): Последняя показанная карточка.
+        shown_at (float): Когда показана текущая карточка (time.monotonic()).
+        reviews (Dict[int, Tuple[datetime, list]]): ID слова -> (время показа,
+            ответы (верен ли, время ответа, задержка в мс)), ещё не записанные в базу.
+        answered (int): Количество ответов с последней записи.
+        last_active (float): Время последнего обращения (time.monotonic()).
+        flush_task (Optional[asyncio.Task]): Фоновая запись накопленных ответов.
+    """
+
+    def __init__(self, tg_id: int) -> None:
+        self.tg_id = tg_id
+        self.cards: Deque[StudyCard] = deque()
+        self.current: Optional[StudyCard] = None
+        self.shown_at = 0.0
+        self.reviews: Dict[int, Tuple[datetime, list]] = {}
+        self.answered = 0
+        self.last_active = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.flush_task: Optional[asyncio.Task] = None
+
+
+class StudySessions:
+    """
+    Учебные сессии пользователей: карточки загружаются пачками по batch_size
+    вместе с неверными вариантами, показы и ответы копятся в памяти и
+    записываются в базу одним пакетом каждые flush_every ответов, при
+    перезагрузке буфера, по истечении timeout секунд простоя или при остановке бота.
+
+    Запись по числу ответов идёт в фоновой задаче, а ошибка записи при
+    перезагрузке буфера только записывается в лог: ответ и следующий вопрос
+    не ждут базу и не падают из-за неё. Неудавшаяся запись повторяется
+    фоновой задачей с растущей паузой.
+    """
+
+    def __init__(self, batch_size: int = STUDY_BATCH_SIZE,
+                 flush_every: int = STUDY_FLUSH_EVERY,
+                 timeout: float = STUDY_SESSION_TIMEOUT) -> None:
+        self.batch_size = batch_size
+        self.flush_every = flush_every
+        self.timeout = timeout
+        self._sessions: Dict[int, StudySession] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def _session(self, tg_id: int) -> StudySession:
+        session = self._sessions.get(tg_id)
+        if session is None:
+            session = self._sessions[tg_id] = StudySession(tg_id)
+        session.last_active = time.monotonic()
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+        return session
+
+    async def _flush(self, session: StudySession) -> None:
+        if not session.reviews:
+            return
+        reviews, session.reviews = session.reviews, {}
+        answered, session.answered = session.answered, 0
+        try:
+            await db.flush_reviews(session.tg_id, reviews)
+        except Exception:
+            # Возвращаем ответы в буфер: они будут записаны следующей попыткой
+            for word_id, (shown_at, answers) in reviews.items():
+                newer = session.reviews.get(word_id)
+                session.reviews[word_id] = (shown_at, answers + newer[1] if newer else answers)
+            session.answered += answered
+            raise
+
+    async def _try_flush(self, session: StudySession) -> bool:
+        """
+        Записывает накопленные результаты; при ошибке оставляет их в буфере
+        и запускает фоновые повторы. Вызывается под блокировкой сессии.
+
+        Returns:
+            bool: Записаны ли результаты.
+        """
+        try:
+            await self._flush(session)
+            return True
+        except Exception:
+            logger.exception('Не удалось записать результаты сессии %s', session.tg_id)
+            self._schedule_flush(session, delay=FLUSH_RETRY_DELAY)
+            return False
+
+    def _schedule_flush(self, session: StudySession, delay: float = 0.0) -> None:
+        """Запускает фоновую запись, если она ещё не идёт."""
+        if session.flush_task is None or session.flush_task.done():
+            session.flush_task = asyncio.create_task(self._flush_later(session, delay))
+
+    async def _flush_later(self, session: StudySession, delay: float) -> None:
+        while True:
+            if delay:
+                await asyncio.sleep(delay)
+            # Под блокировкой сессии, как и запись из next_card и end: записи
+            # одной сессии не пересекаются, иначе пересчёт расписания и
+            # статистики читает строки до чужой записи и теряет её. Ответы
+            # (record_answer) блокировку не ждут
+            try:
+                async with session.lock:
+                    await self._flush(session)
+                return
+            except Exception:
+                delay = min(max(delay * 2, FLUSH_RETRY_DELAY), FLUSH_RETRY_MAX_DELAY)
+                logger.exception('Не удалось записать результаты сессии %s, '
+                                 'повтор через %.0f с', session.tg_id, delay)
+
+    async def next_card(self, tg_id: int) -> Optional[StudyCard]:
+        """
+        Возвращает следующую карточку; при пустом буфере записывает накопленные
+        результаты (чтобы очередь повторения их учитывала) и загружает
+        следующую пачку. Если запись не удалась, пачка загружается без неё.
+
+        Args:
+            tg_id (int): Telegram ID пользователя.
+
+        Returns:
+            StudyCard или None, если у пользователя нет слов.
+        """
+        session = self._session(tg_id)
+        async with session.lock:
+            if not session.cards:
+                await self._try_flush(session)
+                for value, translation, word_id in await db.get_due_words(tg_id, self.batch_size):
+                    session.cards.append(StudyCard(value, translation, word_id,
+                                                   distractor_pool.sample(translation, k=3)))
+            if not session.cards:
+                session.current = None
+                return None
+            card = session.current = session.cards.popleft()
+            session.shown_at = time.monotonic()
+            session.reviews.setdefault(card.word_id, (datetime.utcnow(), []))
+            return card
+
+    def current(self, tg_id: int) -> Optional[StudyCard]:
+        """
+        Последняя показанная пользователю карточка.
+
+        Args:
+            tg_id (int): Telegram ID пользователя.
+        """
+        session = self._sessions.get(tg_id)
+        return session.current if session else None
+
+    async def record_answer(self, tg_id: int, word_id: int, correct: bool) -> None:
+        """
+        Запоминает ответ; в базу он попадёт со следующей пакетной записью,
+        которая каждые flush_every ответов запускается в фоне.
+
+        Args:
+            tg_id (int): Telegram ID пользователя.
+            word_id (int): ID слова.
+            correct (bool): Верен ли ответ.
+        """
+        session = self._session(tg_id)
+        now = datetime.utcnow()
+        latency_ms = None
+        if session.current and session.current.word_id == word_id:
+            latency_ms = round((time.monotonic() - session.shown_at) * 1000)
+        session.reviews.setdefault(word_id, (now, []))[1].append((correct, now, latency_ms))
+        session.answered += 1
+        if session.answered >= self.flush_every:
+            self._schedule_flush(session)
+
+    def pending_answers(self, tg_id: int) -> List[Tuple[bool, datetime, Optional[int]]]:
+        """
+        Ответы пользователя, ещё не записанные в базу, по времени ответа.
+
+        Args:
+            tg_id (int): Telegram ID пользователя.
+
+        Returns:
+            List[Tuple[bool, datetime, Optional[int]]]: верен ли ответ, время, задержка в мс.
+        """
+        session = self._sessions.get(tg_id)
+        if not session:
+            return []
+        return sorted((answer for _, answers in session.reviews.values() for answer in answers),
+                      key=lambda answer: answer[1])
+
+    def invalidate(self, tg_id: int) -> None:
+        """
+        Сбрасывает загруженные карточки после изменения словаря пользователя.
+        Накопленные результаты сохраняются и будут записаны перед загрузкой новых.
+
+        Args:
+            tg_id (int): Telegram ID пользователя.
+        """
+        session = self._sessions.get(tg_id)
+        if session:
+            session.cards.clear()
+
+    async def end(self, tg_id: int) -> None:
+        """
+        Завершает сессию пользователя, записывая накопленные результаты.
+        Если запись не удалась, сессия остаётся и будет завершена следующим
+        обходом простаивающих сессий.
+
+        Args:
+            tg_id (int): Telegram ID пользователя.
+        """
+        session = self._sessions.get(tg_id)
+        if not session:
+            return
+        async with session.lock:
+            await self._flush(session)
+            # Ответ, пришедший во время записи, остаётся в сессии до следующей записи
+            if session.reviews or self._sessions.get(tg_id) is not session:
+                return
+            del self._sessions[tg_id]
+        if session.flush_task is not None and session.flush_task is not asyncio.current_task():
+            session.flush_task.cancel()
+
+    async def _sweep_loop(self) -> None:
+        while self._sessions:
+            await asyncio.sleep(min(self.timeout, 30))
+            deadline = time.monotonic() - self.timeout
+            for tg_id in [tg_id for tg_id, session in self._sessions.items()
+                          if session.last_active < deadline]:
+                try:
+                    await self.end(tg_id)
+                except Exception:
+                    logger.exception('Не удалось записать результаты сессии %s', tg_id)
+
+    async def close(self) -> None:
+        """Записывает результаты всех сессий; вызывается при остановке бота."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        for tg_id in list(self._sessions):
+            try:
+                await self.end(tg_id)
+            except Exception:
+                logger.exception('Не удалось записать результаты сессии %s', tg_id)
+        for session in self._sessions.values():
+            if session.flush_task is not None:
+                session.flush_task.cancel()
+
+# Общие учебные сессии пользователей
+study_sessions = StudySessions()
@@ -0,0 +1,321 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from telebot import types
+
+from config import (BOT_MODE, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE,
+                    WEBHOOK_QUEUE_TIMEOUT, SHARD_MAX_IN_FLIGHT)
+from webhook import UpdateDispatcher, update_chat_id
+
+logger = logging.getLogger(__name__)
+
+# Поля обновления, у которых есть автор (from_user)
+USER_FIELDS = ('message', 'edited_message', 'callback_query', 'inline_query',
+               'chosen_inline_result', 'shipping_query', 'pre_checkout_query',
+               'my_chat_member', 'chat_member', 'chat_join_request')
+# Период проверки процессов-обработчиков, секунд
+MONITOR_INTERVAL = 1.0
+# Сколько ждать завершения процесса при остановке, секунд
+STOP_TIMEOUT = 30
+
+
+def update_user_id(update: types.Update) -> int:
+    """
+    Определяет пользователя, от которого пришло обновление.
+    Все обновления пользователя обрабатывает один и тот же процесс.
+
+    Args:
+        update (Update): Обновление от Telegram.
+
+    Returns:
+        int: ID пользователя или, если автора нет, ID чата.
+    """
+    for field in USER_FIELDS:
+        user = getattr(getattr(update, field, None), 'from_user', None)
+        if user is not None:
+            return user.id
+    return update_chat_id(update)
+
+
+def rate_share(processes: int) -> float:
+    """
+    Доля общего лимита TG_GLOBAL_RATE для одного процесса: лимит Telegram
+    действует на бота целиком, поэтому делится поровну между обработчиками
+    и супервизором, который рассылает напоминания.
+
+    Args:
+        processes (int): Количество процессов-обработчиков.
+    """
+    return 1 / (processes + 1)
+
+
+def _worker_main(index: int, inbox, acks, share: float) -> None:
+    """Точка входа процесса-обработчика."""
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_worker(index, inbox, acks, share))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _worker(index: int, inbox, acks, share: float) -> None:
+    """
+    Процесс-обработчик: создаёт своего бота (create_app) с долей share
+    общего лимита сообщений и обрабатывает обновления из inbox,
+    подтверждая каждое в acks после обработки.
+    None в inbox - сигнал дообработать принятое и завершиться.
+    Готовность процесса сообщается подтверждением (index, None).
+    """
+    # SIGINT получает вся группа процессов; останавливает обработчики супервизор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from bot_main import create_app, shutdown
+    from distractors import distractor_pool
+    from fuzzy import translation_index
+
+    bot = create_app(rate_share=share)
+    await distractor_pool.load()
+    await translation_index.load()
+    dispatcher = UpdateDispatcher(bot, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE, timeout=None,
+                                  on_done=lambda update: acks.put((index, update.update_id)))
+    dispatcher.start()
+    acks.put((index, None))
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            update = await loop.run_in_executor(None, inbox.get)
+            if update is None:
+                break
+            await dispatcher.submit(update)
+    finally:
+        await dispatcher.close()
+        await shutdown(bot)
+
+
+class ShardSupervisor:
+    """
+    Супервизор процессов-обработчиков.
+
+    Обновление направляется в процесс с номером user_id % processes,
+    поэтому порядок обновлений пользователя и его данные в памяти процесса
+    (кэш пользователей, учебная сессия, StateMemoryStorage) остаются согласованными.
+    Переданные, но не подтверждённые обновления хранятся у супервизора;
+    упавший процесс перезапускается, и они передаются ему заново.
+    Повтор возможен для обновления, которое процесс успел частично обработать.
+
+    Реализует интерфейс UpdateDispatcher (start, submit, close), поэтому
+    подходит для run_webhook.
+
+    Attributes:
+        processes (int): Количество процессов-обработчиков.
+        max_in_flight (int): Предел неподтверждённых обновлений на процесс.
+        restarts (int): Сколько раз процессы перезапускались.
+    """
+
+    def __init__(self, processes: int, max_in_flight: int = SHARD_MAX_IN_FLIGHT,
+                 timeout: Optional[float] = WEBHOOK_QUEUE_TIMEOUT) -> None:
+        self.processes = processes
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.restarts = 0
+        # spawn: дочерний процесс не наследует event loop и соединения родителя
+        self._context = multiprocessing.get_context('spawn')
+        self._acks = self._context.Queue()
+        self._inboxes: List = [None] * processes
+        self._workers: List = [None] * processes
+        self._in_flight: List[OrderedDict] = [OrderedDict() for _ in range(processes)]
+        self._freed: List[asyncio.Event] = []
+        self._ready: List[asyncio.Event] = []
+        self._waiters: Dict[int, asyncio.Future] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._closing = False
+
+    def _spawn(self, index: int) -> None:
+        self._inboxes[index] = self._context.Queue()
+        self._workers[index] = self._context.Process(
+            target=_worker_main,
+            args=(index, self._inboxes[index], self._acks, rate_share(self.processes)),
+            name=f'bot-worker-{index}', daemon=True)
+        self._workers[index].start()
+
+    def start(self) -> None:
+        """Запускает процессы-обработчики, приём подтверждений и наблюдение за процессами."""
+        self._freed = [asyncio.Event() for _ in range(self.processes)]
+        self._ready = [asyncio.Event() for _ in range(self.processes)]
+        for index in range(self.processes):
+            self._spawn(index)
+        self._tasks = [asyncio.create_task(self._ack_loop()),
+                       asyncio.create_task(self._monitor_loop())]
+
+    async def wait_ready(self) -> None:
+        """Ждёт, пока все процессы создадут ботов и начнут принимать обновления."""
+        await asyncio.gather(*(ready.wait() for ready in self._ready))
+
+    @property
+    def pending(self) -> int:
+        """Количество переданных, но не подтверждённых обновлений."""
+        return sum(len(in_flight) for in_flight in self._in_flight)
+
+    async def _ack_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            ack = await loop.run_in_executor(None, self._acks.get)
+            if ack is None:
+                return
+            index, update_id = ack
+            if update_id is None:
+                self._ready[index].set()
+                continue
+            self._in_flight[index].pop(update_id, None)
+            self._freed[index].set()
+            waiter = self._waiters.pop(update_id, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+
+    async def _monitor_loop(self) -> None:
+        while not self._closing:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            for index, worker in enumerate(self._workers):
+                if worker.is_alive() or self._closing:
+                    continue
+                in_flight = self._in_flight[index]
+                logger.error('Процесс %s завершился с кодом %s, перезапуск; повтор %s обновлений',
+                             worker.name, worker.exitcode, len(in_flight))
+                self.restarts += 1
+                # Старая очередь могла остаться недочитанной: новый процесс
+                # получает все неподтверждённые обновления в исходном порядке
+                self._spawn(index)
+                for update in in_flight.values():
+                    self._inboxes[index].put(update)
+
+    async def submit(self, update: types.Update) -> bool:
+        """
+        Передаёт обновление процессу его пользователя.
+
+        Args:
+            update (Update): Обновление от Telegram.
+
+        Returns:
+            bool: False, если супервизор останавливается или у процесса
+                слишком много необработанных обновлений дольше timeout.
+        """
+        if self._closing:
+            return False
+        index = update_user_id(update) % self.processes
+        in_flight = self._in_flight[index]
+        loop = asyncio.get_running_loop()
+        deadline = None if self.timeout is None else loop.time() + self.timeout
+        while len(in_flight) >= self.max_in_flight:
+            self._freed[index].clear()
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._freed[index].wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        in_flight[update.update_id] = update
+        self._inboxes[index].put(update)
+        return True
+
+    async def process(self, update: types.Update) -> None:
+        """
+        Передаёт обновление и ждёт, пока процесс его обработает
+        (используется нагрузочным тестом).
+
+        Args:
+            update (Update): Обновление.
+        """
+        waiter = self._waiters[update.update_id] = asyncio.get_running_loop().create_future()
+        if not await self.submit(update):
+            self._waiters.pop(update.update_id, None)
+            raise RuntimeError('Обновление не принято: очередь процесса переполнена')
+        await waiter
+
+    async def close(self) -> None:
+        """Перестаёт принимать обновления и ждёт, пока процессы дообработают принятые."""
+        self._closing = True
+        for inbox in self._inboxes:
+            inbox.put(None)
+        loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            await loop.run_in_executor(None, worker.join, STOP_TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+        self._acks.put(None)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for task in self._tasks:
+            task.cancel()
+
+
+async def _poll(bot, supervisor: ShardSupervisor, stop: asyncio.Event) -> None:
+    """
+    Получает обновления через getUpdates и передаёт их супервизору.
+    Смещение сдвигается только после того, как обновление принято.
+    """
+    await bot.delete_webhook()
+    offset = None
+    while not stop.is_set():
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=20)
+        except Exception:
+            logger.exception('Ошибка getUpdates')
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            while not await supervisor.submit(update):
+                await asyncio.sleep(0.1)
+            offset = update.update_id + 1
+
+
+async def run_sharded(processes: int) -> None:
+    """
+    Запускает бота в processes процессах: этот процесс получает обновления
+    (polling или webhook, BOT_MODE) и распределяет их по ID пользователя.
+    Останавливается по SIGINT/SIGTERM, дождавшись обработки принятых обновлений.
+
+    Args:
+        processes (int): Количество процессов-обработчиков.
+    """
+    import config
+    from bot_connect import create_bot
+    from reminders import start_reminders
+
+    # Бот супервизора получает обновления и рассылает напоминания
+    # (в одном процессе); хендлеры есть у обработчиков. Напоминания
+    # отправляются в пределах доли лимита супервизора
+    bot = create_bot(config, rate_share(processes))
+    supervisor = ShardSupervisor(processes)
+    reminders = start_reminders(bot)
+    if BOT_MODE == 'webhook':
+        from webhook import run_webhook
+        try:
+            await run_webhook(bot, supervisor)
+        finally:
+            if reminders:
+                reminders.cancel()
+            await bot.close_session()
+        return
+
+    supervisor.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: остановка по KeyboardInterrupt
+            pass
+    poller = asyncio.create_task(_poll(bot, supervisor, stop))
+    try:
+        await stop.wait()
+    finally:
+        poller.cancel()
+        if reminders:
+            reminders.cancel()
+        await asyncio.gather(poller, return_exceptions=True)
+        await supervisor.close()
+        await bot.close_session()
@@ -0,0 +1,185 @@
+import asyncio
+import hmac
+import json
+import logging
+import signal
+from typing import Callable, List, Optional
+
+from aiohttp import web
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
+
+from config import (WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_LISTEN,
+                    WEBHOOK_PORT, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE,
+                    WEBHOOK_QUEUE_TIMEOUT)
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram передаёт secret_token из setWebhook
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def update_chat_id(update: types.Update) -> int:
+    """
+    Определяет чат, к которому относится обновление.
+    Обновления одного чата обрабатываются строго по порядку.
+
+    Args:
+        update (Update): Обновление от Telegram.
+
+    Returns:
+        int: ID чата, пользователя или, если их нет, ID обновления.
+    """
+    if update.message:
+        return update.message.chat.id
+    if update.callback_query:
+        call = update.callback_query
+        return call.message.chat.id if call.message else call.from_user.id
+    return update.update_id
+
+
+class UpdateDispatcher:
+    """
+    Ограниченный пул обработчиков обновлений.
+
+    Каждый обработчик читает свою очередь; обновление попадает в очередь
+    по хэшу ID чата, поэтому порядок внутри чата сохраняется, а разные чаты
+    обрабатываются параллельно. Размер очередей ограничен: при переполнении
+    submit() ждёт не дольше timeout (None - без ограничения) и возвращает False.
+
+    Attributes:
+        bot (AsyncTeleBot): Бот, обрабатывающий обновления.
+        workers (int): Количество обработчиков.
+        on_done (Optional[Callable]): Вызывается с обновлением после его обработки.
+    """
+
+    def __init__(self, bot: AsyncTeleBot, workers: int, queue_size: int,
+                 timeout: Optional[float] = WEBHOOK_QUEUE_TIMEOUT,
+                 on_done: Optional[Callable[[types.Update], None]] = None) -> None:
+        self.bot = bot
+        self.workers = workers
+        self.timeout = timeout
+        self.on_done = on_done
+        self._queues: List[asyncio.Queue] = [asyncio.Queue(queue_size)
+                                             for _ in range(workers)]
+        self._tasks: List[asyncio.Task] = []
+        self._closing = False
+
+    @property
+    def pending(self) -> int:
+        """Количество обновлений, ожидающих обработки."""
+        return sum(queue.qsize() for queue in self._queues)
+
+    def start(self) -> None:
+        """Запускает обработчики."""
+        self._tasks = [asyncio.create_task(self._worker(queue))
+                       for queue in self._queues]
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            update = await queue.get()
+            try:
+                await self.bot.process_new_updates([update])
+            except Exception:
+                logger.exception('Ошибка обработки обновления %s', update.update_id)
+            finally:
+                queue.task_done()
+                if self.on_done is not None:
+                    self.on_done(update)
+
+    async def submit(self, update: types.Update) -> bool:
+        """
+        Ставит обновление в очередь его чата.
+
+        Args:
+            update (Update): Обновление от Telegram.
+
+        Returns:
+            bool: False, если бот останавливается или очередь переполнена.
+        """
+        if self._closing:
+            return False
+        queue = self._queues[hash(update_chat_id(update)) % self.workers]
+        try:
+            await asyncio.wait_for(queue.put(update), self.timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def close(self) -> None:
+        """Перестаёт принимать обновления, дожидается обработки очередей и останавливает обработчики."""
+        self._closing = True
+        for queue in self._queues:
+            await queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def create_webhook_app(dispatcher: UpdateDispatcher, secret: Optional[str],
+                       path: str = WEBHOOK_PATH) -> web.Application:
+    """
+    Создаёт aiohttp-приложение, принимающее обновления от Telegram.
+
+    Args:
+        dispatcher (UpdateDispatcher): Пул обработчиков.
+        secret (Optional[str]): Ожидаемый secret_token; None отключает проверку.
+        path (str): Путь, на который Telegram отправляет обновления.
+
+    Returns:
+        web.Application: Приложение; 403 при неверном токене, 400 при теле,
+            которое не является объектом обновления, 503 при переполненной
+            очереди (Telegram повторит доставку).
+    """
+    async def handle(request: web.Request) -> web.Response:
+        if secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''),
+                                              secret):
+            return web.Response(status=403)
+        try:
+            data = json.loads(await request.text())
+            # null, список или объект без update_id - не обновление
+            if not isinstance(data, dict) or 'update_id' not in data:
+                return web.Response(status=400)
+            update = types.Update.de_json(data)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return web.Response(status=400)
+        if not await dispatcher.submit(update):
+            return web.Response(status=503)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle)
+    return app
+
+async def run_webhook(bot: AsyncTeleBot, dispatcher=None) -> None:
+    """
+    Запускает бота в режиме webhook: HTTP-сервер, пул обработчиков и
+    регистрация адреса в Telegram. По SIGINT/SIGTERM сервер перестаёт
+    принимать запросы, а уже принятые обновления дообрабатываются.
+
+    Args:
+        bot (AsyncTeleBot): Бот с зарегистрированными обработчиками.
+        dispatcher: Получатель обновлений с методами start(), submit() и close();
+            по умолчанию UpdateDispatcher этого процесса.
+    """
+    if dispatcher is None:
+        dispatcher = UpdateDispatcher(bot, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE)
+    dispatcher.start()
+    runner = web.AppRunner(create_webhook_app(dispatcher, WEBHOOK_SECRET))
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_LISTEN, WEBHOOK_PORT).start()
+    await bot.set_webhook(url=WEBHOOK_URL + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: остановка по KeyboardInterrupt
+            pass
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        await dispatcher.close()